@@ -0,0 +1,165 @@
+"""
+推理後端模組
+提供與PyTorch YOLO模型相同呼叫介面的替代後端：backend(x) -> (pred, None)
+"""
+
+import json
+import os
+
+import numpy as np
+import torch
+
+
+def decode_raw(outputs, stride, anchor_grid, grids):
+    """解碼 Detect.export=True 的原始檢測頭輸出 [(bs, na, ny, nx, no), ...] 為 (bs, n, no)"""
+    if anchor_grid is None:
+        raise ValueError("模型輸出未解碼且缺少 anchor_grid metadata，請以 models/export.py 重新匯出")
+    z = []
+    for i, y in enumerate(outputs):
+        y = y.float().sigmoid()
+        bs, na, ny, nx, no = y.shape
+        if (nx, ny) not in grids:
+            yv, xv = torch.meshgrid([torch.arange(ny), torch.arange(nx)])
+            grids[(nx, ny)] = torch.stack((xv, yv), 2).view((1, 1, ny, nx, 2)).float()
+        y[..., 0:2] = (y[..., 0:2] * 2. - 0.5 + grids[(nx, ny)]) * stride[i]
+        y[..., 2:4] = (y[..., 2:4] * 2) ** 2 * anchor_grid[i].view(1, na, 1, 1, 2)
+        z.append(y.view(bs, -1, no))
+    return torch.cat(z, 1)
+
+
+class OnnxBackend:
+    """ONNX Runtime CPU推理後端
+
+    支援 models/export.py 匯出的模型：輸出為已解碼的 (bs, n, no) 張量，
+    或 Detect.export=True 時的原始檢測頭輸出（依 metadata 中的 stride/anchor_grid 解碼）。
+    """
+
+    def __init__(self, onnx_path, intra_op_threads=0, inter_op_threads=0):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("使用ONNX權重需要安裝 onnxruntime (pip install onnxruntime)") from e
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = int(intra_op_threads)
+        if inter_op_threads:
+            options.inter_op_num_threads = int(inter_op_threads)
+            options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+        self.session = ort.InferenceSession(onnx_path, options, providers=['CPUExecutionProvider'])
+        self.nbytes = os.path.getsize(onnx_path)
+
+        inp = self.session.get_inputs()[0]
+        self.input_name = inp.name
+        self.input_shape = inp.shape  # 動態維度為字串或 None
+        self.fixed_batch = self.input_shape[0] if isinstance(self.input_shape[0], int) else None
+        h, w = self.input_shape[2:4]
+        # 固定輸入尺寸 (h, w)，可為非方形；只有符號（字串/None）維度視為動態
+        self.input_hw = (h, w) if isinstance(h, int) and isinstance(w, int) else None
+        self.imgsz = max(self.input_hw) if self.input_hw else None
+
+        meta = self.session.get_modelmeta().custom_metadata_map
+        self.names = json.loads(meta['names']) if 'names' in meta else []
+        self.stride = torch.tensor(json.loads(meta['stride'])) if 'stride' in meta else torch.tensor([8., 16., 32.])
+        self.anchor_grid = torch.tensor(json.loads(meta['anchor_grid'])) if 'anchor_grid' in meta else None
+        self._grids = {}
+
+    def parameters(self):
+        """提供與 nn.Module 相同的 dtype/device 查詢介面（輸入一律為 CPU FP32）"""
+        return iter([torch.zeros(1)])
+
+    def warmup(self):
+        """以模型輸入尺寸執行一次推理"""
+        shape = [d if isinstance(d, int) else 64 for d in self.input_shape]
+        self(torch.zeros(*shape))
+
+    def __call__(self, x):
+        x = x.detach().cpu().float().numpy()
+        if self.fixed_batch and x.shape[0] != self.fixed_batch:
+            # 固定批次大小的模型逐張執行後合併
+            outputs = [self.session.run(None, {self.input_name: x[i:i + 1]}) for i in range(x.shape[0])]
+            outputs = [np.concatenate(level, 0) for level in zip(*outputs)]
+        else:
+            outputs = self.session.run(None, {self.input_name: x})
+
+        if len(outputs) == 1 and outputs[0].ndim == 3:
+            return torch.from_numpy(outputs[0]), None
+        return self._decode(outputs), None
+
+    def _decode(self, outputs):
+        return decode_raw([torch.from_numpy(out) for out in outputs], self.stride, self.anchor_grid, self._grids)
+
+
+class TorchScriptBackend:
+    """TorchScript CPU推理後端（models/quantize.py 產生的 INT8 模型，或 models/export.py 匯出的 .torchscript.pt）
+
+    模型以固定輸入尺寸追蹤，輸出為已解碼的 (bs, n, no) 張量，或 Detect.export=True 時的原始檢測頭輸出
+    （依 meta.json 中的 stride/anchor_grid 解碼）；names/stride/imgsz 等資訊存於封裝檔內的 meta.json。
+    """
+
+    def __init__(self, path):
+        extra = {'meta.json': ''}
+        self.module = torch.jit.load(path, map_location='cpu', _extra_files=extra)
+        self.module.eval()
+        meta = json.loads(extra['meta.json'] or '{}')
+        engine = meta.get('qengine')
+        if engine and engine in torch.backends.quantized.supported_engines:
+            torch.backends.quantized.engine = engine  # 與量化時相同的量化運算核心
+        self.nbytes = os.path.getsize(path)
+        self.names = meta.get('names', [])
+        self.stride = torch.tensor(meta.get('stride', [8., 16., 32.]))
+        self.imgsz = meta.get('imgsz')
+        hw = meta.get('input_hw') or ([self.imgsz] * 2 if self.imgsz else None)
+        self.input_hw = tuple(hw) if hw else None  # 追蹤時的輸入尺寸 (h, w)
+        if self.input_hw and not self.imgsz:
+            self.imgsz = max(self.input_hw)
+        self.fixed_batch = meta.get('batch', 1)
+        self.anchor_grid = torch.tensor(meta['anchor_grid']) if 'anchor_grid' in meta else None
+        self._grids = {}
+
+    def parameters(self):
+        """提供與 nn.Module 相同的 dtype/device 查詢介面（輸入一律為 CPU FP32）"""
+        return iter([torch.zeros(1)])
+
+    def warmup(self):
+        """以模型輸入尺寸執行一次推理"""
+        h, w = self.input_hw or (640, 640)
+        self(torch.zeros(self.fixed_batch, 3, h, w))
+
+    def __call__(self, x):
+        x = x.detach().cpu().float()
+        with torch.no_grad():
+            if self.fixed_batch and x.shape[0] != self.fixed_batch:
+                pred = torch.cat([self._run(x[i:i + 1]) for i in range(x.shape[0])], 0)
+            else:
+                pred = self._run(x)
+        return pred, None
+
+    def _run(self, x):
+        y = self.module(x)
+        if isinstance(y, (tuple, list)) and y[0].dim() == 5:  # 原始檢測頭輸出，每個檢測層一個
+            return decode_raw(y, self.stride, self.anchor_grid, self._grids)
+        return y[0] if isinstance(y, (tuple, list)) else y
+
+
+BACKEND_FORMATS = ('.onnx', '.torchscript', '.torchscript.pt')  # .torchscript.pt 須在 .pt 之前判斷
+
+
+def load_backend(weights_path, **options):
+    """
+    依副檔名建立非PyTorch推理後端
+
+    Returns:
+        tuple: (success, backend, error_message)
+    """
+    try:
+        if weights_path.endswith('.onnx'):
+            return True, OnnxBackend(weights_path,
+                                     options.get('intra_op_threads', 0),
+                                     options.get('inter_op_threads', 0)), None
+        if weights_path.endswith(('.torchscript', '.torchscript.pt')):
+            return True, TorchScriptBackend(weights_path), None
+        return False, None, f"不支援的模型格式: {weights_path}"
+    except Exception as e:
+        return False, None, str(e)
@@ -0,0 +1,124 @@
+"""
+電路板區域 (ROI) 偵測模組
+以縮圖上的顏色/邊緣門檻與輪廓外框快速找出電路板範圍，只將裁切後的區域送入模型推理；
+結果依攝像頭與治具快取，並定期重新驗證
+"""
+
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+class BoardLocator:
+    """電路板區域定位器
+
+    Args:
+        method: 'color' 依防焊漆顏色（綠色系 HSV）門檻、'edge' 依邊緣輪廓、'auto' 顏色失敗時改用邊緣
+        padding: 外框向外擴張比例（相對於外框邊長），避免裁掉板邊缺陷
+        revalidate: 快取的區域每隔此秒數重新偵測一次，0 為每幀偵測
+        min_area: 區域面積佔整幀的最小比例，過小視為未找到電路板
+        max_area: 區域面積佔整幀超過此比例時不裁切（裁切沒有效益）
+        width: 偵測用縮圖寬度
+        align: 區域邊界對齊的像素倍數，外框小幅抖動時推理尺寸不變（形狀快取可重用）
+        hue_range: color 模式的色相範圍 (OpenCV 0~179)
+        cache: 跨檢測共用的快取字典 {鍵: (區域, 整幀尺寸, 偵測時間)}
+    """
+
+    def __init__(self, method='auto', padding=0.02, revalidate=2.0, min_area=0.05, max_area=0.95, width=320,
+                 align=32, hue_range=(35, 95), cache=None):
+        self.method = method if method in ('auto', 'color', 'edge') else 'auto'
+        self.padding = padding
+        self.revalidate = revalidate
+        self.min_area = min_area
+        self.max_area = max_area
+        self.width = width
+        self.align = max(1, int(align))
+        self.hue_range = hue_range
+        self.cache = {} if cache is None else cache
+        self.hits = 0
+        self.updates = 0
+        self._lock = threading.Lock()
+
+    def locate(self, frame, key='default'):
+        """
+        回傳電路板區域 (x0, y0, x1, y1)，未找到或不需裁切時回傳 None
+
+        同一鍵（攝像頭/治具）在重新驗證間隔內直接沿用快取的區域
+        """
+        h, w = frame.shape[:2]
+        now = time.time()
+        with self._lock:
+            cached = self.cache.get(key)
+            if cached is not None and cached[1] == (h, w) and now - cached[2] < self.revalidate:
+                self.hits += 1
+                return cached[0]
+        roi = self.detect(frame)
+        with self._lock:
+            if cached is None or cached[0] != roi:
+                self.updates += 1
+            self.cache[key] = (roi, (h, w), now)
+        return roi
+
+    def invalidate(self, key=None):
+        """清除指定鍵（或全部）的快取，治具更換時使用"""
+        with self._lock:
+            if key is None:
+                self.cache.clear()
+            else:
+                self.cache.pop(key, None)
+
+    def stats(self):
+        return {'hits': self.hits, 'updates': self.updates, 'keys': len(self.cache)}
+
+    def detect(self, frame):
+        """不使用快取，直接在縮圖上偵測電路板區域"""
+        h, w = frame.shape[:2]
+        s = min(1.0, self.width / w)
+        small = cv2.resize(frame, (max(1, int(w * s)), max(1, int(h * s))), interpolation=cv2.INTER_AREA) \
+            if s < 1.0 else frame
+        if small.ndim == 2:
+            small = cv2.cvtColor(small, cv2.COLOR_GRAY2BGR)
+
+        box = None
+        if self.method in ('auto', 'color'):
+            box = self._largest_box(self._color_mask(small))
+        if box is None and self.method in ('auto', 'edge'):
+            box = self._largest_box(self._edge_mask(small))
+        if box is None:
+            return None
+
+        # 縮圖座標映射回原圖並外擴
+        x, y, bw, bh = box
+        px, py = bw * self.padding, bh * self.padding
+        a = self.align
+        x0 = max(0, int((x - px) / s) // a * a)
+        y0 = max(0, int((y - py) / s) // a * a)
+        x1 = min(w, -(-int(np.ceil((x + bw + px) / s)) // a) * a)
+        y1 = min(h, -(-int(np.ceil((y + bh + py) / s)) // a) * a)
+        if (x1 - x0) * (y1 - y0) >= self.max_area * w * h:
+            return None
+        return x0, y0, x1, y1
+
+    def _color_mask(self, img):
+        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+        lo, hi = self.hue_range
+        return cv2.inRange(hsv, (lo, 40, 30), (hi, 255, 255))
+
+    @staticmethod
+    def _edge_mask(img):
+        gray = cv2.GaussianBlur(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+        edges = cv2.Canny(gray, 50, 150)
+        return cv2.dilate(edges, np.ones((5, 5), np.uint8), iterations=2)  # 連接板上細碎的邊緣
+
+    def _largest_box(self, mask):
+        """最大輪廓的外框 (x, y, w, h)，面積過小時回傳 None"""
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, np.ones((7, 7), np.uint8))
+        contours = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[-2]  # OpenCV 3/4 相容
+        if not contours:
+            return None
+        box = cv2.boundingRect(max(contours, key=cv2.contourArea))
+        if box[2] * box[3] < self.min_area * mask.shape[0] * mask.shape[1]:
+            return None
+        return box
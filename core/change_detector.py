@@ -0,0 +1,92 @@
+"""
+畫面變化偵測模組
+以縮小後的灰階影像比較目前幀與上一次推理的幀，畫面未變化時略過模型推理（輸送帶空轉或板子靜止）
+"""
+
+import time
+
+import cv2
+import numpy as np
+
+
+class ChangeDetector:
+    """變化閘門
+
+    Args:
+        method: 'diff' 像素差分，或 'phash' 感知雜湊（對亮度微變與雜訊較不敏感）
+        sensitivity: 靈敏度 0~1，越高越容易判定為變化
+            diff: 超過像素差門檻的像素比例 > (1 - sensitivity) * 5% 視為變化
+            phash: 64 位元雜湊的漢明距離 > (1 - sensitivity) * 20 視為變化
+        refresh_interval: 距上次推理超過此秒數時強制推理，0 為不強制
+        width: 比較用縮圖寬度
+        pixel_delta: diff 模式下單一像素視為變化的灰階差
+    """
+
+    def __init__(self, method='diff', sensitivity=0.8, refresh_interval=5.0, width=64, pixel_delta=25):
+        self.method = method if method in ('diff', 'phash') else 'diff'
+        self.sensitivity = min(max(float(sensitivity), 0.0), 1.0)
+        self.refresh_interval = refresh_interval
+        self.width = width
+        self.pixel_delta = pixel_delta
+        self.checked = 0
+        self.skipped = 0
+        self._reference = None
+        self._last_infer = 0.0
+        self.last_score = 0.0
+
+    def should_infer(self, frame):
+        """
+        判斷此幀是否需要推理；需要時同時以此幀作為新的比較基準
+
+        Returns:
+            tuple: (是否推理, 原因 'first' / 'changed' / 'refresh' / 'unchanged')
+        """
+        self.checked += 1
+        signature = self._signature(frame)
+        now = time.time()
+        if self._reference is None or self._reference.shape != signature.shape:
+            reason = 'first'
+        elif self.refresh_interval and now - self._last_infer >= self.refresh_interval:
+            reason = 'refresh'
+        elif self._changed(signature):
+            reason = 'changed'
+        else:
+            self.skipped += 1
+            return False, 'unchanged'
+        self._reference = signature
+        self._last_infer = now
+        return True, reason
+
+    def mark_inferred(self, frame):
+        """以實際推理的幀作為新的比較基準（首幀、追蹤器強制推理等未經 should_infer 判斷的推理）"""
+        self._reference = self._signature(frame)
+        self._last_infer = time.time()
+
+    def reset(self):
+        """清除比較基準，下一幀必定推理"""
+        self._reference = None
+
+    def stats(self):
+        return {'checked': self.checked, 'skipped': self.skipped, 'score': self.last_score}
+
+    def _small_gray(self, frame):
+        h, w = frame.shape[:2]
+        size = (self.width, max(1, int(round(h * self.width / w))))
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+
+    def _signature(self, frame):
+        gray = self._small_gray(frame)
+        if self.method == 'diff':
+            return cv2.GaussianBlur(gray, (3, 3), 0)  # 抑制感測器雜訊
+        # pHash: 32x32 DCT 取左上 8x8 低頻係數與中位數比較
+        dct = cv2.dct(np.float32(cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA)))[:8, :8]
+        return (dct > np.median(dct)).ravel()
+
+    def _changed(self, signature):
+        if self.method == 'diff':
+            diff = cv2.absdiff(signature, self._reference)
+            self.last_score = float(np.count_nonzero(diff > self.pixel_delta)) / diff.size
+            return self.last_score > (1.0 - self.sensitivity) * 0.05
+        self.last_score = float(np.count_nonzero(signature != self._reference))
+        return self.last_score > round((1.0 - self.sensitivity) * 20)
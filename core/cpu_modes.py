@@ -0,0 +1,194 @@
+"""
+CPU 執行模式模組
+將已融合的 YOLO 模型轉為 channels-last 記憶體格式，並可依輸入尺寸凍結為 oneDNN (MKLDNN) 最佳化圖：
+Conv+BN/Conv+激活/Conv+add 融合、權重預先打包 (prepack) 於快取的凍結圖中跨呼叫保留；
+或以 torch.compile 編譯。編譯產物以 權重雜湊 + 輸入尺寸 + PyTorch 版本 為鍵快取於磁碟，重新啟動不需再次編譯
+"""
+
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import torch
+import torch.nn as nn
+
+
+CPU_MODES = ('eager', 'channels_last', 'onednn', 'compile')
+DEFAULT_CACHE_DIR = os.path.join('runs', 'compile_cache')
+_hash_cache = {}  # (路徑, mtime, 大小) -> 權重檔 SHA-256
+
+
+def file_hash(path):
+    """權重檔 SHA-256（前 16 碼），同一檔案未修改時不重新計算"""
+    st = os.stat(path)
+    key = (os.path.realpath(path), st.st_mtime_ns, st.st_size)
+    if key not in _hash_cache:
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        _hash_cache[key] = h.hexdigest()[:16]
+    return _hash_cache[key]
+
+
+class _RawHead(nn.Module):
+    """追蹤用包裝：輸入影像 -> Detect 輸出卷積的原始結果（不含解碼）"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, x):
+        return self.model.forward_raw(x)
+
+
+class OptimizedModel:
+    """以指定執行模式推理的模型包裝（介面與 models.yolo.Model 的推理用法相同）
+
+    Args:
+        model: 已融合、eval 模式的 models.yolo.Model
+        mode: 'channels_last'、'onednn'（TorchScript 凍結 + optimize_for_inference）或 'compile'（torch.compile）
+        max_graphs: 凍結圖快取數量上限（每種輸入尺寸一個）
+        tolerance: 凍結圖與 eager 原始輸出的最大允許誤差，超過時該尺寸退回 eager
+        cache_dir: 編譯產物的磁碟快取目錄，None 為不使用磁碟快取
+        weights_hash: 權重檔雜湊（磁碟快取鍵的一部分）
+    """
+
+    def __init__(self, model, mode='channels_last', max_graphs=8, tolerance=1e-3, cache_dir=None, weights_hash=None):
+        self.model = model.to(memory_format=torch.channels_last)
+        self.mode = mode
+        self.cache_dir = cache_dir if weights_hash else None
+        self.weights_hash = weights_hash
+        self.disk_hits = 0
+        self.errors = {}  # 輸入尺寸 -> 編譯失敗原因（該尺寸退回 eager）
+        self._compiled = None
+        self._compile_failed = False
+        self.detect = model.model[-1]
+        self.names = getattr(model, 'names', [])
+        self.stride = model.stride
+        self.max_graphs = max_graphs
+        self.tolerance = tolerance
+        self.parity = {}  # 輸入尺寸 -> 凍結圖與 eager 的最大誤差
+        self._graphs = OrderedDict()  # (輸入尺寸, dtype) -> 凍結圖（None 表示此尺寸使用 eager）
+        self._lock = threading.Lock()
+
+    def parameters(self):
+        return self.model.parameters()
+
+    def eval(self):
+        return self
+
+    def warmup(self):
+        """以小尺寸輸入完成 channels-last 權重轉換（凍結圖於實際推理尺寸首次出現時才建立）"""
+        with torch.no_grad():
+            p = next(self.model.parameters())
+            self.model.forward_raw(torch.zeros(1, 3, 64, 64, device=p.device).type_as(p)
+                                   .contiguous(memory_format=torch.channels_last))
+
+    def __call__(self, x, *args, **kwargs):
+        return self.detect.decode(self.forward_raw(x)), None
+
+    def forward_candidates(self, x, conf_thres=0.25, multi_label=True):
+        return self.detect.decode_candidates(self.forward_raw(x), conf_thres, multi_label)
+
+    def forward_raw(self, x):
+        x = x.contiguous(memory_format=torch.channels_last)
+        graph = self._graph(x) if self.mode in ('onednn', 'compile') and not _autocast_enabled(x) else None
+        ps = graph(x) if graph is not None else self.model.forward_raw(x)
+        return [p.contiguous() for p in ps]  # 解碼的 view() 需要 NCHW 連續記憶體
+
+    def _graph(self, x):
+        """取得此輸入尺寸的編譯圖，第一次遇到時建立（或自磁碟載入）並驗證輸出一致性；失敗時回傳 None（eager）"""
+        key = (tuple(x.shape), x.dtype)
+        with self._lock:
+            if key in self._graphs:
+                self._graphs.move_to_end(key)
+                return self._graphs[key]
+            graph = None
+            try:
+                with torch.no_grad():
+                    graph = self._build_compiled() if self.mode == 'compile' else self._build_frozen(x, key)
+                    for _ in range(2):  # 前兩次執行完成編譯、圖最佳化與權重預先打包
+                        out = graph(x)
+                    ref = self.model.forward_raw(x)
+                err = max(float((a.float() - b.float()).abs().max()) for a, b in zip(out, ref))
+                self.parity[key[0]] = err
+                if err > self.tolerance * max(1.0, max(float(b.abs().max()) for b in ref)):
+                    graph = None  # 輸出不一致，此尺寸退回 eager
+            except Exception as e:  # 編譯器錯誤型別眾多（舊版 PyTorch、無 MKLDNN、無 C++ 編譯器等），一律退回 eager
+                self.errors[key[0]] = f"{type(e).__name__}: {e}"
+                self._compile_failed = self.mode == 'compile'
+                graph = None
+            self._graphs[key] = graph
+            while len(self._graphs) > self.max_graphs:
+                self._graphs.popitem(last=False)
+            return graph
+
+    def _cache_path(self, key):
+        if not self.cache_dir:
+            return None
+        shape, dtype = key
+        name = (f"{self.weights_hash}_{self.mode}_{'x'.join(map(str, shape))}_{str(dtype).replace('torch.', '')}_"
+                f"torch{torch.__version__}.pt")
+        return os.path.join(self.cache_dir, re.sub(r'[^\w.\-]', '_', name))
+
+    def _build_frozen(self, x, key):
+        """TorchScript 凍結圖：磁碟快取命中時直接載入，否則追蹤並凍結後寫入快取"""
+        path = self._cache_path(key)
+        frozen = None
+        if path and os.path.isfile(path):
+            try:
+                frozen = torch.jit.load(path, map_location=x.device)
+                self.disk_hits += 1
+            except RuntimeError:  # 快取損毀，重新建立
+                frozen = None
+        if frozen is None:
+            traced = torch.jit.trace(_RawHead(self.model).eval(), x, check_trace=False)
+            frozen = torch.jit.freeze(traced)
+            if path:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                tmp = path + '.tmp'
+                torch.jit.save(frozen, tmp)
+                os.replace(tmp, path)  # 寫入完成才替換，避免其他行程讀到一半的檔案
+        # oneDNN 格式的常數無法序列化，optimize_for_inference 於載入後執行（遠快於追蹤）
+        return torch.jit.optimize_for_inference(frozen)
+
+    def _build_compiled(self):
+        """torch.compile 編譯（各輸入尺寸共用同一個編譯函式，inductor 產物快取於 cache_dir）"""
+        if self._compile_failed:
+            raise RuntimeError('torch.compile 先前已失敗')
+        if self._compiled is None:
+            if self.cache_dir:
+                os.environ.setdefault('TORCHINDUCTOR_CACHE_DIR',
+                                      os.path.join(os.path.abspath(self.cache_dir), f'inductor_torch{torch.__version__}'))
+                os.environ.setdefault('TORCHINDUCTOR_FX_GRAPH_CACHE', '1')
+            self._compiled = torch.compile(_RawHead(self.model).eval(), dynamic=False)
+        return self._compiled
+
+
+def _autocast_enabled(x):
+    """autocast 下不使用 FP32 凍結圖（凍結圖的權重與型別已固定）"""
+    try:
+        return x.device.type == 'cpu' and torch.is_autocast_cpu_enabled()
+    except AttributeError:
+        return False
+
+
+def apply_cpu_mode(model, mode, device, weights_path=None, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    依執行模式包裝模型；oneDNN 模式只用於 CPU，其他設備改用 channels-last
+
+    Args:
+        weights_path: 權重檔路徑，提供時編譯產物以其雜湊快取於 cache_dir
+
+    Returns:
+        模型或 OptimizedModel
+    """
+    if mode not in CPU_MODES or mode == 'eager' or not hasattr(model, 'forward_raw'):
+        return model
+    if mode == 'onednn' and (torch.device(device).type != 'cpu' or not torch.backends.mkldnn.is_available()):
+        mode = 'channels_last'
+    weights_hash = file_hash(weights_path) if weights_path and cache_dir else None
+    return OptimizedModel(model, mode, cache_dir=cache_dir, weights_hash=weights_hash)
@@ -6,19 +6,36 @@
 import os
 import sys
 import time
+import threading
 import cv2
 import torch
 import numpy as np
 from pathlib import Path
 from PyQt5.QtCore import QObject, QThread, pyqtSignal
-from PyQt5.QtGui import QImage, QPixmap
+from PyQt5.QtGui import QImage
 
-# 導入自定義的YOLO載入器
-from yolo_gui_utils.simple_yolo_loader_v2 import YOLOv5Loader
+# 導入行程共用的模型註冊表
+from core.backends import BACKEND_FORMATS
+from core.model_registry import get_registry, resolve_device
+from core.cpu_modes import OptimizedModel
+from core.precision import autocast, cpu_capability, supports_precision, weights_precision
+from core.pipeline import Pipeline, Stage, StageFailure
+from core.result_writer import ResultWriter
+from core.video_recorder import VideoRecorder
+from core.change_detector import ChangeDetector
+from core.board_roi import BoardLocator
+from core.golden_template import load_template
+from core.tracker import BoxTracker
+from core.frame_grabber import LatestFrameGrabber
+from core.tiling import tile_windows, region_windows, merge_tile_detections
+from utils.results import DetectionResult
 
 
 class DetectionWorker(QThread):
 
+    # 攝像頭/治具 -> 電路板區域；檢測分頁每次執行都建立新的工作執行緒，因此快取放在類別層級以跨檢測保留
+    _roi_cache = {}
+
     @staticmethod
     def detect_available_cameras(max_devices=5):
         """自動偵測可用攝像頭，回傳可用攝像頭ID清單"""
@@ -35,7 +52,7 @@ class DetectionWorker(QThread):
     """檢測工作執行緒"""
     
     # 信號定義
-    frame_processed = pyqtSignal(QPixmap)     # 處理完的QPixmap（已縮放和標註）
+    frame_processed = pyqtSignal(QImage)      # 處理完的QImage（已縮放和標註，包裝worker的顯示緩衝區）
     detection_result = pyqtSignal(dict)       # 檢測結果
     progress_updated = pyqtSignal(int)        # 進度更新
     log_message = pyqtSignal(str)             # 日誌訊息
@@ -52,35 +69,61 @@ class DetectionWorker(QThread):
         
         # 顯示優化參數
         self.display_size = (640, 480)  # 顯示區域大小
-        self.frame_skip = 2  # 每2幀顯示1幀，降低UI負載
-        self.frame_counter = 0
+        self._display_scratch = threading.local()  # 各繪製執行緒的顯示尺寸暫存緩衝區
+        self._display_interval = 0.0  # 顯示更新最小間隔（秒），0 表示每幀更新
+        self._last_display = 0.0
+        self._display_lock = threading.Lock()
+        self._shape_cache = {}  # (h, w, 推理尺寸設定, auto, stride) -> (ratio, pad, 推理尺寸)
+        self.writer = None  # 背景結果寫入器（run() 期間有效）
+        self.recorder = None  # 錄影器（攝像頭/影片檢測期間有效）
+        self.board_locator = None  # 電路板區域定位器（啟用ROI裁切時有效）
+        self._roi_key = 'default'
+        self.golden = None  # 黃金樣板（啟用樣板比對時有效）
+        self.tracker = None  # 關鍵幀追蹤器（影片/攝像頭檢測且啟用追蹤時有效）
+        self._refresh_pending = False  # 推理階段已提早推理一個非關鍵幀，尚未由追蹤器處理
         
     def set_parameters(self, params):
         """設置檢測參數"""
         self.params = params.copy()
         
     def load_model(self, weights_path, device='auto'):
-        """載入YOLO模型"""
+        """載入YOLO模型（透過模型註冊表共用已載入的模型）"""
         try:
             self.log_message.emit(f"正在載入模型: {weights_path}")
             
             # 設置設備
-            if device == 'auto':
-                self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-            else:
-                self.device = torch.device(device)
-                
+            self.device = resolve_device(device)
             self.log_message.emit(f"使用設備: {self.device}")
             
-            # 檢查是否為YOLOv5模型
-            if weights_path.endswith('.pt'):
-                # 使用專門的YOLOv5載入器
-                loader = YOLOv5Loader()
-                success, model, error = loader.load_model(weights_path, str(self.device))
+            # 檢查是否為支援的模型格式（PyTorch .pt、ONNX Runtime .onnx 或 INT8 TorchScript .torchscript）
+            if weights_path.endswith(('.pt',) + BACKEND_FORMATS):
+                options = {}
+                if weights_path.endswith('.onnx'):
+                    options = {'intra_op_threads': self.params.get('intra_op_threads', 0),
+                               'inter_op_threads': self.params.get('inter_op_threads', 0)}
+                elif not weights_path.endswith(BACKEND_FORMATS) and self.params.get('cpu_mode', 'eager') != 'eager':
+                    options = {'cpu_mode': self.params['cpu_mode']}
+                if weights_path.endswith(BACKEND_FORMATS) and self.device.type != 'cpu':
+                    self.log_message.emit("ONNX/INT8後端僅使用CPU執行")
+                    self.device = torch.device('cpu')
+                precision = self._resolve_precision(weights_path)
+                registry = get_registry()
+                success, model, error = registry.get_model(
+                    weights_path, self.device, weights_precision(self.device, precision), **options)
                 
                 if success:
                     self.model = model
-                    self.log_message.emit("模型載入成功")
+                    self._shape_cache.clear()
+                    if isinstance(model, OptimizedModel):
+                        self.log_message.emit(f"執行模式: {model.mode}（channels-last" +
+                                              ("，oneDNN 凍結圖依輸入尺寸建立並快取）" if model.mode == 'onednn' else "）"))
+                    if getattr(model, 'imgsz', None) and model.imgsz != self.params.get('imgsz', 640):
+                        # 固定輸入尺寸的模型必須以匯出尺寸推理
+                        self.log_message.emit(f"模型固定輸入尺寸 {model.imgsz}，已覆寫模型大小設定")
+                        self.params['imgsz'] = model.imgsz
+                    stats = registry.stats()
+                    self.log_message.emit(
+                        f"模型載入成功 (快取命中 {stats['hits']} 次, 已快取 {stats['models']} 個模型)")
                     return True
                 else:
                     self.log_message.emit(f"模型載入失敗: {error}")
@@ -97,6 +140,21 @@ class DetectionWorker(QThread):
             self.error_occurred.emit(error_msg)
             return False
     
+    def _resolve_precision(self, weights_path):
+        """確認推理精度可用，不支援時退回 FP32（結果寫回 params['precision']）"""
+        precision = self.params.get('precision', 'fp32')
+        if precision != 'fp32' and weights_path.endswith(BACKEND_FORMATS):
+            self.log_message.emit("ONNX/INT8後端使用模型本身的精度，忽略精度設定")
+            precision = 'fp32'
+        elif not supports_precision(self.device, precision):
+            self.log_message.emit(f"此設備不支援 {precision} 推理，改用 FP32")
+            precision = 'fp32'
+        elif precision != 'fp32':
+            capability = cpu_capability() if self.device.type == 'cpu' else ''
+            self.log_message.emit(f"推理精度: {precision}" + (f"（CPU 指令集 {capability}）" if capability else ""))
+        self.params['precision'] = precision
+        return precision
+    
     def run(self):
         """執行檢測"""
         try:
@@ -110,6 +168,11 @@ class DetectionWorker(QThread):
                 self.error_occurred.emit("未指定輸入來源")
                 return
             
+            self._open_writer()
+            self._open_board_locator(source)
+            if not self._open_golden():
+                return
+            
             # 根據來源類型執行不同的檢測
             if source.isdigit():  # 攝像頭
                 self._detect_camera(int(source))
@@ -124,51 +187,208 @@ class DetectionWorker(QThread):
                 self._detect_folder(source)
             else:
                 self.error_occurred.emit(f"無效的輸入來源: {source}")
+            
+            if self.board_locator:
+                st = self.board_locator.stats()
+                self.log_message.emit(f"[ROI] 區域快取命中 {st['hits']} 次，重新偵測後更新 {st['updates']} 次")
+            if isinstance(self.model, OptimizedModel):
+                tag = f"[{self.model.mode.upper()}]"
+                for shape, err in self.model.parity.items():
+                    self.log_message.emit(f"{tag} 輸入 {list(shape)} 編譯圖與 eager 最大誤差 {err:.2e}")
+                for shape, reason in self.model.errors.items():
+                    self.log_message.emit(f"{tag} 輸入 {list(shape)} 編譯失敗，改用 eager: {reason}")
+                if self.model.disk_hits:
+                    self.log_message.emit(f"{tag} 自磁碟快取載入 {self.model.disk_hits} 個編譯圖")
+            if self.golden:
+                st = self.golden.stats()
+                self.log_message.emit(
+                    f"[GOLDEN] {st['frames']} 幀中 {st['clean']} 幀無差異略過推理，差異區域 {st['regions']} 個，"
+                    f"對位 {st['registrations']} 次，失敗 {st['failures']} 次（改為整幀推理）")
                 
         except Exception as e:
             self.error_occurred.emit(f"檢測執行失敗: {str(e)}")
+        finally:
+            self._close_writer()  # 所有來源（含攝像頭、影片與中途失敗）都需停止寫入執行緒並寫出剩餘標註
+    
+    def _open_board_locator(self, source):
+        """依設定建立電路板區域定位器，快取鍵為 攝像頭/來源 + 治具名稱"""
+        self.board_locator = None
+        if not self.params.get('board_roi', False):
+            return
+        fixture = self.params.get('fixture') or 'default'
+        self._roi_key = f"camera{source}:{fixture}" if str(source).isdigit() else fixture
+        self.board_locator = BoardLocator(
+            self.params.get('roi_method', 'auto'),
+            padding=self.params.get('roi_padding', 0.02),
+            revalidate=self.params.get('roi_revalidate', 2.0),
+            cache=self._roi_cache)
+        self.log_message.emit(f"[ROI] 啟用電路板區域裁切 ({self.board_locator.method})，治具: {fixture}")
+    
+    def _open_tracker(self):
+        """依設定建立關鍵幀追蹤器"""
+        self.tracker = None
+        self._refresh_pending = False
+        if not self.params.get('track', False):
+            return
+        self.tracker = BoxTracker(self.params.get('keyframe_interval', 5),
+                                  iou_thres=self.params.get('track_iou', 0.3),
+                                  max_age=self.params.get('track_max_age', 30))
+        self.log_message.emit(f"[TRACK] 啟用缺陷追蹤，每 {self.tracker.keyframe_interval} 幀推理一次")
+    
+    def _close_tracker(self):
+        """記錄追蹤統計並釋放追蹤器（可重複呼叫）"""
+        tracker, self.tracker = self.tracker, None
+        if tracker is None:
+            return
+        st = tracker.stats()
+        counts = '，'.join(f"{k}: {v}" for k, v in tracker.unique_counts.items())
+        self.log_message.emit(
+            f"[TRACK] 推理 {st['keyframes']} 幀，追蹤傳遞 {st['propagated']} 幀，"
+            f"不重複缺陷 {st['unique']} 個{f' ({counts})' if counts else ''}")
+    
+    def _track_item(self, item):
+        """依幀序更新追蹤器：關鍵幀以檢測結果更新軌跡，非關鍵幀以預測傳遞檢測框
+        
+        不在此執行推理：提早補推理由推理階段（影片）或攝像頭迴圈決定，模型只在推理執行緒中執行
+        """
+        if item.get('refresh'):
+            self._refresh_pending = False
+        if item.get('results') is not None:
+            item['results'] = self.tracker.update(item['results'])
+        else:
+            item['results'] = self.tracker.predict()
+            item['propagated'] = True
+        return item
+    
+    def _open_golden(self):
+        """依設定載入黃金樣板（樣板特徵點於行程內快取），載入失敗時回傳 False"""
+        self.golden = None
+        if not self.params.get('golden_mode', False):
+            return True
+        path = self.params.get('golden_image', '')
+        try:
+            self.golden = load_template(path)
+        except Exception as e:
+            self.error_occurred.emit(f"黃金樣板載入失敗: {path} ({e})")
+            return False
+        self.log_message.emit(f"[GOLDEN] 樣板比對模式: {self.golden.name}，只推理差異區域")
+        return True
+    
+    def _golden_tiles(self, img0):
+        """與黃金樣板差分並只對差異區域切片，回傳切片列表（良品為空列表）；未啟用或對位失敗時回傳 None"""
+        if self.golden is None:
+            return None
+        regions = self.golden.changed_regions(img0)
+        if regions is None:
+            return None
+        h, w = img0.shape[:2]
+        windows = region_windows(regions, h, w, int(self.params.get('tile_size', 640)),
+                                 float(self.params.get('tile_overlap', 0.2)))
+        return self._prepare_tiles(img0, windows)
+    
+    def _locate_board(self, img0):
+        """回傳電路板區域 (x0, y0, x1, y1)，未啟用或未找到時為 None"""
+        if self.board_locator is None:
+            return None
+        return self.board_locator.locate(img0, self._roi_key)
+    
+    @staticmethod
+    def _crop_roi(img0, roi):
+        """裁切電路板區域（視圖，不複製）"""
+        if roi is None:
+            return img0
+        x0, y0, x1, y1 = roi
+        return img0[y0:y1, x0:x1]
+    
+    @staticmethod
+    def _offset_roi(det, roi):
+        """將裁切區域座標的檢測框 (n, 6) 平移回整幀座標"""
+        if roi is not None and det is not None and len(det):
+            det[:, [0, 2]] += roi[0]
+            det[:, [1, 3]] += roi[1]
+        return det
     
     def _detect_image(self, image_path):
         """檢測單張圖片"""
         try:
             self.log_message.emit(f"正在檢測圖片: {image_path}")
             
-            # 讀取圖片
-            img = cv2.imread(image_path)
-            if img is None:
-                self.error_occurred.emit(f"無法讀取圖片: {image_path}")
-                return
-
-            self.log_message.emit("圖片讀取成功，開始執行推理")
-            # 執行檢測
-            results = self._inference(img)
-            self.log_message.emit("推理完成，準備顯示圖像")
-
-            # 在worker線程準備顯示圖像
-            display_pixmap = self._prepare_display_image(img, results)
-            
-            # 發送結果
-            if display_pixmap:
-                self.log_message.emit("已生成顯示用圖像，發送至UI")
-                self.frame_processed.emit(display_pixmap)
-            self.detection_result.emit({
-                'image_path': image_path,
-                'detections': results,
-                'count': len(results) if results else 0
-            })
-            self.log_message.emit(f"檢測結果已發送，檢測到 {len(results) if results else 0} 個目標")
-
-            # 保存結果（需要用原圖+標註）
-            if self.params.get('output'):
-                self.log_message.emit("正在保存檢測結果")
-                annotated_img = self._draw_results(img, results)
-                self._save_results(image_path, annotated_img, results)
-                self.log_message.emit("檢測結果保存完成")
+            def on_item(item):
+                if isinstance(item, StageFailure):
+                    self.error_occurred.emit(f"圖片檢測失敗: {item.error}")
+                else:
+                    self.log_message.emit(f"檢測結果已發送，檢測到 {len(item['results'])} 個目標")
             
-            self.detection_finished.emit(self.params.get('output', ''))
+            pipeline = self._build_pipeline()
+            self._consume(pipeline, [{'path': image_path, 'save': True}], on_item=on_item)
             self.log_message.emit("圖片檢測流程結束")
+            self._close_writer()
+            
+            self.detection_finished.emit(self.params.get('output', ''))
         except Exception as e:
             self.error_occurred.emit(f"圖片檢測失敗: {str(e)}")
+        finally:
+            self._close_writer()
+    
+    def _open_writer(self):
+        """依輸出設定建立背景結果寫入器"""
+        output = self.params.get('output')
+        if not output:
+            return
+        self.writer = ResultWriter(
+            output,
+            draw_fn=self._draw_results,
+            workers=self.params.get('writer_workers', 2),
+            maxsize=self.params.get('writer_queue', 32),
+            image_format=self.params.get('save_format', 'jpg'),
+            quality=self.params.get('save_quality', 95),
+            png_level=self.params.get('png_level', 3),
+            defective_only=self.params.get('save_defective_only', False),
+            save_txt=self.params.get('save_txt', False),
+            save_conf=self.params.get('save_conf', False),
+            combined_labels=self.params.get('combined_labels', False))
+    
+    def _close_writer(self):
+        """等待背景寫入完成並記錄寫入統計（可重複呼叫）"""
+        writer, self.writer = self.writer, None
+        if writer is None:
+            return
+        writer.close()
+        st = writer.stats()
+        if st['submitted']:
+            self.log_message.emit(
+                f"[WRITER] 寫入 {st['written']} 張，略過 {st['skipped']} 張，丟棄 {st['dropped']} 張，"
+                f"錯誤 {st['errors']}，最大佇列深度 {st['max_queue_depth']}，"
+                f"平均延遲 {st['avg_latency_ms']:.0f} ms（編碼 {st['avg_encode_ms']:.0f} ms）")
+    
+    def _open_recorder(self, fps, name, timed=False):
+        """依錄影設定建立並啟動錄影器（timed: 依幀的處理時間排列影片時間軸）"""
+        if not self.params.get('record_video', False):
+            return
+        record_dir = self.params.get('record_dir') or os.path.join(self.params.get('output') or 'runs/detect',
+                                                                     'records')
+        self.recorder = VideoRecorder(
+            record_dir, fps,
+            annotated=self.params.get('record_annotated', True),
+            draw_fn=self._draw_results,
+            segment_seconds=self.params.get('record_segment_minutes', 0) * 60,
+            segment_mb=self.params.get('record_segment_mb', 0),
+            prefix=name,
+            timed=timed).start()
+        self.log_message.emit(f"[RECORD] 開始錄影: {record_dir} ({fps:.1f} FPS" +
+                              ("，依實際時間排列）" if timed else "）"))
+    
+    def _close_recorder(self):
+        """停止錄影並記錄寫入與丟幀統計（可重複呼叫）"""
+        recorder, self.recorder = self.recorder, None
+        if recorder is None:
+            return
+        recorder.stop()
+        st = recorder.stats()
+        self.log_message.emit(
+            f"[RECORD] 錄影結束: 寫入 {st['written']} 幀（重複補幀 {st['repeated']}，同影格略過 {st['skipped']}），"
+            f"丟棄 {st['dropped']} 幀，錯誤 {st['errors']}，"
+            f"{st['segments']} 個分段，平均編碼 {st['avg_encode_ms']:.1f} ms")
     
     def _detect_video(self, video_path):
         """檢測視頻"""
@@ -181,37 +401,33 @@ class DetectionWorker(QThread):
                 return
             
             total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            frame_count = 0
-            
-            while self.running and cap.isOpened():
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                
-                # 執行檢測
-                results = self._inference(frame)
-                
-                # 在worker線程準備顯示圖像
-                display_pixmap = self._prepare_display_image(frame, results)
-                
-                # 發送結果
-                if display_pixmap:
-                    self.frame_processed.emit(display_pixmap)
-                self.detection_result.emit({
-                    'frame_index': frame_count,
-                    'detections': results,
-                    'count': len(results) if results else 0
-                })
-                
-                # 更新進度
-                frame_count += 1
-                progress = int((frame_count / total_frames) * 100)
-                self.progress_updated.emit(progress)
-                
-                # 控制幀率
-                self.msleep(33)  # ~30 FPS
-                
-            cap.release()
+            video_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+            realtime = self.params.get('realtime_preview', False)
+            self._open_recorder(video_fps, Path(video_path).stem)
+            self._open_tracker()
+            try:
+                if realtime:
+                    # 即時預覽：依影片原始幀率輸出，逐幀推理
+                    self.log_message.emit(f"即時預覽模式，依原始幀率 {video_fps:.1f} FPS 播放")
+                    pipeline = self._build_pipeline(maxsize=4)
+                    pacer = self._make_pacer(1.0 / video_fps)
+                    self._display_interval = 0.0
+                else:
+                    # 離線分析：背景執行緒解碼，不限速批次推理，顯示更新限制在約15 FPS
+                    batch_size = max(1, int(self.params.get('batch_size', 8)))
+                    self.log_message.emit(f"離線分析模式，批次大小 {batch_size}")
+                    pipeline = self._build_pipeline(2, batch_size, maxsize=batch_size * 2)
+                    pacer = None
+                    self._display_interval = 1.0 / 15
+                t0 = time.time()
+                frame_count = self._consume(pipeline, self._read_frames(cap), total_frames, on_item=pacer)
+                elapsed = max(time.time() - t0, 1e-6)
+                self.log_message.emit(f"視頻檢測完成: {frame_count} 幀，{frame_count / elapsed:.1f} FPS")
+            finally:
+                cap.release()
+                self._close_recorder()
+                self._close_tracker()
+                self._display_interval = 0.0
             self.detection_finished.emit(self.params.get('output', ''))
             
         except Exception as e:
@@ -228,42 +444,77 @@ class DetectionWorker(QThread):
                 self.error_occurred.emit(f"無法開啟攝像頭: {camera_id}")
                 return
             self.log_message.emit(f"[CAMERA] 攝像頭開啟成功: {camera_id}")
+            self.camera.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            
+            # 擷取執行緒只保留最新一幀，推理空閒時直接取最新幀，延遲不受驅動緩衝深度影響
+            grabber = LatestFrameGrabber(self.camera).start()
+            # 擷取執行緒會丟棄推理來不及處理的幀，錄影以時間戳排列，播放速度與分段長度才與實際時間一致
+            self._open_recorder(self.camera.get(cv2.CAP_PROP_FPS) or 30.0, f"camera{camera_id}", timed=True)
+            # 畫面變化閘門：輸送帶空轉或板子靜止時沿用上一次的檢測結果
+            gate = None
+            if self.params.get('change_gate', False):
+                gate = ChangeDetector(self.params.get('change_method', 'diff'),
+                                      self.params.get('change_sensitivity', 0.8),
+                                      self.params.get('change_refresh', 5.0))
+                self.log_message.emit(f"[CAMERA] 啟用變化偵測 ({gate.method})，強制刷新間隔 {gate.refresh_interval}s")
+            self._open_tracker()
+            last_results = None
             frame_count = 0
-            while self.running and self.camera.isOpened():
-                ret, frame = self.camera.read()
-                if not ret:
-                    self.log_message.emit(f"[CAMERA] 讀取影像幀失敗 (ret=False)，frame_count={frame_count}")
-                    continue
-                if frame is None:
-                    self.log_message.emit(f"[CAMERA] frame is None，frame_count={frame_count}")
-                    continue
-                # 檢查停止條件
-                if not self.running:
-                    self.log_message.emit("[CAMERA] 檢測被用戶中斷")
-                    break
-                # 幀跳過機制，降低UI負載
-                self.frame_counter += 1
-                if self.frame_counter % self.frame_skip != 0:
-                    self.msleep(33)
-                    continue
-                try:
-                    results = self._inference(frame)
-                    display_pixmap = self._prepare_display_image(frame, results)
-                    if display_pixmap:
-                        self.frame_processed.emit(display_pixmap)
-                    self.detection_result.emit({
-                        'frame_index': frame_count,
-                        'detections': results,
-                        'count': len(results) if results else 0
-                    })
-                    self.log_message.emit(f"[CAMERA] 成功取得影像幀: {frame_count}")
-                except Exception as frame_error:
-                    self.log_message.emit(f"[CAMERA] 幀 {frame_count} 處理失敗: {str(frame_error)}")
-                    display_pixmap = self._prepare_display_image(frame, None)
-                    if display_pixmap:
-                        self.frame_processed.emit(display_pixmap)
-                frame_count += 1
-                self.msleep(33)
+            last_seq = -1
+            last_report = time.time()
+            try:
+                while self.running:
+                    seq, frame = grabber.read(last_seq, timeout=1.0)
+                    if frame is None:
+                        if not grabber.alive:
+                            self.log_message.emit("[CAMERA] 擷取執行緒已結束")
+                            break
+                        continue
+                    last_seq = seq
+                    item = {'index': seq, 'img0': frame}
+                    try:
+                        tracker = self.tracker
+                        if last_results is not None and tracker is not None and not tracker.due():
+                            item['results'] = None  # 非關鍵幀：由追蹤器傳遞
+                        elif (gate and last_results is not None and not (tracker and tracker.needs_refresh())
+                              and not gate.should_infer(frame)[0]):
+                            item['results'] = None if tracker else last_results
+                            item['reused'] = True
+                        else:
+                            # 追蹤器要求推理的幀：幀號因最新幀優先而不連續，不可依幀號取模判斷關鍵幀
+                            item['keyframe'] = True
+                            item = self._stage_infer([self._stage_decode(item)])[0]
+                        if tracker is not None:
+                            item = self._track_item(item)
+                        if gate and item.get('inferred'):
+                            gate.mark_inferred(frame)  # 比較基準一律為最後一次實際推理的幀
+                        last_results = item['results']
+                        item = self._stage_render(item)
+                    except Exception as frame_error:
+                        item = StageFailure('camera', frame_error, item)
+                    if not self.running:
+                        self.log_message.emit("[CAMERA] 檢測被用戶中斷")
+                        break
+                    extra = grabber.stats()
+                    if gate:
+                        extra['reused'] = bool(isinstance(item, dict) and item.get('reused'))
+                        extra['inference_skipped'] = gate.skipped
+                    self._emit_item(item, extra=extra)
+                    frame_count += 1
+                    if time.time() - last_report >= 5.0:
+                        st = grabber.stats()
+                        skipped = f"，略過推理 {gate.skipped} 幀" if gate else ""
+                        self.log_message.emit(
+                            f"[CAMERA] 已處理 {st['processed']} 幀，丟棄 {st['dropped']} 幀 (擷取 {st['captured']} 幀){skipped}")
+                        last_report = time.time()
+            finally:
+                grabber.stop()
+                self._close_recorder()
+                self._close_tracker()
+            st = grabber.stats()
+            self.log_message.emit(f"[CAMERA] 擷取 {st['captured']} 幀，處理 {st['processed']} 幀，丟棄 {st['dropped']} 幀")
+            if gate:
+                self.log_message.emit(f"[CAMERA] 畫面未變化略過推理 {gate.skipped}/{gate.checked} 幀")
             self.log_message.emit(f"[CAMERA] 偵測結束，總共取得幀數: {frame_count}")
             if self.camera:
                 self.camera.release()
@@ -278,7 +529,7 @@ class DetectionWorker(QThread):
                 self.camera = None
     
     def _detect_folder(self, folder_path):
-        """批次檢測資料夾中的圖片"""
+        """批次檢測資料夾中的圖片（預讀解碼 + 批次推理 + 背景保存）"""
         try:
             self.log_message.emit(f"正在批次檢測資料夾: {folder_path}")
             
@@ -290,116 +541,372 @@ class DetectionWorker(QThread):
             for ext in supported_formats:
                 image_files.extend(Path(folder_path).glob(f'*{ext}'))
                 image_files.extend(Path(folder_path).glob(f'*{ext.upper()}'))
+            image_files = sorted(set(image_files))
             
             if not image_files:
                 self.error_occurred.emit(f"資料夾中未找到支援的圖片檔案: {folder_path}")
                 return
             
             total_images = len(image_files)
-            self.log_message.emit(f"找到 {total_images} 張圖片")
+            batch_size = max(1, int(self.params.get('batch_size', 8)))
+            prefetch_workers = max(1, int(self.params.get('prefetch_workers', 4)))
+            self.log_message.emit(f"找到 {total_images} 張圖片，批次大小 {batch_size}，預讀執行緒 {prefetch_workers}")
             
-            # 逐個處理圖片
-            for i, image_path in enumerate(image_files):
-                if not self.running:
-                    break
-                
-                try:
-                    # 讀取圖片
-                    img = cv2.imread(str(image_path))
-                    if img is None:
-                        self.log_message.emit(f"跳過無法讀取的圖片: {image_path}")
-                        continue
-                      # 執行檢測
-                    results = self._inference(img)
-                    
-                    # 在worker線程準備顯示圖像
-                    display_pixmap = self._prepare_display_image(img, results)
-                    
-                    # 發送結果
-                    if display_pixmap:
-                        self.frame_processed.emit(display_pixmap)
-                    self.detection_result.emit({
-                        'image_path': str(image_path),
-                        'detections': results,
-                        'count': len(results) if results else 0
-                    })                    # 保存結果（需要用原圖+標註）
-                    if self.params.get('output'):
-                        annotated_img = self._draw_results(img, results)
-                        self._save_results(str(image_path), annotated_img, results)
-                    
-                    # 更新進度
-                    progress = int(((i + 1) / total_images) * 100)
-                    self.progress_updated.emit(progress)
-                    
-                except Exception as e:
-                    self.log_message.emit(f"處理圖片失敗 {image_path}: {str(e)}")
-                    continue
-                    
+            # 每個批次只更新一次顯示，降低UI負載
+            source = ({'path': f, 'save': True,
+                       'display': i % batch_size == batch_size - 1 or i == total_images - 1}
+                      for i, f in enumerate(image_files))
+            pipeline = self._build_pipeline(prefetch_workers, batch_size, maxsize=batch_size * 2)
+            
+            t0 = time.time()
+            processed = self._consume(pipeline, source, total_images)
+            elapsed = max(time.time() - t0, 1e-6)
+            self.log_message.emit(f"批次檢測完成: {processed} 張圖片，{processed / elapsed:.1f} 張/秒")
+            self._log_pipeline_stats(pipeline)
+            self._close_writer()
             self.detection_finished.emit(self.params.get('output', ''))
             
         except Exception as e:
             self.error_occurred.emit(f"批次檢測失敗: {str(e)}")
-            
-    def _inference(self, img):
-        """執行模型推理（自動對齊 detect.py 標註座標與類別）"""
-        try:
-            import torch
-            from utils.general import non_max_suppression, scale_coords
-            # 保留原圖尺寸
-            orig_h, orig_w = img.shape[:2]
-            # BGR to RGB
-            if len(img.shape) == 3 and img.shape[2] == 3:
-                img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    
+    def _make_pacer(self, frame_interval):
+        """建立依固定幀間隔輸出的節拍器（補償推理耗時，而非固定睡眠）"""
+        state = {'next': None}
+        
+        def pace(item):
+            now = time.time()
+            if state['next'] is None:
+                state['next'] = now
+            state['next'] += frame_interval
+            delay = state['next'] - now
+            if delay > 0:
+                self.msleep(int(delay * 1000))
             else:
-                img_rgb = img
-            self.log_message.emit("圖像已從 BGR 轉換為 RGB")
-            # resize to model input
+                state['next'] = now  # 落後時不累積延遲
+        return pace
+    
+    def _display_due(self):
+        """依 _display_interval 限制顯示圖像的產生頻率"""
+        if self._display_interval <= 0:
+            return True
+        with self._display_lock:
+            now = time.time()
+            if now - self._last_display >= self._display_interval:
+                self._last_display = now
+                return True
+            return False
+    
+    def _read_frames(self, cap):
+        """依序讀取視頻幀（於管線來源執行緒中執行）"""
+        index = 0
+        while self.running and cap.isOpened():
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield {'index': index, 'img0': frame}
+            index += 1
+    
+    def _build_pipeline(self, decode_workers=1, batch_size=1, maxsize=8):
+        """建立 解碼 → 推理 → 繪製/保存 三階段管線"""
+        render_workers = max(1, int(self.params.get('render_workers', 2)))
+        stages = [
+            Stage('decode', self._stage_decode, decode_workers),
+            Stage('infer', self._stage_infer, 1, batch_size),  # 模型只在單一執行緒中執行
+        ]
+        if self.tracker is None:
+            stages.append(Stage('render', self._stage_render, render_workers))
+        # 啟用追蹤時軌跡必須依幀序更新，繪製改在 _consume 中於追蹤之後執行
+        return Pipeline(stages, maxsize=maxsize)
+    
+    def _consume(self, pipeline, source, total=0, on_item=None):
+        """依序取出管線結果並於本執行緒發送信號，回傳處理數量"""
+        count = 0
+        last_progress = -1
+        for item in pipeline.run(source):
+            if not self.running:
+                break
+            count += 1
+            if self.tracker is not None:
+                if not isinstance(item, StageFailure):
+                    item = self._stage_render(self._track_item(item))
+                else:
+                    self._refresh_pending = False  # 提早推理的幀可能在失敗的批次中，允許重新提早推理
+            self._emit_item(item)
+            if total:
+                progress = min(100, int(count / total * 100))
+                if progress != last_progress:
+                    self.progress_updated.emit(progress)
+                    last_progress = progress
+            if on_item:
+                on_item(item)
+        return count
+    
+    def _emit_item(self, item, extra=None):
+        """發送單一處理結果的顯示圖像與檢測結果信號"""
+        if isinstance(item, StageFailure):
+            self.log_message.emit(f"處理失敗 [{item.stage}]: {item.error}")
+            payload = item.payload if isinstance(item.payload, dict) else {}
+            if payload.get('img0') is not None and payload.get('display', True):
+                display_image = self._prepare_display_image(payload['img0'], None)
+                if display_image is not None:
+                    self.frame_processed.emit(display_image)
+            return
+        if item.get('display_image') is not None:
+            self.frame_processed.emit(item['display_image'])
+        if self.recorder:
+            self.recorder.submit(item['img0'], item['results'], item.get('index'))
+        result = {
+            'detections': item['results'],
+            'count': len(item['results']),
+            'counts': item['results'].counts,
+        }
+        if self.tracker is not None:
+            # 每個追蹤ID只計數一次，不隨幀數膨脹
+            result['unique_count'] = self.tracker.unique_count
+            result['unique_counts'] = self.tracker.unique_counts
+            result['track_ids'] = item['results'].ids.tolist() if item['results'].ids is not None else []
+            result['propagated'] = item.get('propagated', False)
+        if 'path' in item:
+            result['image_path'] = str(item['path'])
+        else:
+            result['frame_index'] = item['index']
+        if extra:
+            result.update(extra)
+        self.detection_result.emit(result)
+    
+    def _log_pipeline_stats(self, pipeline):
+        """記錄各階段處理數量與忙碌時間"""
+        for name, st in pipeline.stats().items():
+            self.log_message.emit(
+                f"[PIPELINE] {name}: {st['processed']} 項, {st['workers']} 執行緒, 忙碌 {st['busy_time']:.2f}s")
+    
+    def _stage_decode(self, item):
+        """解碼階段：讀取圖片並letterbox"""
+        if item.get('img0') is None:
+            item['img0'] = cv2.imread(str(item['path']))
+            if item['img0'] is None:
+                raise IOError(f"無法讀取圖片: {item['path']}")
+        if self.tracker is not None and item.get('keyframe') is None:
+            item['keyframe'] = not item.get('index', 0) % self.tracker.keyframe_interval
+        if item.get('keyframe') is False:
+            return item  # 非關鍵幀不推理，由追蹤器傳遞檢測框
+        return self._prepare_input(item)
+    
+    def _prepare_input(self, item):
+        """前處理：樣板比對差異區域、電路板區域裁切、切片或letterbox"""
+        tiles = self._golden_tiles(item['img0'])
+        if tiles is not None:
+            # 樣板比對模式：對位已處理板子位置，只推理差異區域
+            item['tiles'], item['img'], item['roi'] = tiles, None, None
+            return item
+        item['roi'] = self._locate_board(item['img0'])
+        src = self._crop_roi(item['img0'], item['roi'])  # 只有電路板區域進入推理
+        if self._use_tiles(src):
+            item['tiles'] = self._prepare_tiles(src)  # 切片於解碼執行緒中完成裁切與letterbox
+            item['img'] = None
+        else:
+            item['img'], item['ratio_pad'] = self._preprocess(src)
+            item['crop_shape'] = src.shape
+        return item
+    
+    def _stage_infer(self, items):
+        """推理階段：相同輸入尺寸的項目合併為單次模型推理"""
+        groups = {}
+        for item in items:
+            if item.get('keyframe') is False:
+                if not self.tracker.stale or self._refresh_pending:
+                    item['results'] = None
+                    continue
+                # 軌跡信心度已衰減，提早推理此幀；前處理在推理執行緒中補做，模型仍只在此執行緒執行
+                try:
+                    self._prepare_input(item)
+                except Exception as e:  # 前處理失敗時仍由追蹤器傳遞，不影響同批次的其他幀
+                    self.log_message.emit(f"[TRACK] 提早推理前處理失敗: {e}")
+                    item['results'] = None
+                    continue
+                self._refresh_pending = True  # 追蹤器處理此幀前不再重複提早推理
+                item['keyframe'], item['refresh'] = True, True
+            item['inferred'] = True
+            if item.get('tiles') is not None:
+                t = time.time()
+                det = self._offset_roi(self._predict_tiles(item['tiles']), item.get('roi'))
+                item['results'] = self._to_detections(det, item['img0'].shape)
+                if item['tiles']:
+                    self.log_message.emit(f"切片推理: {len(item['tiles'])} 個切片，{(time.time() - t) * 1000:.0f} ms")
+                item['tiles'] = None
+                continue
+            groups.setdefault(item['img'].shape, []).append(item)
+        for group in groups.values():
+            preds = self._predict_batch([(it['crop_shape'], it['img'], it['ratio_pad']) for it in group])
+            for it, det in zip(group, preds):
+                it['results'] = self._to_detections(self._offset_roi(det, it.get('roi')), it['img0'].shape)
+                it['img'] = None  # 釋放前處理緩衝
+        return items
+    
+    def _stage_render(self, item):
+        """繪製/保存階段：準備顯示圖像並保存標註結果"""
+        if item.get('display', True) and self._display_due():
+            item['display_image'] = self._prepare_display_image(item['img0'], item['results'])
+        if item.get('save') and self.writer:
+            # 全解析度繪製與編碼寫檔交給背景寫入器
+            self.writer.submit(str(item['path']), item['img0'], item['results'])
+        return item
+    
+    def _preprocess(self, img0):
+        """letterbox至模型輸入尺寸，回傳 CHW RGB uint8 陣列與 (ratio, pad)
+        
+        以最小填充的矩形（邊長對齊 stride）推理而非補成正方形，640x480 的影像即以 640x480 推理；
+        每種輸入解析度的縮放比例與填充量只計算一次。固定輸入尺寸的後端（ONNX/INT8）補成匯出時的 (h, w)。
+        """
+        from utils.datasets import letterbox
+        from utils.general import make_divisible
+        stride = self._model_stride()
+        target_size = getattr(self.model, 'input_hw', None)
+        auto = target_size is None
+        if auto:
             target_size = self.params.get('imgsz', 640)
             if isinstance(target_size, (list, tuple)):
                 target_size = target_size[0]
-            if img_rgb.shape[0] != target_size or img_rgb.shape[1] != target_size:
-                img_resized = cv2.resize(img_rgb, (target_size, target_size))
-                self.log_message.emit(f"圖像已調整為 {target_size}x{target_size}")
+            target_size = make_divisible(target_size, stride)  # 長邊同樣對齊最大步長
+        h, w = img0.shape[:2]
+        key = (h, w, target_size, auto, stride)
+        cached = self._shape_cache.get(key)
+        if cached is None:
+            img, ratio, pad = letterbox(img0, target_size, auto=auto, stride=stride)
+            self._shape_cache[key] = (ratio, pad, img.shape[:2])
+            self.log_message.emit(f"輸入解析度 {w}x{h} → 推理尺寸 {img.shape[1]}x{img.shape[0]}")
+        else:
+            ratio, pad, _ = cached
+            img = self._apply_letterbox(img0, ratio[0], pad)
+        img = np.ascontiguousarray(img[:, :, ::-1].transpose(2, 0, 1))  # BGR to RGB, HWC to CHW
+        return img, (ratio, pad)
+    
+    def _model_stride(self):
+        """矩形推理尺寸須對齊的最大步長（P6/P7 模型為 64/128）"""
+        stride = getattr(self.model, 'stride', None)
+        return max(int(stride.max()), 32) if stride is not None else 32
+    
+    @staticmethod
+    def _apply_letterbox(img0, r, pad, color=(114, 114, 114)):
+        """以快取的縮放比例與填充量執行 letterbox（與 utils.datasets.letterbox 輸出一致）"""
+        h, w = img0.shape[:2]
+        new_unpad = int(round(w * r)), int(round(h * r))
+        img = cv2.resize(img0, new_unpad, interpolation=cv2.INTER_LINEAR) if (w, h) != new_unpad else img0
+        dw, dh = pad
+        top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+        left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+        return cv2.copyMakeBorder(img, top, bottom, left, right, cv2.BORDER_CONSTANT, value=color)
+    
+    def _inference_batch(self, batch):
+        """對多張已前處理的圖片執行單次模型推理與整批NMS
+        
+        Args:
+            batch: [(原圖, CHW陣列, (ratio, pad)), ...]，所有CHW陣列尺寸相同
+        Returns:
+            list: 每張圖片的 DetectionResult
+        """
+        preds = self._predict_batch([(img0.shape, img, ratio_pad) for img0, img, ratio_pad in batch])
+        return [self._to_detections(det, img0.shape) for det, (img0, _, _) in zip(preds, batch)]
+    
+    def _predict_batch(self, batch):
+        """模型推理 + NMS，回傳原圖座標的 (n, 6) 張量列表
+        
+        Args:
+            batch: [(原圖尺寸, CHW陣列, (ratio, pad)), ...]，所有CHW陣列尺寸相同
+        """
+        from utils.general import non_max_suppression, non_max_suppression_candidates, scale_coords
+        if not batch:
+            return []
+        x = torch.from_numpy(np.stack([img for _, img, _ in batch], 0)).to(self.device)
+        p = next(self.model.parameters())
+        x = x.type_as(p) / 255.0
+        conf_thres = self.params.get('conf_thres', 0.25)
+        iou_thres = self.params.get('iou_thres', 0.45)
+        method = self.params.get('nms_method', 'batched')
+        precision = self.params.get('precision', 'fp32')
+        with torch.no_grad():
+            if hasattr(self.model, 'forward_candidates'):
+                # 先以物件信心度篩選再解碼，只對存活的候選框做座標/類別計算
+                with autocast(self.device, precision):
+                    candidates = self.model.forward_candidates(x, conf_thres)
+                pred = non_max_suppression_candidates(candidates.float(), x.shape[0], iou_thres,
+                                                      classes=self.params.get('classes'),
+                                                      max_det=self.params.get('max_det', 300),
+                                                      method=method, score_thres=conf_thres)
+            else:
+                with autocast(self.device, precision):
+                    pred = self.model(x)[0]
+                pred = non_max_suppression(pred.float(), conf_thres, iou_thres, classes=self.params.get('classes'),
+                                           method=method, max_det=self.params.get('max_det', 300), time_limit=None)
+        for det, (shape0, _, ratio_pad) in zip(pred, batch):
+            if det is not None and len(det):
+                det[:, :4] = scale_coords(x.shape[2:], det[:, :4], shape0, ratio_pad).round()
+        return pred
+    
+    def _use_tiles(self, img0):
+        """是否對此影像使用切片推理（啟用且影像大於切片尺寸時）"""
+        if not self.params.get('tile_inference', False):
+            return False
+        return max(img0.shape[:2]) > int(self.params.get('tile_size', 640))
+    
+    def _prepare_tiles(self, img0, windows=None):
+        """切出重疊切片（或指定視窗）並逐一letterbox，回傳 [(視窗, CHW陣列, (ratio, pad)), ...]"""
+        if windows is None:
+            h, w = img0.shape[:2]
+            windows = tile_windows(h, w, int(self.params.get('tile_size', 640)),
+                                   float(self.params.get('tile_overlap', 0.2)))
+        tiles = []
+        for x0, y0, x1, y1 in windows:
+            img, ratio_pad = self._preprocess(img0[y0:y1, x0:x1])
+            tiles.append(((x0, y0, x1, y1), img, ratio_pad))
+        return tiles
+    
+    def _predict_tiles(self, tiles):
+        """批次推理所有切片，映射回原圖座標並合併接縫重複框"""
+        batch_size = max(1, int(self.params.get('batch_size', 8)))
+        dets = []
+        for i in range(0, len(tiles), batch_size):
+            chunk = tiles[i:i + batch_size]
+            dets.extend(self._predict_batch([((y1 - y0, x1 - x0), img, rp) for (x0, y0, x1, y1), img, rp in chunk]))
+        windows = [window for window, _, _ in tiles]
+        return merge_tile_detections(dets, windows, self.params.get('iou_thres', 0.45),
+                                     self.params.get('tile_merge', 'nms'))
+    
+    def _to_detections(self, det, shape=None):
+        """將 NMS 輸出 (xyxy, conf, cls) 轉換為欄位式檢測結果（單一 NumPy 陣列，名稱等衍生欄位延遲計算）"""
+        names = self.model.names if hasattr(self.model, 'names') else []
+        return DetectionResult.from_tensor(det, names, shape)
+    
+    def _inference(self, img):
+        """對單張圖片執行 letterbox 矩形推理，座標以實際縮放比例/填充量還原至原圖
+        
+        啟用電路板區域裁切時只推理裁切區域，檢測框再平移回整幀座標
+        """
+        try:
+            tiles = self._golden_tiles(img)
+            if tiles is not None:
+                return self._to_detections(self._predict_tiles(tiles), img.shape)
+            roi = self._locate_board(img)
+            src = self._crop_roi(img, roi)
+            if self._use_tiles(src):
+                det = self._predict_tiles(self._prepare_tiles(src))
             else:
-                img_resized = img_rgb
-            # to tensor
-            img_tensor = torch.from_numpy(img_resized).permute(2, 0, 1).float().unsqueeze(0) / 255.0
-            img_tensor = img_tensor.to(self.device)
-            self.log_message.emit(f"圖像已轉換為 Tensor: {img_tensor.shape}")
-            # 推理
-            self.log_message.emit(f"模型類型: {type(self.model)}")
-            with torch.no_grad():
-                pred = self.model(img_tensor)[0]
-            self.log_message.emit("模型推理執行成功")
-            # NMS
-            conf_thres = self.params.get('conf_thres', 0.25)
-            iou_thres = self.params.get('iou_thres', 0.45)
-            pred = non_max_suppression(pred, conf_thres, iou_thres)[0]
-            detections = []
-            if pred is not None and len(pred):
-                # scale boxes to original image
-                pred[:, :4] = scale_coords(img_tensor.shape[2:], pred[:, :4], (orig_h, orig_w)).round()
-                names = self.model.names if hasattr(self.model, 'names') else []
-                for *xyxy, conf, cls in pred:
-                    bbox = [float(xyxy[0]), float(xyxy[1]), float(xyxy[2]), float(xyxy[3])]
-                    class_id = int(cls)
-                    class_name = names[class_id] if names and class_id < len(names) else str(class_id)
-                    detection = {
-                        'class': class_name,
-                        'confidence': float(conf),
-                        'bbox': bbox
-                    }
-                    detections.append(detection)
-            self.log_message.emit(f"檢測到 {len(detections)} 個目標")
-            return detections
+                img_chw, ratio_pad = self._preprocess(src)
+                det = self._predict_batch([(src.shape, img_chw, ratio_pad)])[0]
+            return self._to_detections(self._offset_roi(det, roi), img.shape)
         except Exception as e:
             self.log_message.emit(f"推理型態錯誤: {str(e)}")
-            return []
+            return DetectionResult(shape=img.shape)
     
-    def _draw_results(self, img, results):
-        """在圖片上繪製檢測結果"""
+    def _draw_results(self, img, results, scale=1.0, inplace=False):
+        """在圖片上繪製檢測結果
+        
+        Args:
+            scale: 檢測框座標的縮放比例（於已縮小的顯示影像上繪製時使用）
+            inplace: 直接繪製在傳入的影像上（呼叫端自備緩衝時避免多一次複製）
+        """
         try:
-            annotated_img = img.copy()
+            annotated_img = img if inplace else img.copy()
             
             if not results:
                 return annotated_img
@@ -419,11 +926,9 @@ class DetectionWorker(QThread):
                 'spurious_copper': (255, 255, 0)  # 青色
             }
             
-            for detection in results:
-                bbox = detection['bbox']
-                class_name = detection['class']
-                confidence = detection['confidence']
-                
+            boxes = results.xyxy * scale if scale != 1.0 else results.xyxy
+            ids = results.ids.tolist() if results.ids is not None else [None] * len(results)
+            for bbox, confidence, class_name, track_id in zip(boxes.tolist(), results.conf.tolist(), results.labels, ids):
                 # 獲取顏色
                 color = colors.get(class_name, (128, 128, 128))
                 
@@ -436,8 +941,10 @@ class DetectionWorker(QThread):
                 # 繪製標籤
                 if not hide_labels or not hide_conf:
                     label = ""
+                    if track_id is not None:
+                        label = f"#{track_id}"
                     if not hide_labels:
-                        label += class_name
+                        label = f"{label} {class_name}" if label else class_name
                     if not hide_conf:
                         if label:
                             label += f" {confidence:.2f}"
@@ -466,97 +973,54 @@ class DetectionWorker(QThread):
             self.log_message.emit(f"繪製結果失敗: {str(e)}")
             return img
     
-    def _save_results(self, image_path, annotated_img, results):
-        """保存檢測結果"""
-        try:
-            output_dir = self.params.get('output', 'runs/detect')
-            os.makedirs(output_dir, exist_ok=True)
-            
-            # 獲取檔案名稱
-            image_name = os.path.basename(image_path)
-            name_without_ext = os.path.splitext(image_name)[0]
-            
-            # 保存標註圖片
-            output_image_path = os.path.join(output_dir, image_name)
-            cv2.imwrite(output_image_path, annotated_img)
-            
-            # 保存標註文件
-            if self.params.get('save_txt', False):
-                txt_path = os.path.join(output_dir, f"{name_without_ext}.txt")
-                with open(txt_path, 'w') as f:
-                    for detection in results:
-                        bbox = detection['bbox']
-                        class_name = detection['class']
-                        confidence = detection['confidence']
-                        
-                        # 轉換為YOLO格式（相對坐標）
-                        img_h, img_w = annotated_img.shape[:2]
-                        x_center = (bbox[0] + bbox[2]) / 2 / img_w
-                        y_center = (bbox[1] + bbox[3]) / 2 / img_h
-                        width = (bbox[2] - bbox[0]) / img_w
-                        height = (bbox[3] - bbox[1]) / img_h
-                        
-                        # 寫入文件
-                        if self.params.get('save_conf', False):
-                            f.write(f"{class_name} {x_center:.6f} {y_center:.6f} {width:.6f} {height:.6f} {confidence:.6f}\n")
-                        else:
-                            f.write(f"{class_name} {x_center:.6f} {y_center:.6f} {width:.6f} {height:.6f}\n")
-            
-        except Exception as e:
-            self.log_message.emit(f"保存結果失敗: {str(e)}")
-    
     def set_display_size(self, width, height):
         """設置顯示區域大小，用於優化影像縮放"""
         self.display_size = (width, height)
         self.log_message.emit(f"顯示區域設置為: {width}x{height}")
     
     def _prepare_display_image(self, cv_image, detections=None):
-        """在worker線程中準備顯示用的QPixmap（已縮放和標註）"""
+        """在worker線程中準備顯示用的QImage（已縮放和標註）
+        
+        先縮小至顯示尺寸再以縮放後的座標繪製標註，全解析度影像只被讀取一次；
+        縮放與繪製在每個執行緒重複使用的暫存緩衝區中完成，回傳的QImage擁有自己的像素資料
+        （只複製顯示尺寸的影像），GUI執行緒處理落後或顯示尺寸改變時都不會讀到被覆寫或已釋放的記憶體。
+        """
         try:
             if cv_image is None:
                 return None
+            if cv_image.ndim == 2:
+                cv_image = cv2.cvtColor(cv_image, cv2.COLOR_GRAY2BGR)
             
-            # 複製圖像避免修改原圖
-            display_img = cv_image.copy()
-            
-            # 繪製檢測標註
-            if detections:
-                display_img = self._draw_results(display_img, detections)
-            
-            # BGR轉RGB（OpenCV預設BGR）
-            if len(display_img.shape) == 3:
-                rgb_image = cv2.cvtColor(display_img, cv2.COLOR_BGR2RGB)
-            else:
-                rgb_image = cv2.cvtColor(display_img, cv2.COLOR_GRAY2RGB)
-            
-            # 縮放到顯示大小，保持寬高比
-            height, width = rgb_image.shape[:2]
+            # 縮放到顯示大小，保持寬高比（不放大）
+            height, width = cv_image.shape[:2]
             display_width, display_height = self.display_size
+            scale = min(display_width / width, display_height / height, 1.0)
+            new_width, new_height = max(1, int(width * scale)), max(1, int(height * scale))
             
-            # 計算縮放比例
-            scale_w = display_width / width
-            scale_h = display_height / height
-            scale = min(scale_w, scale_h, 1.0)  # 不放大
-            
+            buffer = self._display_buffer(new_height, new_width)
             if scale < 1.0:
-                new_width = int(width * scale)
-                new_height = int(height * scale)
-                rgb_image = cv2.resize(rgb_image, (new_width, new_height), interpolation=cv2.INTER_AREA)
-            
-            # 轉換為QImage
-            height, width, channel = rgb_image.shape
-            bytes_per_line = 3 * width
-            q_image = QImage(rgb_image.data, width, height, bytes_per_line, QImage.Format_RGB888)
+                cv2.resize(cv_image, (new_width, new_height), dst=buffer, interpolation=cv2.INTER_AREA)
+            else:
+                np.copyto(buffer, cv_image)
             
-            # 轉換為QPixmap
-            pixmap = QPixmap.fromImage(q_image)
+            # 於顯示解析度上繪製檢測標註
+            if detections:
+                self._draw_results(buffer, detections, scale=new_width / width, inplace=True)
             
-            return pixmap
+            # OpenCV 的 BGR 排列直接以 Format_BGR888 包裝，省去 cvtColor；copy() 後即不再引用暫存緩衝區
+            return QImage(buffer.data, new_width, new_height, buffer.strides[0], QImage.Format_BGR888).copy()
             
         except Exception as e:
             self.log_message.emit(f"準備顯示圖像失敗: {str(e)}")
             return None
     
+    def _display_buffer(self, height, width):
+        """取得目前執行緒的顯示暫存緩衝區，顯示尺寸改變時重新配置"""
+        buffer = getattr(self._display_scratch, 'buffer', None)
+        if buffer is None or buffer.shape[:2] != (height, width):
+            buffer = self._display_scratch.buffer = np.empty((height, width, 3), dtype=np.uint8)
+        return buffer
+    
     def start_detection(self):
         """開始檢測"""
         self.running = True
@@ -0,0 +1,93 @@
+"""
+影像擷取模組
+以專用執行緒持續讀取攝像頭，只保留最新一幀（latest-frame-wins），避免驅動緩衝堆積造成延遲
+"""
+
+import threading
+import time
+
+
+class LatestFrameGrabber:
+    """最新幀擷取器
+
+    擷取執行緒不斷覆寫單一槽位；推理端空閒時取走最新一幀，
+    未被取走就被覆寫的幀計入 dropped。
+    """
+
+    def __init__(self, capture, retry_interval=0.01):
+        self.capture = capture
+        self.retry_interval = retry_interval
+        self.captured = 0    # 成功擷取的幀數
+        self.dropped = 0     # 未被處理即被覆寫的幀數
+        self.processed = 0   # 被取走處理的幀數
+        self.read_failures = 0
+        self._frame = None
+        self._seq = -1
+        self._consumed_seq = -1
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """啟動擷取執行緒"""
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止擷取執行緒"""
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+
+    @property
+    def alive(self):
+        return self._running and self._thread is not None and self._thread.is_alive()
+
+    def _loop(self):
+        while self._running and self.capture.isOpened():
+            ret, frame = self.capture.read()
+            if not ret or frame is None:
+                self.read_failures += 1
+                time.sleep(self.retry_interval)
+                continue
+            with self._cond:
+                if self._seq > self._consumed_seq:
+                    self.dropped += 1  # 上一幀尚未被取走即被覆寫
+                self._frame = frame
+                self._seq += 1
+                self.captured += 1
+                self._cond.notify_all()
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+
+    def read(self, last_seq=-1, timeout=1.0):
+        """
+        取得比 last_seq 更新的最新一幀
+
+        Returns:
+            tuple: (seq, frame)，逾時或已停止時為 (None, None)
+        """
+        deadline = time.time() + timeout
+        with self._cond:
+            while self._seq <= last_seq:
+                remaining = deadline - time.time()
+                if remaining <= 0 or not self._running:
+                    return None, None
+                self._cond.wait(remaining)
+            self._consumed_seq = self._seq
+            self.processed += 1
+            return self._seq, self._frame
+
+    def stats(self):
+        """回傳擷取統計"""
+        return {
+            'captured': self.captured,
+            'processed': self.processed,
+            'dropped': self.dropped,
+            'read_failures': self.read_failures,
+        }
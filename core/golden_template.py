@@ -0,0 +1,184 @@
+"""
+黃金樣板比對模組
+將每一幀以特徵點對位到良品樣板影像後做差分，只回傳差異顯著的區域，供檢測器僅對這些區域切片推理；
+良品板幾乎不經過模型
+"""
+
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+_TEMPLATES = {}  # (路徑, 修改時間, 特徵點數) -> GoldenTemplate，行程內共用
+_TEMPLATES_LOCK = threading.Lock()
+
+
+def load_template(path, nfeatures=2000):
+    """
+    載入樣板（樣板特徵點只計算一次，同一檔案未修改時重用）
+
+    Raises:
+        IOError: 無法讀取樣板影像
+    """
+    key = (os.path.abspath(path), os.path.getmtime(path), nfeatures)
+    with _TEMPLATES_LOCK:
+        template = _TEMPLATES.get(key)
+        if template is None:
+            with open(path, 'rb') as f:  # 支援非ASCII路徑
+                image = cv2.imdecode(np.frombuffer(f.read(), np.uint8), cv2.IMREAD_COLOR)
+            if image is None:
+                raise IOError(f"無法讀取樣板影像: {path}")
+            template = _TEMPLATES[key] = GoldenTemplate(image, nfeatures, name=os.path.basename(path))
+        return template
+
+
+class GoldenTemplate:
+    """良品樣板
+
+    Args:
+        image: 樣板影像 (BGR)
+        nfeatures: ORB 特徵點數
+        name: 樣板名稱（記錄用）
+        work_width: 對位與差分使用的縮圖寬度
+        reuse_seconds: 對位結果（單應矩陣）沿用秒數，固定治具不需每幀對位；0 為每幀對位
+        diff_threshold: 灰階差超過此值的像素視為差異
+        min_region: 差異區域最小面積（縮圖像素），過濾雜訊
+        max_changed: 差異面積比例超過此值時視為對位失準，重新對位一次
+        padding: 差異區域外擴像素（原圖）
+    """
+
+    def __init__(self, image, nfeatures=2000, name='', work_width=1024, reuse_seconds=1.0, diff_threshold=40,
+                 min_region=16, max_changed=0.3, padding=16):
+        self.name = name
+        self.work_width = work_width
+        self.reuse_seconds = reuse_seconds
+        self.diff_threshold = diff_threshold
+        self.min_region = min_region
+        self.max_changed = max_changed
+        self.padding = padding
+
+        self.shape = image.shape[:2]
+        self._gray = self._small_gray(image, min(1.0, work_width / self.shape[1]))
+        self._orb = cv2.ORB_create(nfeatures)
+        self._kp, self._des = self._orb.detectAndCompute(self._gray, None)
+        self._matcher = cv2.BFMatcher(cv2.NORM_HAMMING)
+        self._gray = cv2.GaussianBlur(self._gray, (5, 5), 0)
+        self._homography = None  # (縮圖幀 -> 縮圖樣板 的單應矩陣, 幀尺寸, 對位時間)
+        self._lock = threading.Lock()
+        self._orb_lock = threading.Lock()  # ORB/Matcher 物件不保證執行緒安全
+
+        self.frames = 0
+        self.clean = 0         # 無差異區域的幀
+        self.regions = 0
+        self.registrations = 0
+        self.failures = 0      # 對位失敗（退回整幀推理）
+
+    @staticmethod
+    def _small_gray(image, scale):
+        if image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        if scale < 1.0:
+            h, w = image.shape[:2]
+            image = cv2.resize(image, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+        return image
+
+    def register(self, gray, min_matches=12):
+        """以 ORB + RANSAC 估計縮圖幀到縮圖樣板的單應矩陣，失敗時回傳 None"""
+        if self._des is None or len(self._kp) < min_matches:
+            return None
+        kp, des = self._orb.detectAndCompute(gray, None)
+        if des is None or len(kp) < min_matches:
+            return None
+        pairs = self._matcher.knnMatch(des, self._des, k=2)
+        good = [p[0] for p in pairs if len(p) == 2 and p[0].distance < 0.75 * p[1].distance]  # Lowe ratio test
+        if len(good) < min_matches:
+            return None
+        src = np.float32([kp[m.queryIdx].pt for m in good]).reshape(-1, 1, 2)
+        dst = np.float32([self._kp[m.trainIdx].pt for m in good]).reshape(-1, 1, 2)
+        H, inliers = cv2.findHomography(src, dst, cv2.RANSAC, 3.0)
+        if H is None or int(inliers.sum()) < min_matches:
+            return None
+        return H
+
+    def changed_regions(self, frame):
+        """
+        回傳與樣板差異顯著的區域
+
+        Returns:
+            list | None: 原圖座標 [(x0, y0, x1, y1), ...]；空列表表示良品（無差異），None 表示對位失敗
+        """
+        h, w = frame.shape[:2]
+        scale = min(1.0, self.work_width / w)
+        gray = self._small_gray(frame, scale)
+        with self._lock:
+            self.frames += 1
+            cached = self._homography
+        now = time.time()
+        fresh = cached is None or cached[1] != (h, w) or now - cached[2] >= self.reuse_seconds
+        H = self._register(gray, (h, w), now) if fresh else cached[0]
+        if H is None:
+            return None
+
+        boxes, changed = self._diff(gray, H)
+        if changed > self.max_changed and not fresh:
+            # 沿用的對位可能已失準（治具位移），重新對位一次
+            H = self._register(gray, (h, w), now)
+            if H is None:
+                return None
+            boxes, changed = self._diff(gray, H)
+
+        # 縮圖樣板座標 -> 原圖幀座標
+        H_inv = np.linalg.inv(H)
+        regions = []
+        for x, y, bw, bh in boxes:
+            corners = np.float32([[x, y], [x + bw, y], [x + bw, y + bh], [x, y + bh]]).reshape(-1, 1, 2)
+            pts = cv2.perspectiveTransform(corners, H_inv).reshape(-1, 2) / scale
+            x0, y0 = np.floor(pts.min(0)) - self.padding
+            x1, y1 = np.ceil(pts.max(0)) + self.padding
+            x0, y0, x1, y1 = max(0, int(x0)), max(0, int(y0)), min(w, int(x1)), min(h, int(y1))
+            if x1 > x0 and y1 > y0:
+                regions.append((x0, y0, x1, y1))
+        with self._lock:
+            self.regions += len(regions)
+            self.clean += not regions
+        return regions
+
+    def _register(self, gray, shape, now):
+        with self._orb_lock:
+            H = self.register(gray)
+        with self._lock:
+            if H is None:
+                self.failures += 1
+                self._homography = None
+            else:
+                self.registrations += 1
+                self._homography = (H, shape, now)
+        return H
+
+    def _diff(self, gray, H):
+        """將幀校正到樣板座標後差分，回傳 (差異外框列表, 差異面積比例)"""
+        th, tw = self._gray.shape[:2]
+        warped = cv2.warpPerspective(cv2.GaussianBlur(gray, (5, 5), 0), H, (tw, th))
+        valid = cv2.warpPerspective(np.full(gray.shape, 255, np.uint8), H, (tw, th))
+        diff = cv2.absdiff(warped, self._gray)
+        mask = (diff > self.diff_threshold).astype(np.uint8) * 255
+        mask = cv2.bitwise_and(mask, cv2.erode(valid, np.ones((5, 5), np.uint8)))  # 排除校正後的幀外區域
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))  # 去除單點雜訊
+        mask = cv2.dilate(mask, np.ones((9, 9), np.uint8))  # 合併相鄰的差異
+        changed = float(np.count_nonzero(mask)) / mask.size
+        contours = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[-2]
+        boxes = [cv2.boundingRect(c) for c in contours if cv2.contourArea(c) >= self.min_region]
+        return boxes, changed
+
+    def stats(self):
+        with self._lock:
+            return {
+                'frames': self.frames,
+                'clean': self.clean,
+                'regions': self.regions,
+                'registrations': self.registrations,
+                'failures': self.failures,
+            }
@@ -0,0 +1,191 @@
+"""
+模型註冊表模組
+於整個行程中共用已載入的YOLO模型，避免每次檢測或每一幀都重新載入權重
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import torch
+
+from core.backends import BACKEND_FORMATS, load_backend
+from core.cpu_modes import DEFAULT_CACHE_DIR, apply_cpu_mode
+from yolo_gui_utils.simple_yolo_loader_v2 import YOLOv5Loader
+
+
+def resolve_device(device='auto'):
+    """將 'auto' 等設備字串轉換為 torch.device"""
+    if isinstance(device, torch.device):
+        return device
+    if not device or device == 'auto':
+        return torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    return torch.device(device)
+
+
+def model_nbytes(model):
+    """估算模型參數與緩衝區佔用的記憶體（bytes）"""
+    if hasattr(model, 'nbytes'):  # 非PyTorch後端自行回報
+        return model.nbytes
+    try:
+        params = sum(p.numel() * p.element_size() for p in model.parameters())
+        buffers = sum(b.numel() * b.element_size() for b in model.buffers())
+        return params + buffers
+    except (AttributeError, RuntimeError):
+        return 0
+
+
+class ModelRegistry:
+    """行程層級的模型註冊表
+
+    以 (權重路徑, mtime, 檔案大小, 設備, 精度) 為鍵快取已融合、eval 模式的模型，
+    超過數量上限或記憶體預算時依 LRU 順序淘汰。
+    """
+
+    def __init__(self, max_models=4, memory_budget_mb=2048):
+        self.max_models = max_models
+        self.memory_budget = int(memory_budget_mb * 1024 ** 2)
+        self._models = OrderedDict()  # key -> (model, nbytes)
+        self._lock = threading.Lock()
+        self._key_locks = {}  # key -> [載入鎖, 使用中的呼叫者數]
+        self.hits = 0
+        self.misses = 0
+
+    def _make_key(self, weights_path, device, precision, options):
+        """建立快取鍵，權重檔更新後自動失效"""
+        path = os.path.realpath(weights_path)
+        stat = os.stat(path)
+        return (path, stat.st_mtime_ns, stat.st_size, str(device), precision, tuple(sorted(options.items())))
+
+    @contextmanager
+    def _key_lock(self, key):
+        """同一鍵只由一個執行緒載入；沒有呼叫者使用時即移除，鎖表不隨長時間執行的鍵數成長"""
+        with self._lock:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._key_locks[key]
+
+    def get_model(self, weights_path, device='auto', precision='fp32', warmup=True, **options):
+        """
+        取得共用模型，未快取時載入並放入註冊表
+
+        Args:
+            weights_path: 權重檔案路徑（.pt、.onnx、.torchscript 或 .torchscript.pt）
+            device: 運算設備 ('auto', 'cpu', 'cuda:0')
+            precision: 模型精度 ('fp32', 'fp16')
+            warmup: 載入後是否先執行一次小尺寸推理以完成延遲初始化
+            options: 後端選項（如 ONNX Runtime 的 intra_op_threads / inter_op_threads）；
+                .pt 模型可指定 cpu_mode ('eager', 'channels_last', 'onednn', 'compile')，
+                編譯產物快取於 compile_cache 目錄（預設 runs/compile_cache）
+
+        Returns:
+            tuple: (success, model, error_message)
+        """
+        try:
+            device = resolve_device(device)
+            key = self._make_key(weights_path, device, precision, options)
+        except OSError as e:
+            return False, None, f"無法讀取權重檔案: {str(e)}"
+
+        with self._key_lock(key):
+            with self._lock:
+                if key in self._models:
+                    self._models.move_to_end(key)
+                    self.hits += 1
+                    return True, self._models[key][0], None
+                self.misses += 1
+
+            if weights_path.endswith('.pt') and not weights_path.endswith(BACKEND_FORMATS):
+                success, model, error = YOLOv5Loader().load_model(weights_path, str(device))
+                if not success:
+                    return False, None, error
+                if precision == 'fp16' and device.type != 'cpu':
+                    model = model.half()  # CPU 不支援大部分 FP16 卷積運算
+                for p in model.parameters():
+                    p.requires_grad_(False)
+                model = apply_cpu_mode(model, options.get('cpu_mode', 'eager'), device, weights_path,
+                                       options.get('compile_cache', DEFAULT_CACHE_DIR))
+            else:
+                success, model, error = load_backend(weights_path, **options)
+                if not success:
+                    return False, None, error
+            if warmup:
+                self._warmup(model, device)
+
+            # 同一權重的舊版本（檔案已更新）直接淘汰
+            with self._lock:
+                for stale in [k for k in self._models if k[0] == key[0] and k[1:3] != key[1:3]]:
+                    del self._models[stale]
+                self._models[key] = (model, model_nbytes(model))
+                self._evict()
+            return True, model, None
+
+    def _warmup(self, model, device):
+        """以小尺寸輸入預熱模型"""
+        if hasattr(model, 'warmup'):
+            try:
+                model.warmup()
+            except Exception:  # 預熱失敗不影響模型使用
+                pass
+            return
+        try:
+            p = next(model.parameters())
+            with torch.no_grad():
+                model(torch.zeros(1, 3, 64, 64, device=device).type_as(p))
+        except (StopIteration, RuntimeError, TypeError):
+            pass
+
+    def _evict(self):
+        """依 LRU 淘汰超出數量或記憶體預算的模型（至少保留最新一個）"""
+        while len(self._models) > 1 and (
+                len(self._models) > self.max_models or self.memory_usage() > self.memory_budget):
+            self._models.popitem(last=False)
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def memory_usage(self):
+        """目前快取模型的總記憶體用量（bytes）"""
+        return sum(nbytes for _, nbytes in self._models.values())
+
+    def evict(self, weights_path):
+        """移除指定權重的所有快取模型"""
+        path = os.path.realpath(weights_path)
+        with self._lock:
+            for key in [k for k in self._models if k[0] == path]:
+                del self._models[key]
+
+    def clear(self):
+        """清空註冊表"""
+        with self._lock:
+            self._models.clear()
+
+    def stats(self):
+        """回傳快取統計資訊"""
+        with self._lock:
+            return {
+                'models': len(self._models),
+                'memory_mb': self.memory_usage() / 1024 ** 2,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """取得行程唯一的模型註冊表"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry()
+        return _registry
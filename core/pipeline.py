@@ -0,0 +1,216 @@
+"""
+管線化執行引擎模組
+以有界佇列串接多個處理階段（解碼 → 推理 → 繪製/保存），各階段於獨立執行緒中並行執行
+"""
+
+import queue
+import threading
+import time
+
+
+_END = object()  # 結束標記
+
+
+class StageFailure:
+    """階段處理失敗時沿管線傳遞的結果，保留原始序號以維持輸出順序"""
+
+    def __init__(self, stage, error, payload=None):
+        self.stage = stage
+        self.error = error
+        self.payload = payload
+
+    def __str__(self):
+        return f"{self.stage}: {self.error}"
+
+
+class Stage:
+    """管線中的單一處理階段
+
+    Args:
+        name: 階段名稱（用於統計與錯誤訊息）
+        fn: 處理函式；batch_size == 1 時為 fn(payload) -> payload，
+            batch_size > 1 時為 fn([payload, ...]) -> [payload, ...]
+        workers: 此階段的執行緒數
+        batch_size: 一次最多合併處理的項目數（僅取用佇列中已就緒的項目，不會等待湊滿）
+    """
+
+    def __init__(self, name, fn, workers=1, batch_size=1):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, int(workers))
+        self.batch_size = max(1, int(batch_size))
+        self.processed = 0
+        self.busy_time = 0.0
+        self._lock = threading.Lock()
+
+    def _record(self, count, elapsed):
+        with self._lock:
+            self.processed += count
+            self.busy_time += elapsed
+
+
+class Pipeline:
+    """有界佇列串接的多階段管線
+
+    - 背壓：階段間佇列有上限，下游較慢時上游會阻塞而不會無限堆積
+    - 順序：輸出依來源順序重新排列後才交給呼叫端
+    - 並行：每個階段可設定不同的執行緒數
+    """
+
+    def __init__(self, stages, maxsize=8):
+        self.stages = list(stages)
+        self.maxsize = max(1, int(maxsize))
+        self._queues = []
+        self._threads = []
+        self._stop = threading.Event()
+        self._source_error = None
+
+    def run(self, source):
+        """啟動管線並依來源順序產生處理結果（於呼叫端執行緒中迭代）"""
+        self._stop.clear()
+        self._queues = [queue.Queue(self.maxsize) for _ in range(len(self.stages) + 1)]
+        self._threads = []
+
+        feeder = threading.Thread(target=self._feed, args=(source, self._queues[0]), daemon=True)
+        self._threads.append(feeder)
+        for i, stage in enumerate(self.stages):
+            remaining = [stage.workers]
+            lock = threading.Lock()
+            for _ in range(stage.workers):
+                t = threading.Thread(target=self._work,
+                                     args=(stage, self._queues[i], self._queues[i + 1], remaining, lock),
+                                     daemon=True)
+                self._threads.append(t)
+        for t in self._threads:
+            t.start()
+
+        out_queue = self._queues[-1]
+        pending = {}
+        next_seq = 0
+        try:
+            while True:
+                item = self._get(out_queue)
+                if item is None:  # 已停止
+                    return
+                if item is _END:
+                    break
+                seq, payload = item
+                pending[seq] = payload
+                while next_seq in pending:
+                    yield pending.pop(next_seq)
+                    next_seq += 1
+            for seq in sorted(pending):  # 理論上不會發生，保險起見依序輸出剩餘項目
+                yield pending[seq]
+            if self._source_error is not None:
+                raise self._source_error
+        finally:
+            self.stop()
+
+    def stop(self):
+        """停止管線並釋放所有被阻塞的執行緒"""
+        self._stop.set()
+        for q in self._queues:
+            try:
+                while True:
+                    q.get_nowait()
+            except queue.Empty:
+                pass
+        for t in self._threads:
+            if t is not threading.current_thread():
+                t.join(timeout=1.0)
+
+    def stats(self):
+        """回傳各階段處理數量、忙碌時間與佇列深度"""
+        result = {}
+        for i, stage in enumerate(self.stages):
+            result[stage.name] = {
+                'workers': stage.workers,
+                'processed': stage.processed,
+                'busy_time': stage.busy_time,
+                'queue_depth': self._queues[i].qsize() if self._queues else 0,
+            }
+        return result
+
+    def _put(self, q, item):
+        """可被停止中斷的阻塞式 put，回傳是否成功"""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        """可被停止中斷的阻塞式 get，停止時回傳 None"""
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return None
+
+    def _feed(self, source, q):
+        """從來源迭代器讀取項目並編上序號"""
+        try:
+            for seq, payload in enumerate(source):
+                if not self._put(q, (seq, payload)):
+                    return
+        except Exception as e:
+            self._source_error = e
+        self._put(q, _END)
+
+    def _work(self, stage, in_q, out_q, remaining, lock):
+        """階段執行緒：取出項目、處理後送往下一個佇列"""
+        while True:
+            item = self._get(in_q)
+            if item is None:
+                return
+            if item is _END:
+                break
+            batch = [item]
+            ended = False
+            while len(batch) < stage.batch_size:
+                try:
+                    extra = in_q.get_nowait()
+                except queue.Empty:
+                    break
+                if extra is _END:
+                    ended = True
+                    break
+                batch.append(extra)
+
+            for result in self._process(stage, batch):
+                if not self._put(out_q, result):
+                    return
+            if ended:
+                break
+
+        # 通知同階段其他執行緒結束，最後一個結束的執行緒向下游傳遞結束標記
+        self._put(in_q, _END)
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            self._put(out_q, _END)
+
+    def _process(self, stage, batch):
+        """執行階段處理函式，失敗項目以 StageFailure 取代並繼續傳遞"""
+        seqs = [seq for seq, _ in batch]
+        payloads = [payload for _, payload in batch]
+        todo = [(i, p) for i, p in enumerate(payloads) if not isinstance(p, StageFailure)]
+        results = list(payloads)
+        if todo:
+            t = time.time()
+            try:
+                if stage.batch_size > 1:
+                    outputs = stage.fn([p for _, p in todo])
+                else:
+                    outputs = [stage.fn(todo[0][1])]
+                for (i, _), out in zip(todo, outputs):
+                    results[i] = out
+            except Exception as e:
+                for i, p in todo:
+                    results[i] = StageFailure(stage.name, e, p)
+            stage._record(len(todo), time.time() - t)
+        return list(zip(seqs, results))
@@ -0,0 +1,156 @@
+"""
+推理精度模組
+CPU 以 autocast 執行 bfloat16（AVX512-BF16 / AMX）或 float16 推理，CUDA 的 FP16 沿用半精度權重；
+並提供與 FP32 的檢測結果一致性檢查
+"""
+
+import contextlib
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+import torch
+
+
+PRECISIONS = ('fp32', 'bf16', 'fp16')
+_DTYPES = {'bf16': torch.bfloat16, 'fp16': torch.float16}
+_probe_cache = {}  # (設備類型, 精度) -> 是否可用
+
+
+def weights_precision(device, precision):
+    """註冊表中模型權重的精度：只有 CUDA FP16 轉換權重，其餘以 FP32 權重搭配 autocast（同一份模型共用）"""
+    return 'fp16' if precision == 'fp16' and torch.device(device).type == 'cuda' else 'fp32'
+
+
+def uses_autocast(device, precision):
+    return precision in _DTYPES and weights_precision(device, precision) == 'fp32'
+
+
+def cpu_capability():
+    """回傳 CPU 向量指令集等級（如 'AVX512'），舊版 PyTorch 回傳空字串"""
+    try:
+        return torch.backends.cpu.get_cpu_capability()
+    except AttributeError:
+        return ''
+
+
+def supports_precision(device, precision):
+    """以一次小卷積實際測試此設備是否支援指定精度的 autocast（結果快取）"""
+    if precision == 'fp32' or not uses_autocast(device, precision):
+        return True
+    device = torch.device(device)
+    key = (device.type, precision)
+    if key not in _probe_cache:
+        try:
+            conv = torch.nn.Conv2d(3, 8, 3).to(device)
+            with torch.no_grad(), torch.autocast(device.type, dtype=_DTYPES[precision]):
+                y = conv(torch.zeros(1, 3, 8, 8, device=device))
+            _probe_cache[key] = y.dtype == _DTYPES[precision]
+        except (AttributeError, RuntimeError, TypeError):  # torch < 1.10 無 torch.autocast，或不支援此 dtype
+            _probe_cache[key] = False
+    return _probe_cache[key]
+
+
+def autocast(device, precision):
+    """推理用的精度情境；FP32 或權重已是半精度時不啟用 autocast"""
+    if not uses_autocast(device, precision):
+        return contextlib.nullcontext()
+    device = torch.device(device)
+    return torch.autocast(device.type, dtype=_DTYPES[precision])
+
+
+def match_detections(ref, test, iou_thres=0.5):
+    """
+    以 IoU 貪婪配對同類別的檢測框
+
+    Args:
+        ref, test: (n, 6) NumPy 陣列 [x1, y1, x2, y2, conf, cls]
+    Returns:
+        tuple: (配對數, 配對框的 IoU 列表, 配對框的信心度差列表)
+    """
+    if not len(ref) or not len(test):
+        return 0, [], []
+    lt = np.maximum(ref[:, None, :2], test[None, :, :2])
+    rb = np.minimum(ref[:, None, 2:4], test[None, :, 2:4])
+    inter = np.clip(rb - lt, 0, None).prod(2)
+    area = lambda b: (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    iou = inter / (area(ref)[:, None] + area(test)[None] - inter + 1e-9)
+    iou[ref[:, None, 5] != test[None, :, 5]] = 0
+    ious, deltas, used = [], [], set()
+    for i in np.argsort(-ref[:, 4]):
+        j = int(iou[i].argmax())
+        if iou[i, j] >= iou_thres and j not in used:
+            used.add(j)
+            ious.append(float(iou[i, j]))
+            deltas.append(abs(float(ref[i, 4] - test[j, 4])))
+    return len(ious), ious, deltas
+
+
+def sample_images(path, samples=32):
+    """從驗證集路徑（資料夾或影像清單 .txt）取出最多 samples 張影像路徑"""
+    if os.path.isfile(path) and path.endswith('.txt'):
+        with open(path, 'r', encoding='utf-8') as f:
+            files = [x.strip() for x in f if x.strip()]
+    else:
+        files = sorted(f for ext in ('jpg', 'jpeg', 'png', 'bmp') for f in glob.glob(os.path.join(path, '**', f'*.{ext}'),
+                                                                                    recursive=True))
+    step = max(1, len(files) // samples)
+    return files[::step][:samples]
+
+
+def parity_check(ref_model, test_model, images, device, precision, imgsz=640, conf_thres=0.25, iou_thres=0.45,
+                 match_iou=0.5):
+    """
+    比較指定精度與 FP32 在相同影像上的檢測結果
+
+    Args:
+        ref_model: FP32 模型
+        test_model: 指定精度使用的模型（autocast 模式下與 ref_model 為同一物件）
+
+    Returns:
+        dict: images, fp32_boxes, test_boxes, recall（FP32 框被重現的比例）, precision（新精度框與 FP32 一致的比例）,
+              mean_iou, max_conf_delta, fp32_ms, test_ms
+    """
+    from utils.datasets import letterbox
+    from utils.general import non_max_suppression
+
+    totals = {'images': 0, 'fp32_boxes': 0, 'test_boxes': 0, 'matched': 0, 'fp32_ms': 0.0, 'test_ms': 0.0}
+    ious, deltas = [], []
+    for path in images:
+        img0 = cv2.imread(path)
+        if img0 is None:
+            continue
+        img = letterbox(img0, imgsz, auto=False)[0]
+        img = torch.from_numpy(np.ascontiguousarray(img[:, :, ::-1].transpose(2, 0, 1)))[None].to(device)
+        dets = []
+        for mode, model in (('fp32', ref_model), (precision, test_model)):
+            x = img.type_as(next(model.parameters())) / 255.0
+            t = time.time()
+            with torch.no_grad(), autocast(device, mode):
+                pred = model(x)[0]
+            pred = non_max_suppression(pred.float(), conf_thres, iou_thres)[0]
+            totals['fp32_ms' if mode == 'fp32' else 'test_ms'] += (time.time() - t) * 1000
+            dets.append(pred.cpu().numpy() if pred is not None else np.zeros((0, 6), np.float32))
+        n, i, d = match_detections(dets[0], dets[1], match_iou)
+        totals['images'] += 1
+        totals['fp32_boxes'] += len(dets[0])
+        totals['test_boxes'] += len(dets[1])
+        totals['matched'] += n
+        ious += i
+        deltas += d
+
+    n_img = max(totals['images'], 1)
+    return {
+        'precision_mode': precision,
+        'images': totals['images'],
+        'fp32_boxes': totals['fp32_boxes'],
+        'test_boxes': totals['test_boxes'],
+        'recall': totals['matched'] / totals['fp32_boxes'] if totals['fp32_boxes'] else 1.0,
+        'precision': totals['matched'] / totals['test_boxes'] if totals['test_boxes'] else 1.0,
+        'mean_iou': float(np.mean(ious)) if ious else 1.0,
+        'max_conf_delta': float(max(deltas)) if deltas else 0.0,
+        'fp32_ms': totals['fp32_ms'] / n_img,
+        'test_ms': totals['test_ms'] / n_img,
+    }
@@ -0,0 +1,223 @@
+"""
+結果寫入模組
+以背景執行緒池負責標註影像的編碼與寫檔，推理/繪製執行緒只需把結果放入有界佇列
+"""
+
+import os
+import queue
+import threading
+import time
+
+import cv2
+
+
+# 影像格式 -> (副檔名, OpenCV 編碼參數鍵)
+IMAGE_FORMATS = {
+    'jpg': ('.jpg', cv2.IMWRITE_JPEG_QUALITY),
+    'webp': ('.webp', cv2.IMWRITE_WEBP_QUALITY),
+    'png': ('.png', cv2.IMWRITE_PNG_COMPRESSION),
+}
+
+# 來源影像副檔名（同 utils.datasets.img_formats），用於判斷同一目錄中同主檔名的影像
+SOURCE_FORMATS = ('.bmp', '.jpg', '.jpeg', '.png', '.tif', '.tiff', '.dng', '.webp')
+
+_STOP = object()  # 結束標記
+
+
+class ResultWriter:
+    """背景結果寫入器
+
+    Args:
+        output_dir: 輸出目錄
+        draw_fn: draw_fn(img0, results) -> 標註後影像，於寫入執行緒中執行（全解析度繪製不佔用推理執行緒）
+        workers: 編碼/寫檔執行緒數
+        maxsize: 佇列上限
+        image_format: 'jpg' / 'webp' / 'png'
+        quality: JPEG/WebP 品質 (1-100)
+        png_level: PNG 壓縮等級 (0-9)
+        defective_only: 只保存有檢測到缺陷的影像與標註
+        save_txt / save_conf: 保存標註文件 / 標註含信心度
+        label_batch: 標註累積多少筆後一次寫出
+        combined_labels: 所有標註寫入同一個 labels.txt（每行前綴來源影像檔名），否則每張影像一個 <主檔名>.txt
+        overflow: 佇列已滿時 'block' 等待，或 'drop' 直接丟棄（即時來源不讓寫檔拖慢推理）
+    """
+
+    def __init__(self, output_dir, draw_fn=None, workers=2, maxsize=32, image_format='jpg', quality=95,
+                 png_level=3, defective_only=False, save_txt=False, save_conf=False, label_batch=64,
+                 combined_labels=False, overflow='block'):
+        self.output_dir = output_dir
+        self.draw_fn = draw_fn
+        self.image_format = image_format if image_format in IMAGE_FORMATS else 'jpg'
+        ext, key = IMAGE_FORMATS[self.image_format]
+        self.ext = ext
+        self.encode_params = [key, int(png_level if self.image_format == 'png' else quality)]
+        self.defective_only = defective_only
+        self.save_txt = save_txt
+        self.save_conf = save_conf
+        self.label_batch = max(1, int(label_batch))
+        self.combined_labels = combined_labels
+        self.overflow = overflow
+
+        self.submitted = 0
+        self.written = 0
+        self.skipped = 0    # 依保存策略略過（無缺陷）
+        self.dropped = 0    # 佇列已滿而丟棄
+        self.errors = 0
+        self.max_depth = 0
+        self.total_latency = 0.0  # 放入佇列到寫檔完成
+        self.max_latency = 0.0
+        self.total_encode = 0.0
+        self._labels = []  # [(txt路徑, [行, ...]), ...] 待寫出的標註
+        self._dir_stems = {}  # 來源目錄 -> {主檔名: 影像數}
+        self._lock = threading.Lock()
+        self._label_lock = threading.Lock()
+
+        os.makedirs(output_dir, exist_ok=True)
+        if save_txt and combined_labels:
+            open(os.path.join(output_dir, 'labels.txt'), 'w').close()  # 每次檢測重新開始
+        self._queue = queue.Queue(max(1, int(maxsize)))
+        self._threads = [threading.Thread(target=self._loop, daemon=True) for _ in range(max(1, int(workers)))]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, image_path, img0, results):
+        """
+        排入一筆待保存的結果
+
+        Returns:
+            bool: 是否已排入（依保存策略略過或佇列已滿丟棄時為 False）
+        """
+        with self._lock:
+            self.submitted += 1
+            if self.defective_only and not len(results):
+                self.skipped += 1
+                return False
+        job = (image_path, img0, results, time.time())
+        try:
+            if self.overflow == 'drop':
+                self._queue.put_nowait(job)
+            else:
+                self._queue.put(job)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.max_depth = max(self.max_depth, self._queue.qsize())
+        return True
+
+    def close(self):
+        """等待佇列清空、停止執行緒並寫出剩餘標註"""
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for t in self._threads:
+            t.join()
+        self._flush_labels()
+
+    def stats(self):
+        """回傳佇列深度與寫入延遲統計"""
+        with self._lock:
+            done = max(self.written, 1)
+            return {
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self.max_depth,
+                'submitted': self.submitted,
+                'written': self.written,
+                'skipped': self.skipped,
+                'dropped': self.dropped,
+                'errors': self.errors,
+                'avg_latency_ms': self.total_latency / done * 1000,
+                'max_latency_ms': self.max_latency * 1000,
+                'avg_encode_ms': self.total_encode / done * 1000,
+            }
+
+    def _loop(self):
+        while True:
+            job = self._queue.get()
+            if job is _STOP:
+                return
+            image_path, img0, results, queued = job
+            try:
+                t = time.time()
+                self._write(image_path, img0, results)
+                now = time.time()
+                with self._lock:
+                    self.written += 1
+                    self.total_encode += now - t
+                    self.total_latency += now - queued
+                    self.max_latency = max(self.max_latency, now - queued)
+            except Exception:
+                with self._lock:
+                    self.errors += 1
+
+    def output_stem(self, image_path):
+        """
+        輸出主檔名：一般為來源主檔名（a.png -> a.jpg / a.txt，符合 YOLO 標註慣例）；
+        只有同一目錄中另有同主檔名、不同格式的影像時才保留原副檔名（a.png -> a.png.jpg / a.png.txt）
+        """
+        name = os.path.basename(image_path)
+        stem = os.path.splitext(name)[0]
+        return name if self._stem_count(os.path.dirname(image_path), stem) > 1 else stem
+
+    def _stem_count(self, directory, stem):
+        """來源目錄中主檔名為 stem 的影像數（每個目錄只列出一次）"""
+        with self._lock:
+            stems = self._dir_stems.get(directory)
+            if stems is None:
+                stems = {}
+                try:
+                    for name in os.listdir(directory or '.'):
+                        base, ext = os.path.splitext(name)
+                        if ext.lower() in SOURCE_FORMATS:
+                            stems[base] = stems.get(base, 0) + 1
+                except OSError:
+                    pass
+                self._dir_stems[directory] = stems
+            return stems.get(stem, 1)
+
+    def _write(self, image_path, img0, results):
+        stem = self.output_stem(image_path)
+        out_name = stem + self.ext
+        img = self.draw_fn(img0, results) if self.draw_fn else img0
+        ok, buf = cv2.imencode(self.ext, img, self.encode_params)
+        if not ok:
+            raise IOError(f"影像編碼失敗: {image_path}")
+        with open(os.path.join(self.output_dir, out_name), 'wb') as f:  # open() 支援非ASCII路徑
+            f.write(buf.tobytes())
+
+        if self.save_txt:
+            self._add_labels(os.path.basename(image_path), stem, img0.shape, results)
+
+    def _add_labels(self, name, stem, shape, results):
+        """格式化標註並累積，達到批次大小時一次寫出（name: 來源影像檔名，stem: 標註檔主檔名）"""
+        img_h, img_w = shape[:2]
+        xywhn = results.xywhn if results.shape else results.xywh / [img_w, img_h, img_w, img_h]
+        prefix = f"{name} " if self.combined_labels else ""
+        lines = []
+        for class_name, (x, y, w, h), conf in zip(results.labels, xywhn.tolist(), results.conf.tolist()):
+            line = f"{prefix}{class_name} {x:.6f} {y:.6f} {w:.6f} {h:.6f}"
+            lines.append(f"{line} {conf:.6f}\n" if self.save_conf else f"{line}\n")
+        path = os.path.join(self.output_dir, 'labels.txt' if self.combined_labels else f"{stem}.txt")
+        with self._label_lock:
+            self._labels.append((path, lines))
+            if len(self._labels) < self.label_batch:
+                return
+            pending, self._labels = self._labels, []
+            self._write_labels(pending)
+
+    def _flush_labels(self):
+        with self._label_lock:
+            pending, self._labels = self._labels, []
+            self._write_labels(pending)
+
+    def _write_labels(self, pending):
+        """寫出一批標註；合併模式下整批只開檔一次（呼叫端持有 _label_lock）"""
+        if not pending:
+            return
+        if self.combined_labels:
+            with open(pending[0][0], 'a') as f:
+                f.writelines(line for _, lines in pending for line in lines)
+        else:
+            for path, lines in pending:
+                with open(path, 'w') as f:
+                    f.writelines(lines)
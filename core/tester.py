@@ -13,6 +13,9 @@ import numpy as np
 from pathlib import Path
 from PyQt5.QtCore import QObject, QThread, pyqtSignal
 
+from core.model_registry import get_registry
+from core.precision import autocast, parity_check, sample_images, supports_precision, weights_precision
+
 
 class TestingWorker(QThread):
     """測試工作執行緒"""
@@ -30,6 +33,8 @@ class TestingWorker(QThread):
         self.testing_active = False
         self.model = None
         self.device = None
+        self.precision = 'fp32'
+        self.parity = None
         self.results = {}
         
     def set_parameters(self, params):
@@ -118,6 +123,26 @@ class TestingWorker(QThread):
             weights_path = self.params['weights']
             self.log_message.emit(f"正在載入模型: {weights_path}")
             
+            self.precision = self.params.get('precision', 'fp32')
+            if not supports_precision(self.device, self.precision):
+                self.log_message.emit(f"此設備不支援 {self.precision} 推理，改用 FP32")
+                self.precision = 'fp32'
+            
+            # 優先使用行程共用的模型註冊表（與檢測頁共用已載入的模型）
+            options = {}
+            if self.params.get('cpu_mode', 'eager') != 'eager':
+                options['cpu_mode'] = self.params['cpu_mode']
+            success, model, error = get_registry().get_model(
+                weights_path, self.device, weights_precision(self.device, self.precision), **options)
+            if success:
+                self.model = model
+                self.log_message.emit(f"模型載入成功（模型註冊表，精度 {self.precision}，"
+                                      f"執行模式 {getattr(model, 'mode', 'eager')}）")
+                return True
+            self.log_message.emit(f"模型註冊表載入失敗: {error}")
+            self.precision = 'fp32'  # 以下備選載入方式只支援 FP32 eager
+            self.params['cpu_mode'] = 'eager'
+            
             # 嘗試載入YOLOv5模型
             try:
                 if os.path.basename(weights_path) in ['yolov5n.pt', 'yolov5s.pt', 'yolov5m.pt', 'yolov5l.pt', 'yolov5x.pt']:
@@ -135,7 +160,8 @@ class TestingWorker(QThread):
                 self.log_message.emit(f"YOLOv5載入失敗: {str(e)}")
                 # 備選方案：直接載入權重檔案
                 try:
-                    checkpoint = torch.load(weights_path, map_location=self.device)
+                    from utils.torch_utils import torch_load
+                    checkpoint = torch_load(weights_path, map_location=self.device)
                     if 'model' in checkpoint:
                         self.model = checkpoint['model'].float()
                     else:
@@ -202,6 +228,12 @@ class TestingWorker(QThread):
             with open(config_file, 'w', encoding='utf-8') as f:
                 json.dump(self.params, f, indent=2, ensure_ascii=False)
             
+            # 精度一致性檢查（與 FP32 比較檢測結果）
+            self.parity = None
+            if self.params.get('parity_check', False) and (
+                    self.precision != 'fp32' or self.params.get('cpu_mode', 'eager') != 'eager'):
+                self.parity = self._parity_check(output_dir)
+            
             # 執行測試
             task = self.params.get('task', 'val')
             if task == '速度測試':
@@ -212,6 +244,39 @@ class TestingWorker(QThread):
         except Exception as e:
             self.error_occurred.emit(f"測試執行失敗: {str(e)}")
     
+    def _parity_check(self, output_dir):
+        """在驗證集抽樣影像上比較目前精度/執行模式與 FP32 eager 的檢測結果，並保存 parity.json"""
+        try:
+            images = sample_images(self.test_data_path, self.params.get('parity_samples', 32))
+            if not images:
+                self.log_message.emit("精度一致性檢查: 驗證集中沒有影像，略過")
+                return None
+            cpu_mode = self.params.get('cpu_mode', 'eager')
+            self.log_message.emit(f"精度一致性檢查: {self.precision}/{cpu_mode} vs FP32/eager，{len(images)} 張影像...")
+            ref_model = self.model
+            if weights_precision(self.device, self.precision) != 'fp32' or cpu_mode != 'eager':  # 另取 FP32 eager 模型
+                success, ref_model, error = get_registry().get_model(self.params['weights'], self.device, 'fp32')
+                if not success:
+                    self.log_message.emit(f"精度一致性檢查: FP32 模型載入失敗 ({error})")
+                    return None
+            result = parity_check(ref_model, self.model, images, self.device, self.precision,
+                                  imgsz=self.params.get('imgsz', 640),
+                                  conf_thres=max(self.params.get('conf_thres', 0.25), 0.1),
+                                  iou_thres=self.params.get('iou_thres', 0.45))
+            result['cpu_mode'] = cpu_mode
+            result['passed'] = result['recall'] >= 0.95 and result['precision'] >= 0.95 and result['mean_iou'] >= 0.9
+            with open(os.path.join(output_dir, 'parity.json'), 'w', encoding='utf-8') as f:
+                json.dump(result, f, indent=2, ensure_ascii=False)
+            self.log_message.emit(
+                f"精度一致性{'通過' if result['passed'] else '未通過'}: 重現率 {result['recall']:.3f}，"
+                f"一致率 {result['precision']:.3f}，平均IoU {result['mean_iou']:.3f}，"
+                f"最大信心度差 {result['max_conf_delta']:.3f}，"
+                f"推理 {result['fp32_ms']:.1f} ms → {result['test_ms']:.1f} ms")
+            return result
+        except Exception as e:
+            self.log_message.emit(f"精度一致性檢查失敗: {str(e)}")
+            return None
+    
     def _accuracy_test(self, output_dir):
         """精度測試"""
         try:
@@ -290,7 +355,10 @@ class TestingWorker(QThread):
                 'confusion_matrix': confusion_matrix,
                 'speed': speed_stats,
                 'total_images': total_images,
-                'output_dir': output_dir
+                'output_dir': output_dir,
+                'precision_mode': self.precision,
+                'cpu_mode': self.params.get('cpu_mode', 'eager'),
+                'parity': self.parity,
             }
             
             # 保存結果
@@ -315,12 +383,17 @@ class TestingWorker(QThread):
             
             # 模擬測試圖片
             dummy_img = torch.randn(batch_size, 3, img_size, img_size).to(self.device)
+            try:
+                dummy_img = dummy_img.type_as(next(self.model.parameters()))
+            except (AttributeError, StopIteration):
+                pass
             
             # 預熱
-            self.log_message.emit("模型預熱中...")
+            self.log_message.emit(f"模型預熱中（精度 {self.precision}）...")
             for _ in range(10):
                 if hasattr(self.model, '__call__'):
-                    _ = self.model(dummy_img)
+                    with torch.no_grad(), autocast(self.device, self.precision):
+                        _ = self.model(dummy_img)
             
             # 測試推理速度
             self.log_message.emit(f"開始速度測試，迭代次數: {test_iterations}")
@@ -335,7 +408,7 @@ class TestingWorker(QThread):
                 
                 # 執行推理
                 if hasattr(self.model, '__call__'):
-                    with torch.no_grad():
+                    with torch.no_grad(), autocast(self.device, self.precision):
                         _ = self.model(dummy_img)
                         
                         # 如果使用GPU，需要同步
@@ -356,6 +429,9 @@ class TestingWorker(QThread):
                 'image_size': img_size,
                 'iterations': test_iterations,
                 'device': str(self.device),
+                'precision_mode': self.precision,
+                'cpu_mode': self.params.get('cpu_mode', 'eager'),
+                'parity': self.parity,
                 'mean_time': float(np.mean(times)),
                 'std_time': float(np.std(times)),
                 'min_time': float(np.min(times)),
@@ -0,0 +1,140 @@
+"""
+切片推理模組
+將高解析度PCB面板影像切成重疊的切片分別推理，再把座標映射回原圖並合併切片接縫處的重複框
+"""
+
+import torch
+import torchvision
+
+from utils.general import box_iou
+
+
+def tile_windows(height, width, tile_size=640, overlap=0.2):
+    """
+    計算覆蓋整張影像的切片視窗
+
+    Args:
+        height, width: 影像尺寸
+        tile_size: 切片邊長（像素）
+        overlap: 相鄰切片重疊比例 (0 ~ 0.9)
+
+    Returns:
+        list: [(x0, y0, x1, y1), ...]，最後一排/列切片貼齊影像邊緣
+    """
+    overlap = min(max(overlap, 0.0), 0.9)
+    step = max(1, int(tile_size * (1 - overlap)))
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size, step))
+        positions.append(length - tile_size)
+        return positions
+
+    return [(x0, y0, min(x0 + tile_size, width), min(y0 + tile_size, height))
+            for y0 in starts(height) for x0 in starts(width)]
+
+
+def region_windows(regions, height, width, tile_size=640, overlap=0.2):
+    """
+    計算只覆蓋指定區域的切片視窗（黃金樣板差異區域等）
+
+    小於切片尺寸的區域以區域中心取一個切片（貼齊影像邊緣），較大的區域以重疊切片覆蓋；
+    已被其他切片完全包含的區域不再產生切片
+
+    Args:
+        regions: [(x0, y0, x1, y1), ...] 原圖座標
+        height, width: 影像尺寸
+
+    Returns:
+        list: [(x0, y0, x1, y1), ...]
+    """
+    windows = []
+
+    def covered(x0, y0, x1, y1):
+        return any(wx0 <= x0 and wy0 <= y0 and x1 <= wx1 and y1 <= wy1 for wx0, wy0, wx1, wy1 in windows)
+
+    for x0, y0, x1, y1 in sorted(regions, key=lambda r: (r[2] - r[0]) * (r[3] - r[1]), reverse=True):
+        if covered(x0, y0, x1, y1):
+            continue
+        rw, rh = x1 - x0, y1 - y0
+        if rw <= tile_size and rh <= tile_size:
+            cx, cy = (x0 + x1) // 2, (y0 + y1) // 2
+            wx0 = min(max(0, cx - tile_size // 2), max(0, width - tile_size))
+            wy0 = min(max(0, cy - tile_size // 2), max(0, height - tile_size))
+            windows.append((wx0, wy0, min(wx0 + tile_size, width), min(wy0 + tile_size, height)))
+        else:
+            # 窄邊也擴張到切片尺寸，所有切片尺寸一致才能合併為同一批推理
+            if rw < tile_size:
+                x0 = min(max(0, x0 - (tile_size - rw) // 2), max(0, width - tile_size))
+                x1 = min(x0 + tile_size, width)
+            if rh < tile_size:
+                y0 = min(max(0, y0 - (tile_size - rh) // 2), max(0, height - tile_size))
+                y1 = min(y0 + tile_size, height)
+            rw, rh = x1 - x0, y1 - y0
+            for wx0, wy0, wx1, wy1 in tile_windows(rh, rw, tile_size, overlap):
+                windows.append((x0 + wx0, y0 + wy0, x0 + wx1, y0 + wy1))
+    return windows
+
+
+def merge_nms(det, iou_thres=0.45):
+    """依類別NMS合併切片結果，det: (n, 6) xyxy, conf, cls"""
+    if det.shape[0] < 2:
+        return det
+    keep = torchvision.ops.batched_nms(det[:, :4], det[:, 4], det[:, 5].long(), iou_thres)
+    return det[keep]
+
+
+def merge_wbf(det, iou_thres=0.45):
+    """加權框融合：同類別且 IoU 超過閾值的框以信心度加權平均座標，信心度取最大值"""
+    if det.shape[0] < 2:
+        return det
+    det = det[det[:, 4].argsort(descending=True)]
+    iou = box_iou(det[:, :4], det[:, :4])
+    same_cls = det[:, 5:6] == det[:, 5:6].T
+    cluster = (iou > iou_thres) & same_cls
+    used = torch.zeros(det.shape[0], dtype=torch.bool, device=det.device)
+    fused = []
+    for i in range(det.shape[0]):
+        if used[i]:
+            continue
+        members = cluster[i] & ~used
+        members[i] = True
+        group = det[members]
+        w = group[:, 4:5]
+        box = (group[:, :4] * w).sum(0) / w.sum()
+        fused.append(torch.cat((box, group[:1, 4], group[:1, 5])))
+        used |= members
+    return torch.stack(fused, 0)
+
+
+MERGE_METHODS = {
+    'nms': merge_nms,
+    'wbf': merge_wbf,
+}
+
+
+def merge_tile_detections(tile_dets, windows, iou_thres=0.45, method='nms'):
+    """
+    將各切片的檢測結果平移回原圖座標並合併
+
+    Args:
+        tile_dets: 各切片在切片座標系下的 (n, 6) 檢測結果
+        windows: 對應的切片視窗 (x0, y0, x1, y1)
+        method: 'nms' 類別NMS 或 'wbf' 加權框融合
+
+    Returns:
+        Tensor: (n, 6) 原圖座標的合併結果
+    """
+    shifted = []
+    for det, (x0, y0, _, _) in zip(tile_dets, windows):
+        if det is None or not len(det):
+            continue
+        det = det.clone()
+        det[:, [0, 2]] += x0
+        det[:, [1, 3]] += y0
+        shifted.append(det)
+    if not shifted:
+        return torch.zeros((0, 6))
+    merge = MERGE_METHODS.get(method, merge_nms)
+    return merge(torch.cat(shifted, 0), iou_thres)
@@ -0,0 +1,223 @@
+"""
+缺陷追蹤模組
+向量化的 IoU 關聯 + 等速 Kalman 濾波追蹤器：關鍵幀以檢測結果更新軌跡，其餘幀以預測傳遞檢測框；
+每個實體缺陷對應一個穩定的追蹤ID，只計數一次
+"""
+
+import numpy as np
+
+from utils.results import DetectionResult
+
+
+def box_iou_np(a, b):
+    """兩組 xyxy 框的 IoU 矩陣 (len(a), len(b))"""
+    if not len(a) or not len(b):
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(rb - lt, 0, None).prod(2)
+    area_a = (a[:, 2:] - a[:, :2]).prod(1)
+    area_b = (b[:, 2:] - b[:, :2]).prod(1)
+    return inter / (area_a[:, None] + area_b[None] - inter + 1e-9)
+
+
+def _xyxy_to_z(b):
+    return np.stack(((b[:, 0] + b[:, 2]) / 2, (b[:, 1] + b[:, 3]) / 2, b[:, 2] - b[:, 0], b[:, 3] - b[:, 1]), 1)
+
+
+def _z_to_xyxy(z):
+    w, h = np.clip(z[:, 2], 1, None), np.clip(z[:, 3], 1, None)
+    return np.stack((z[:, 0] - w / 2, z[:, 1] - h / 2, z[:, 0] + w / 2, z[:, 1] + h / 2), 1)
+
+
+class BoxTracker:
+    """關鍵幀檢測 + 框傳遞追蹤器
+
+    狀態 [cx, cy, w, h, vx, vy, vw, vh]，所有軌跡的預測與更新以批次矩陣運算完成
+
+    Args:
+        keyframe_interval: 每隔幾幀執行一次模型推理（1 為每幀推理，只做追蹤計數）
+        iou_thres: 檢測框與軌跡關聯的最小 IoU（僅同類別）
+        max_age: 軌跡連續多少幀未被檢測更新即移除
+        min_hits: 軌跡被檢測更新幾次後才輸出與計數
+        decay: 未經檢測更新的幀，軌跡信心度乘上此係數
+        refresh_conf: 任一輸出中的軌跡信心度低於此值時提早推理
+    """
+
+    _F = np.eye(8, dtype=np.float64)
+    _F[:4, 4:] = np.eye(4)  # 等速模型，dt = 1 幀
+
+    def __init__(self, keyframe_interval=5, iou_thres=0.3, max_age=30, min_hits=1, decay=0.9, refresh_conf=0.2):
+        self.keyframe_interval = max(1, int(keyframe_interval))
+        self.iou_thres = iou_thres
+        self.max_age = max_age
+        self.min_hits = max(1, int(min_hits))
+        self.decay = decay
+        self.refresh_conf = refresh_conf
+        self.names = ()
+        self.shape = None
+        self.reset()
+
+    def reset(self):
+        self.x = np.zeros((0, 8))              # Kalman 狀態
+        self.P = np.zeros((0, 8, 8))           # 狀態共變異數
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.cls = np.zeros(0, dtype=np.float32)
+        self.conf = np.zeros(0, dtype=np.float32)
+        self.hits = np.zeros(0, dtype=np.int64)
+        self.misses = np.zeros(0, dtype=np.int64)  # 距上次檢測更新的幀數
+        self.next_id = 1
+        self.since_keyframe = 0
+        self.keyframes = 0
+        self.propagated = 0
+        self.counted = {}  # 追蹤ID -> 類別ID，已確認（計數）的缺陷
+        self.stale = False  # 最近一次輸出後 needs_refresh() 的結果，供其他執行緒讀取（不觸及更新中的陣列）
+
+    # ---- 排程 -------------------------------------------------------------------------------------------------
+    def needs_refresh(self):
+        """輸出中的軌跡信心度已衰減到門檻以下（已離開畫面、不再輸出的軌跡不觸發推理）"""
+        active = (self.hits >= self.min_hits) & (self.misses <= self.since_keyframe)
+        return bool(np.any(self.conf[active] < self.refresh_conf))
+
+    def due(self):
+        """下一幀是否應執行模型推理"""
+        return self.keyframes == 0 or self.since_keyframe + 1 >= self.keyframe_interval or self.needs_refresh()
+
+    # ---- Kalman ----------------------------------------------------------------------------------------------
+    def _noise(self, h, pos, vel):
+        std = np.concatenate([np.outer(h, pos), np.outer(h, vel)], 1)  # 雜訊與框高成比例
+        return std ** 2
+
+    def _predict(self):
+        if not len(self.x):
+            return
+        F = self._F
+        Q = self._noise(self.x[:, 3], [1 / 20, 1 / 20, 1 / 20, 1 / 20], [1 / 160, 1 / 160, 1 / 160, 1 / 160])
+        self.x = self.x @ F.T
+        self.P = F @ self.P @ F.T
+        self.P[:, np.arange(8), np.arange(8)] += Q
+        self.x[:, 2:4] = np.clip(self.x[:, 2:4], 1, None)
+        self.misses += 1
+
+    def _correct(self, idx, z):
+        """以觀測 z (m, 4) 更新軌跡 idx"""
+        x, P = self.x[idx], self.P[idx]
+        R = self._noise(x[:, 3], [1 / 20, 1 / 20, 1 / 20, 1 / 20], [])[:, :4]
+        S = P[:, :4, :4].copy()
+        S[:, np.arange(4), np.arange(4)] += R
+        K = P[:, :, :4] @ np.linalg.inv(S)  # (m, 8, 4)
+        x = x + (K @ (z - x[:, :4])[..., None])[..., 0]
+        P = P - K @ P[:, :4, :]
+        self.x[idx], self.P[idx] = x, P
+
+    def _new_tracks(self, z):
+        n = len(z)
+        x = np.zeros((n, 8))
+        x[:, :4] = z
+        h = z[:, 3]
+        P = np.zeros((n, 8, 8))
+        P[:, np.arange(8), np.arange(8)] = self._noise(h, [2 / 20] * 4, [10 / 160] * 4)
+        return x, P
+
+    # ---- 公開介面 --------------------------------------------------------------------------------------------
+    def update(self, result):
+        """
+        以關鍵幀的檢測結果更新軌跡
+
+        Args:
+            result: DetectionResult
+        Returns:
+            DetectionResult: 已確認軌跡的檢測框，ids 為追蹤ID
+        """
+        self.names, self.shape = result.names, result.shape
+        self._predict()
+        self.keyframes += 1
+        self.since_keyframe = 0
+
+        boxes, conf, cls = result.xyxy.astype(np.float64), result.conf, result.data[:, 5]
+        iou = box_iou_np(_z_to_xyxy(self.x[:, :4]), boxes)
+        iou[self.cls[:, None] != cls[None]] = 0  # 只關聯同類別
+        matched_t, matched_d = self._match(iou)
+
+        if len(matched_t):
+            self._correct(matched_t, _xyxy_to_z(boxes[matched_d]))
+            self.conf[matched_t] = conf[matched_d]
+            self.hits[matched_t] += 1
+            self.misses[matched_t] = 0
+
+        new = np.setdiff1d(np.arange(len(boxes)), matched_d)
+        if len(new):
+            x, P = self._new_tracks(_xyxy_to_z(boxes[new]))
+            self.x, self.P = np.concatenate((self.x, x)), np.concatenate((self.P, P))
+            self.ids = np.concatenate((self.ids, np.arange(self.next_id, self.next_id + len(new))))
+            self.next_id += len(new)
+            self.cls = np.concatenate((self.cls, cls[new]))
+            self.conf = np.concatenate((self.conf, conf[new]))
+            self.hits = np.concatenate((self.hits, np.ones(len(new), dtype=np.int64)))
+            self.misses = np.concatenate((self.misses, np.zeros(len(new), dtype=np.int64)))
+
+        self._prune()
+        for i, c in zip(self.ids[self.hits >= self.min_hits].tolist(), self.cls[self.hits >= self.min_hits].tolist()):
+            self.counted.setdefault(i, int(c))
+        return self._output(self.misses == 0)
+
+    def predict(self):
+        """非關鍵幀：以等速模型傳遞軌跡，信心度依 decay 衰減"""
+        self._predict()
+        self.since_keyframe += 1
+        self.propagated += 1
+        self.conf = self.conf * self.decay
+        self._prune()
+        return self._output(self.misses <= self.since_keyframe)  # 只傳遞上一個關鍵幀仍被檢測到的軌跡
+
+    def _match(self, iou):
+        """依 IoU 由大到小貪婪配對，回傳 (軌跡索引, 檢測索引)"""
+        if not iou.size:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        t, d = np.nonzero(iou >= self.iou_thres)
+        order = np.argsort(-iou[t, d])
+        used_t, used_d, mt, md = set(), set(), [], []
+        for i, j in zip(t[order].tolist(), d[order].tolist()):
+            if i in used_t or j in used_d:
+                continue
+            used_t.add(i)
+            used_d.add(j)
+            mt.append(i)
+            md.append(j)
+        return np.array(mt, dtype=np.int64), np.array(md, dtype=np.int64)
+
+    def _prune(self):
+        keep = self.misses <= self.max_age
+        if not keep.all():
+            self.x, self.P = self.x[keep], self.P[keep]
+            self.ids, self.cls, self.conf = self.ids[keep], self.cls[keep], self.conf[keep]
+            self.hits, self.misses = self.hits[keep], self.misses[keep]
+
+    def _output(self, mask):
+        self.stale = self.needs_refresh()
+        mask = mask & (self.hits >= self.min_hits)
+        boxes = _z_to_xyxy(self.x[mask, :4])
+        if self.shape is not None:
+            h, w = self.shape
+            boxes = np.clip(boxes, 0, [w, h, w, h])
+        data = np.concatenate((boxes, self.conf[mask, None], self.cls[mask, None]), 1) if mask.any() else None
+        return DetectionResult(data, self.names, self.shape, self.ids[mask])
+
+    @property
+    def unique_count(self):
+        """已確認的缺陷總數（每個追蹤ID計數一次）"""
+        return len(self.counted)
+
+    @property
+    def unique_counts(self):
+        """{類別名稱: 已確認的缺陷數}"""
+        counts = {}
+        n = len(self.names)
+        for c in self.counted.values():
+            name = self.names[c] if c < n else str(c)
+            counts[name] = counts.get(name, 0) + 1
+        return counts
+
+    def stats(self):
+        return {'keyframes': self.keyframes, 'propagated': self.propagated, 'tracks': len(self.ids),
+                'unique': self.unique_count}
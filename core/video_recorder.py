@@ -0,0 +1,203 @@
+"""
+錄影模組
+於獨立執行緒中將檢測串流編碼為影片，支援分段輪替與丟幀統計，推理執行緒只做非阻塞的放入佇列
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+
+import cv2
+
+
+_STOP = object()  # 結束標記
+
+
+class VideoRecorder:
+    """檢測串流錄影器
+
+    Args:
+        output_dir: 影片輸出目錄
+        fps: 影片幀率
+        annotated: True 錄製標註後影像；False 錄製原始影像並以側錄檔 (.jsonl) 保存每幀檢測結果
+        draw_fn: draw_fn(frame, results) -> 標註影像，於錄影執行緒中執行
+        sidecar: 是否輸出側錄檔，預設在錄製原始影像時輸出
+        segment_seconds: 每段影片長度上限（秒，依影片時間計算），0 為不限
+        segment_mb: 每段影片大小上限（MB），0 為不限
+        maxsize: 待編碼佇列上限，已滿時新幀直接丟棄並計入 dropped
+        fourcc / ext: 編碼器與副檔名
+        prefix: 檔名前綴
+        timed: 依放入時間戳排列影片時間軸（攝像頭只錄到實際處理的幀時使用）：兩幀間隔內重複寫入上一幀，
+            間隔小於一個影格的幀略過，影片播放速度與分段長度與實際時間一致
+    """
+
+    def __init__(self, output_dir, fps=30.0, annotated=True, draw_fn=None, sidecar=None, segment_seconds=0,
+                 segment_mb=0, maxsize=32, fourcc='mp4v', ext='.mp4', prefix='record', timed=False):
+        self.output_dir = output_dir
+        self.fps = float(fps) if fps and fps > 0 else 30.0
+        self.annotated = annotated
+        self.draw_fn = draw_fn
+        self.sidecar = (not annotated) if sidecar is None else sidecar
+        self.segment_frames = int(segment_seconds * self.fps) if segment_seconds else 0
+        self.segment_bytes = int(segment_mb * 1024 ** 2) if segment_mb else 0
+        self.fourcc = cv2.VideoWriter_fourcc(*fourcc)
+        self.ext = ext
+        self.prefix = prefix
+        self.timed = timed
+
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0    # 編碼跟不上而丟棄的幀
+        self.errors = 0
+        self.repeated = 0   # timed 模式下為填補時間軸而重複寫入的影格
+        self.skipped = 0    # timed 模式下與前一幀落在同一影格而略過的幀
+        self.segments = []  # 已建立的影片檔路徑
+        self.encode_time = 0.0
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(max(1, int(maxsize)))
+        self._writer = None
+        self._sidecar_file = None
+        self._size = None
+        self._segment_written = 0
+        self._t0 = None       # timed 模式時間軸起點
+        self._timeline = 0    # timed 模式已寫入的影格總數
+        self._last_img = None  # timed 模式上一幀（填補間隔用）
+        self._thread = None
+
+    def start(self):
+        """啟動錄影執行緒"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def submit(self, frame, results=None, index=None):
+        """
+        非阻塞地排入一幀；佇列已滿時丟棄
+
+        Returns:
+            bool: 是否已排入
+        """
+        with self._lock:
+            self.submitted += 1
+        try:
+            self._queue.put_nowait((frame, results, index, time.time()))
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+    def stop(self):
+        """寫完佇列中剩餘的幀並關閉影片檔"""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+
+    def stats(self):
+        """回傳錄影統計"""
+        with self._lock:
+            return {
+                'submitted': self.submitted,
+                'written': self.written,
+                'dropped': self.dropped,
+                'errors': self.errors,
+                'repeated': self.repeated,
+                'skipped': self.skipped,
+                'segments': len(self.segments),
+                'queue_depth': self._queue.qsize(),
+                'avg_encode_ms': self.encode_time / max(self.written, 1) * 1000,
+            }
+
+    def _loop(self):
+        try:
+            while True:
+                job = self._queue.get()
+                if job is _STOP:
+                    break
+                try:
+                    t = time.time()
+                    self._write(*job)
+                    with self._lock:
+                        self.written += 1
+                        self.encode_time += time.time() - t
+                except Exception:
+                    with self._lock:
+                        self.errors += 1
+        finally:
+            self._close_segment()
+
+    def _repeats(self, timestamp):
+        """此幀需寫入的影格數：非 timed 模式固定 1；timed 模式依時間戳補足到此時間點應有的影格數"""
+        if not self.timed:
+            return 1
+        if self._t0 is None:
+            self._t0 = timestamp
+        target = int(round((timestamp - self._t0) * self.fps)) + 1
+        repeats = max(0, target - self._timeline)
+        self._timeline += repeats
+        return repeats
+
+    def _write(self, frame, results, index, timestamp):
+        repeats = self._repeats(timestamp)
+        if not repeats:
+            with self._lock:
+                self.skipped += 1
+            return
+        img = self.draw_fn(frame, results) if self.annotated and self.draw_fn and results is not None else frame
+        h, w = img.shape[:2]
+        held = self._last_img if self._last_img is not None and self._last_img.shape == img.shape else img
+        for i in range(repeats):
+            if self._writer is None or (w, h) != self._size or self._segment_full():
+                self._open_segment(w, h, list(results.names) if results is not None else [])
+            self._writer.write(img if i == repeats - 1 else held)  # 間隔內維持上一幀畫面，時間點到時才換成此幀
+            if self._sidecar_file and i == repeats - 1:
+                record = {'frame': self._segment_written, 'index': index, 'time': round(timestamp, 3)}
+                if results is not None:
+                    record['boxes'] = [[round(v, 2) for v in row] for row in results.data.tolist()]
+                self._sidecar_file.write(json.dumps(record) + '\n')
+            self._segment_written += 1
+        if self.timed:
+            self._last_img = img
+        with self._lock:
+            self.repeated += repeats - 1
+
+    def _segment_full(self):
+        """依影片時間或檔案大小判斷是否輪替分段"""
+        if self.segment_frames and self._segment_written >= self.segment_frames:
+            return True
+        if self.segment_bytes and self._segment_written % 30 == 0:  # 避免每幀查詢檔案大小
+            try:
+                return os.path.getsize(self.segments[-1]) >= self.segment_bytes
+            except OSError:
+                return False
+        return False
+
+    def _open_segment(self, w, h, names=()):
+        self._close_segment()
+        name = f"{self.prefix}_{time.strftime('%Y%m%d_%H%M%S')}_{len(self.segments):03d}"
+        path = os.path.join(self.output_dir, name + self.ext)
+        self._writer = cv2.VideoWriter(path, self.fourcc, self.fps, (w, h))
+        if not self._writer.isOpened():
+            self._writer = None
+            raise IOError(f"無法建立影片檔: {path}")
+        if self.sidecar:
+            self._sidecar_file = open(os.path.join(self.output_dir, name + '.jsonl'), 'w')
+            self._sidecar_file.write(json.dumps({'video': name + self.ext, 'fps': self.fps, 'size': [w, h],
+                                                 'annotated': self.annotated, 'names': list(names),
+                                                 'columns': ['x1', 'y1', 'x2', 'y2', 'conf', 'cls']}) + '\n')
+        self._size = (w, h)
+        self._segment_written = 0
+        self.segments.append(path)
+
+    def _close_segment(self):
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+        if self._sidecar_file is not None:
+            self._sidecar_file.close()
+            self._sidecar_file = None
@@ -0,0 +1,169 @@
+"""
+權重中繼資料索引
+掃描 weights/ 與 runs/ 下的權重檔，每個檔案版本（路徑 + 大小 + 修改時間）只取一次中繼資料
+（類別名稱、類別數、步長、輸入尺寸、訓練輪數）並保存於磁碟索引；各分頁的權重選單只讀取索引
+"""
+
+import json
+import os
+import threading
+import time
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+
+WEIGHT_EXTS = ('.pt', '.pth', '.onnx', '.torchscript')
+DEFAULT_ROOTS = ('weights', 'runs')
+DEFAULT_INDEX = os.path.join('runs', 'weights_index.json')
+SKIP_DIRS = {'compile_cache', '__pycache__'}  # 編譯快取內的 .pt 不是權重檔
+INDEX_VERSION = 1
+
+
+class WeightsIndex:
+    """權重中繼資料索引
+
+    Args:
+        index_path: 索引檔路徑 (JSON)
+        roots: 掃描的根目錄
+    """
+
+    def __init__(self, index_path=DEFAULT_INDEX, roots=DEFAULT_ROOTS):
+        self.index_path = index_path
+        self.roots = roots
+        self.entries = {}  # 絕對路徑 -> 條目
+        self.extracted = 0  # 本行程實際讀取權重檔的次數
+        self._lock = threading.Lock()
+        self._scan_lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == INDEX_VERSION:
+            with self._lock:
+                self.entries = data.get('entries', {})
+
+    def save(self):
+        with self._lock:
+            data = {'version': INDEX_VERSION, 'entries': dict(self.entries)}
+        try:
+            os.makedirs(os.path.dirname(self.index_path) or '.', exist_ok=True)
+            tmp = self.index_path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+            os.replace(tmp, self.index_path)
+        except OSError:  # 索引只是快取，寫入失敗時下次重新掃描
+            pass
+
+    def files(self):
+        """列出根目錄下的權重檔"""
+        for root in self.roots:
+            for dirpath, dirnames, filenames in os.walk(root):
+                dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS and not d.startswith('.')]
+                for name in filenames:
+                    if name.endswith(WEIGHT_EXTS):
+                        yield os.path.join(dirpath, name)
+
+    def scan(self, progress=None):
+        """
+        掃描根目錄，只為新增或已修改的權重檔讀取中繼資料，並移除已刪除的檔案
+
+        Args:
+            progress: 回呼 progress(已處理數, 總數)
+        Returns:
+            list: 所有條目（依修改時間新到舊）
+        """
+        with self._scan_lock:  # 多個分頁同時觸發時只掃描一次，其餘等待後直接使用結果
+            files = list(self.files())
+            seen, changed = set(), False
+            for i, path in enumerate(files):
+                key = os.path.abspath(path)
+                seen.add(key)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entry = self.entries.get(key)
+                if entry is None or entry['size'] != st.st_size or entry['mtime_ns'] != st.st_mtime_ns:
+                    entry = self._extract(path, st)
+                    with self._lock:
+                        self.entries[key] = entry
+                    changed = True
+                if progress:
+                    progress(i + 1, len(files))
+            with self._lock:
+                for key in set(self.entries) - seen:
+                    del self.entries[key]
+                    changed = True
+            if changed:
+                self.save()
+        return self.list()
+
+    def _extract(self, path, st):
+        """讀取一個權重檔的中繼資料：優先讀取推理產物的標頭，否則反序列化檢查點一次"""
+        torchscript = path.endswith('.torchscript.pt')  # export.py 的 TorchScript 輸出，不是訓練檢查點
+        entry = {'path': path, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns,
+                 'format': 'torchscript' if torchscript else os.path.splitext(path)[1].lstrip('.')}
+        if torchscript or not path.endswith(('.pt', '.pth')):
+            return entry
+        self.extracted += 1
+        try:
+            from yolo_gui_utils.model_artifact import artifact_meta, checkpoint_meta
+            meta = artifact_meta(path)
+            if meta is None:
+                from utils.torch_utils import torch_load
+                meta = checkpoint_meta(torch_load(path, map_location='cpu'), path)
+            entry.update({k: meta[k] for k in ('names', 'nc', 'stride', 'imgsz', 'epoch') if k in meta})
+        except Exception as e:  # 非 YOLOv5 檢查點或檔案損毀，仍列出但不含中繼資料
+            entry['error'] = str(e)
+        return entry
+
+    def list(self, exts=WEIGHT_EXTS):
+        with self._lock:
+            entries = [e for e in self.entries.values() if e['path'].endswith(tuple(exts))]
+        return sorted(entries, key=lambda e: -e['mtime_ns'])
+
+    def get(self, path):
+        with self._lock:
+            return self.entries.get(os.path.abspath(path))
+
+
+def describe(entry):
+    """條目的簡短說明（權重選單的提示文字）"""
+    lines = [entry['path'],
+             f"大小: {entry['size'] / 1e6:.1f} MB，修改時間: "
+             f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['mtime_ns'] / 1e9))}"]
+    if 'nc' in entry:
+        names = entry.get('names', [])
+        lines.append(f"類別數: {entry['nc']}，步長: {entry.get('stride')}，輸入尺寸: {entry.get('imgsz')}，"
+                     f"訓練輪數: {entry.get('epoch', -1)}")
+        lines.append(f"類別: {', '.join(names[:20])}{' ...' if len(names) > 20 else ''}")
+    elif 'error' in entry:
+        lines.append(f"無法讀取中繼資料: {entry['error']}")
+    return '\n'.join(lines)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """取得行程唯一的權重索引"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = WeightsIndex()
+        return _index
+
+
+class WeightsScanWorker(QThread):
+    """背景掃描權重索引（首次掃描大量檢查點時不阻塞介面）"""
+
+    progress = pyqtSignal(int, int)
+    scan_finished = pyqtSignal(list)
+
+    def run(self):
+        self.scan_finished.emit(get_index().scan(progress=self.progress.emit))
@@ -11,10 +11,11 @@ from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QGridLayout,
                              QFileDialog, QProgressBar, QComboBox, QSpinBox,
                              QDoubleSpinBox, QCheckBox, QSlider, QMessageBox, QShortcut)
 from PyQt5.QtCore import Qt, pyqtSignal, QThread, pyqtSlot, QTimer
-from PyQt5.QtGui import QPixmap, QFont, QKeySequence
+from PyQt5.QtGui import QImage, QPixmap, QFont, QKeySequence
 import numpy as np
 from core.camera_worker import CameraWorker
 from core.analyze_worker import AnalyzeWorker
+from gui.widgets.weights_picker import WeightsPicker
 
 
 class DetectTab(QWidget):
@@ -38,6 +39,7 @@ class DetectTab(QWidget):
         self.output_dir = ""
         self.camera_worker = None
         self.analyze_worker = None
+        self.infer_worker = None
         self.is_camera_running = False
         self.init_ui()
         self.connect_signals()
@@ -129,7 +131,7 @@ class DetectTab(QWidget):
         # 權重檔案
         self.weights_label = QLabel("權重檔:")
         self.weights_input = QLineEdit()
-        self.weights_input.setPlaceholderText("選擇.pt權重檔案")
+        self.weights_input.setPlaceholderText("選擇.pt或.onnx權重檔案")
         self.weights_input.setText("./weights/baseline.pt")  # 預設.pt檔案路徑
         self.browse_weights_btn = QPushButton("瀏覽...")
         
@@ -154,6 +156,53 @@ class DetectTab(QWidget):
         layout.addWidget(self.device_label, 2, 0)
         layout.addWidget(self.device_combo, 2, 1)
         
+        # ONNX Runtime 執行緒設定（0 表示由 ONNX Runtime 自動決定）
+        self.intra_threads_label = QLabel("ONNX運算執行緒:")
+        self.intra_threads_spinbox = QSpinBox()
+        self.intra_threads_spinbox.setRange(0, 64)
+        self.intra_threads_spinbox.setValue(0)
+        self.intra_threads_spinbox.setToolTip("單一運算子內的平行執行緒數 (intra-op)，0 為自動")
+        self.inter_threads_label = QLabel("ONNX並行執行緒:")
+        self.inter_threads_spinbox = QSpinBox()
+        self.inter_threads_spinbox.setRange(0, 16)
+        self.inter_threads_spinbox.setValue(0)
+        self.inter_threads_spinbox.setToolTip("運算子之間的平行執行緒數 (inter-op)，0 為循序執行")
+        
+        layout.addWidget(self.intra_threads_label, 3, 0)
+        layout.addWidget(self.intra_threads_spinbox, 3, 1)
+        layout.addWidget(self.inter_threads_label, 4, 0)
+        layout.addWidget(self.inter_threads_spinbox, 4, 1)
+        
+        # 推理精度
+        self.precision_label = QLabel("推理精度:")
+        self.precision_combo = QComboBox()
+        self.precision_combo.addItems(["fp32", "bf16", "fp16"])
+        self.precision_combo.setToolTip("bf16: CPU autocast（AVX512-BF16/AMX）；fp16: CUDA 半精度或 CPU autocast；"
+                                        "不支援時自動改用 fp32")
+        
+        layout.addWidget(self.precision_label, 5, 0)
+        layout.addWidget(self.precision_combo, 5, 1)
+        
+        # 執行模式
+        self.cpu_mode_label = QLabel("執行模式:")
+        self.cpu_mode_combo = QComboBox()
+        self.cpu_mode_combo.addItems(["eager", "channels_last", "onednn", "compile"])
+        self.cpu_mode_combo.setToolTip("channels_last: NHWC 記憶體格式；onednn: 依輸入尺寸凍結並融合的 oneDNN 圖（僅CPU，"
+                                       "其他設備改用 channels_last，輸出與 eager 不一致時自動退回）；"
+                                       "compile: torch.compile 編譯。編譯產物快取於 runs/compile_cache，編譯失敗時自動退回 eager")
+        
+        layout.addWidget(self.cpu_mode_label, 6, 0)
+        layout.addWidget(self.cpu_mode_combo, 6, 1)
+        
+        # 已索引權重
+        self.indexed_weights_label = QLabel("已索引權重:")
+        self.weights_picker = WeightsPicker()
+        self.rescan_weights_btn = QPushButton("重新掃描")
+        
+        layout.addWidget(self.indexed_weights_label, 7, 0)
+        layout.addWidget(self.weights_picker, 7, 1)
+        layout.addWidget(self.rescan_weights_btn, 7, 2)
+        
         parent_layout.addWidget(group)
         
     def create_detection_group(self, parent_layout):
@@ -200,6 +249,148 @@ class DetectTab(QWidget):
         layout.addWidget(self.classes_label, 3, 0)
         layout.addWidget(self.classes_input, 3, 1, 1, 2)
         
+        # 資料夾批次推理
+        self.batch_size_label = QLabel("批次大小:")
+        self.batch_size_spinbox = QSpinBox()
+        self.batch_size_spinbox.setRange(1, 64)
+        self.batch_size_spinbox.setValue(8)
+        self.batch_size_spinbox.setToolTip("資料夾檢測時每次送入模型的圖片數")
+        
+        self.prefetch_label = QLabel("預讀執行緒:")
+        self.prefetch_spinbox = QSpinBox()
+        self.prefetch_spinbox.setRange(1, 16)
+        self.prefetch_spinbox.setValue(4)
+        self.prefetch_spinbox.setToolTip("資料夾檢測時於背景解碼圖片的執行緒數")
+        
+        layout.addWidget(self.batch_size_label, 4, 0)
+        layout.addWidget(self.batch_size_spinbox, 4, 1)
+        layout.addWidget(self.prefetch_label, 5, 0)
+        layout.addWidget(self.prefetch_spinbox, 5, 1)
+        
+        self.render_workers_label = QLabel("輸出執行緒:")
+        self.render_workers_spinbox = QSpinBox()
+        self.render_workers_spinbox.setRange(1, 8)
+        self.render_workers_spinbox.setValue(2)
+        self.render_workers_spinbox.setToolTip("繪製標註與保存結果的執行緒數")
+        
+        layout.addWidget(self.render_workers_label, 6, 0)
+        layout.addWidget(self.render_workers_spinbox, 6, 1)
+        
+        # 影片播放模式
+        self.realtime_preview_checkbox = QCheckBox("影片即時預覽（依原始幀率播放）")
+        self.realtime_preview_checkbox.setToolTip("未勾選時以最快速度離線分析影片")
+        
+        layout.addWidget(self.realtime_preview_checkbox, 7, 0, 1, 2)
+        
+        # 切片推理（高解析度面板影像）
+        self.tile_checkbox = QCheckBox("切片推理")
+        self.tile_checkbox.setToolTip("將大於切片尺寸的影像切成重疊切片推理，保留小缺陷的解析度")
+        self.tile_size_spinbox = QSpinBox()
+        self.tile_size_spinbox.setRange(256, 2048)
+        self.tile_size_spinbox.setSingleStep(64)
+        self.tile_size_spinbox.setValue(640)
+        self.tile_overlap_spinbox = QDoubleSpinBox()
+        self.tile_overlap_spinbox.setRange(0.0, 0.5)
+        self.tile_overlap_spinbox.setSingleStep(0.05)
+        self.tile_overlap_spinbox.setDecimals(2)
+        self.tile_overlap_spinbox.setValue(0.2)
+        self.tile_merge_combo = QComboBox()
+        self.tile_merge_combo.addItems(["nms", "wbf"])
+        self.tile_merge_combo.setToolTip("切片接縫合併方式：nms 類別NMS，wbf 加權框融合")
+        
+        layout.addWidget(self.tile_checkbox, 8, 0)
+        layout.addWidget(QLabel("切片尺寸:"), 9, 0)
+        layout.addWidget(self.tile_size_spinbox, 9, 1)
+        layout.addWidget(QLabel("重疊比例:"), 10, 0)
+        layout.addWidget(self.tile_overlap_spinbox, 10, 1)
+        layout.addWidget(QLabel("合併方式:"), 11, 0)
+        layout.addWidget(self.tile_merge_combo, 11, 1)
+        
+        # NMS 引擎
+        self.nms_method_label = QLabel("NMS方式:")
+        self.nms_method_combo = QComboBox()
+        self.nms_method_combo.addItems(["batched", "torchvision", "fast", "matrix", "merge"])
+        self.nms_method_combo.setToolTip("batched: 整批一次NMS；torchvision: 逐張NMS；fast: Fast-NMS；"
+                                         "matrix: Matrix-NMS 分數衰減；merge: 加權合併框")
+        
+        layout.addWidget(self.nms_method_label, 12, 0)
+        layout.addWidget(self.nms_method_combo, 12, 1)
+        
+        # 畫面變化閘門（攝像頭）
+        self.change_gate_checkbox = QCheckBox("畫面未變化時略過推理（攝像頭）")
+        self.change_gate_checkbox.setToolTip("輸送帶空轉或板子靜止時沿用上一次的檢測結果，降低CPU負載")
+        self.change_method_combo = QComboBox()
+        self.change_method_combo.addItems(["diff", "phash"])
+        self.change_method_combo.setToolTip("diff: 縮圖像素差分；phash: 感知雜湊，對亮度微變較不敏感")
+        self.change_sensitivity_spinbox = QDoubleSpinBox()
+        self.change_sensitivity_spinbox.setRange(0.0, 1.0)
+        self.change_sensitivity_spinbox.setSingleStep(0.05)
+        self.change_sensitivity_spinbox.setDecimals(2)
+        self.change_sensitivity_spinbox.setValue(0.8)
+        self.change_sensitivity_spinbox.setToolTip("越高越容易判定畫面已變化")
+        self.change_refresh_spinbox = QDoubleSpinBox()
+        self.change_refresh_spinbox.setRange(0.0, 600.0)
+        self.change_refresh_spinbox.setSingleStep(1.0)
+        self.change_refresh_spinbox.setDecimals(1)
+        self.change_refresh_spinbox.setValue(5.0)
+        self.change_refresh_spinbox.setToolTip("距上次推理超過此秒數時強制推理，0 為不強制")
+        
+        layout.addWidget(self.change_gate_checkbox, 13, 0, 1, 2)
+        layout.addWidget(QLabel("變化偵測:"), 14, 0)
+        layout.addWidget(self.change_method_combo, 14, 1)
+        layout.addWidget(QLabel("靈敏度:"), 15, 0)
+        layout.addWidget(self.change_sensitivity_spinbox, 15, 1)
+        layout.addWidget(QLabel("強制刷新(秒):"), 16, 0)
+        layout.addWidget(self.change_refresh_spinbox, 16, 1)
+        
+        # 電路板區域裁切
+        self.board_roi_checkbox = QCheckBox("自動裁切電路板區域")
+        self.board_roi_checkbox.setToolTip("以顏色/邊緣門檻找出電路板範圍，只推理裁切區域，減少治具與背景像素")
+        self.roi_method_combo = QComboBox()
+        self.roi_method_combo.addItems(["auto", "color", "edge"])
+        self.roi_method_combo.setToolTip("color: 防焊漆顏色門檻；edge: 邊緣輪廓；auto: 顏色失敗時改用邊緣")
+        self.fixture_input = QLineEdit()
+        self.fixture_input.setPlaceholderText("default")
+        self.fixture_input.setToolTip("治具名稱，電路板區域依攝像頭與治具分別快取")
+        self.roi_revalidate_spinbox = QDoubleSpinBox()
+        self.roi_revalidate_spinbox.setRange(0.0, 600.0)
+        self.roi_revalidate_spinbox.setSingleStep(1.0)
+        self.roi_revalidate_spinbox.setDecimals(1)
+        self.roi_revalidate_spinbox.setValue(2.0)
+        self.roi_revalidate_spinbox.setToolTip("快取的區域每隔此秒數重新偵測，0 為每幀偵測")
+        
+        layout.addWidget(self.board_roi_checkbox, 17, 0, 1, 2)
+        layout.addWidget(QLabel("區域偵測:"), 18, 0)
+        layout.addWidget(self.roi_method_combo, 18, 1)
+        layout.addWidget(QLabel("治具名稱:"), 19, 0)
+        layout.addWidget(self.fixture_input, 19, 1)
+        layout.addWidget(QLabel("重新驗證(秒):"), 20, 0)
+        layout.addWidget(self.roi_revalidate_spinbox, 20, 1)
+        
+        # 黃金樣板比對
+        self.golden_checkbox = QCheckBox("黃金樣板比對（只推理差異區域）")
+        self.golden_checkbox.setToolTip("每幀對位到良品樣板後差分，只對差異顯著的區域切片推理；良品板幾乎不經過模型")
+        self.golden_input = QLineEdit()
+        self.golden_input.setPlaceholderText("良品樣板影像（每種板型一張）")
+        self.browse_golden_btn = QPushButton("瀏覽...")
+        self.browse_golden_btn.clicked.connect(self.browse_golden)
+        
+        layout.addWidget(self.golden_checkbox, 21, 0, 1, 2)
+        layout.addWidget(self.golden_input, 22, 0, 1, 2)
+        layout.addWidget(self.browse_golden_btn, 22, 2)
+        
+        # 缺陷追蹤（影片/攝像頭）
+        self.track_checkbox = QCheckBox("缺陷追蹤（關鍵幀推理，影片/攝像頭）")
+        self.track_checkbox.setToolTip("每隔N幀推理一次，其餘幀以追蹤器傳遞檢測框；每個缺陷只計數一次")
+        self.keyframe_spinbox = QSpinBox()
+        self.keyframe_spinbox.setRange(1, 60)
+        self.keyframe_spinbox.setValue(5)
+        self.keyframe_spinbox.setToolTip("每隔幾幀執行一次模型推理，1 為每幀推理（只做追蹤計數）")
+        
+        layout.addWidget(self.track_checkbox, 23, 0, 1, 2)
+        layout.addWidget(QLabel("關鍵幀間隔:"), 24, 0)
+        layout.addWidget(self.keyframe_spinbox, 24, 1)
+        
         parent_layout.addWidget(group)
         
     def create_output_group(self, parent_layout):
@@ -242,6 +433,54 @@ class DetectTab(QWidget):
         layout.addWidget(self.line_thickness_label, 3, 0)
         layout.addWidget(self.line_thickness_spinbox, 3, 1)
         
+        # 保存格式與策略（背景寫入器）
+        self.save_format_label = QLabel("保存格式:")
+        self.save_format_combo = QComboBox()
+        self.save_format_combo.addItems(["jpg", "webp", "png"])
+        self.save_quality_label = QLabel("品質/壓縮:")
+        self.save_quality_spinbox = QSpinBox()
+        self.save_quality_spinbox.setRange(1, 100)
+        self.save_quality_spinbox.setValue(95)
+        self.save_quality_spinbox.setToolTip("JPEG/WebP 品質 (1-100)")
+        self.png_level_spinbox = QSpinBox()
+        self.png_level_spinbox.setRange(0, 9)
+        self.png_level_spinbox.setValue(3)
+        self.png_level_spinbox.setToolTip("PNG 壓縮等級 (0-9)，等級越高檔案越小但編碼越慢")
+        self.save_defective_checkbox = QCheckBox("只保存有缺陷的影像")
+        self.combined_labels_checkbox = QCheckBox("標註合併為單一檔案")
+        self.combined_labels_checkbox.setToolTip("所有標註寫入 labels.txt（每行前綴影像名稱）")
+        
+        layout.addWidget(self.save_format_label, 4, 0)
+        layout.addWidget(self.save_format_combo, 4, 1)
+        layout.addWidget(self.save_quality_label, 5, 0)
+        layout.addWidget(self.save_quality_spinbox, 5, 1)
+        layout.addWidget(self.png_level_spinbox, 5, 2)
+        layout.addWidget(self.save_defective_checkbox, 6, 0)
+        layout.addWidget(self.combined_labels_checkbox, 6, 1)
+        
+        # 錄影（攝像頭/影片檢測）
+        self.record_checkbox = QCheckBox("錄影")
+        self.record_checkbox.setToolTip("攝像頭/影片檢測時於背景錄製影片，輸出至 輸出目錄/records")
+        self.record_annotated_checkbox = QCheckBox("錄製標註影像")
+        self.record_annotated_checkbox.setChecked(True)
+        self.record_annotated_checkbox.setToolTip("未勾選時錄製原始影像，並以同名 .jsonl 保存每幀檢測結果")
+        self.record_minutes_spinbox = QSpinBox()
+        self.record_minutes_spinbox.setRange(0, 240)
+        self.record_minutes_spinbox.setValue(10)
+        self.record_minutes_spinbox.setSuffix(" 分")
+        self.record_minutes_spinbox.setToolTip("每段影片長度上限，0 為不分段")
+        self.record_mb_spinbox = QSpinBox()
+        self.record_mb_spinbox.setRange(0, 16384)
+        self.record_mb_spinbox.setValue(1024)
+        self.record_mb_spinbox.setSuffix(" MB")
+        self.record_mb_spinbox.setToolTip("每段影片大小上限，0 為不限")
+        
+        layout.addWidget(self.record_checkbox, 7, 0)
+        layout.addWidget(self.record_annotated_checkbox, 7, 1)
+        layout.addWidget(QLabel("分段:"), 8, 0)
+        layout.addWidget(self.record_minutes_spinbox, 8, 1)
+        layout.addWidget(self.record_mb_spinbox, 8, 2)
+        
         parent_layout.addWidget(group)
         
     def create_control_group(self, parent_layout):
@@ -426,6 +665,8 @@ class DetectTab(QWidget):
         # 按鈕信號
         self.browse_source_btn.clicked.connect(self.browse_source)
         self.browse_weights_btn.clicked.connect(self.browse_weights)
+        self.weights_picker.weights_selected.connect(self.on_indexed_weights)
+        self.rescan_weights_btn.clicked.connect(self.weights_picker.refresh)
         self.browse_output_btn.clicked.connect(self.browse_output)
         self.detect_btn.clicked.connect(self.start_detection)
         self.stop_btn.clicked.connect(self.stop_detection)
@@ -464,17 +705,15 @@ class DetectTab(QWidget):
             self.detection_worker.detection_result.connect(self.on_detection_result, Qt.QueuedConnection)
             self.detection_worker.progress_updated.connect(self.progress_bar.setValue, Qt.QueuedConnection)
             
-    @pyqtSlot(QPixmap)
-    def on_frame_processed(self, pixmap):
-        """處理檢測完成的幀（已優化為QPixmap）"""
+    @pyqtSlot(QImage)
+    def on_frame_processed(self, image):
+        """處理檢測完成的幀（worker已縮放並標註，QImage包裝worker的顯示緩衝區）"""
         try:
-            # 確保pixmap是正確的QPixmap格式
-            if not isinstance(pixmap, QPixmap):
-                self.add_log(f"警告: 接收到非QPixmap格式的數據: {type(pixmap)}")
-                return
-            if pixmap.isNull():
-                self.add_log("警告: 接收到空的QPixmap")
+            if not isinstance(image, QImage) or image.isNull():
+                self.add_log("警告: 接收到空的顯示影像")
                 return
+            # 立即轉為QPixmap（複製顯示尺寸的像素），worker之後可重複使用該緩衝區
+            pixmap = QPixmap.fromImage(image)
             # 強制縮圖，避免大圖阻塞UI
             max_w, max_h = 800, 600
             if pixmap.width() > max_w or pixmap.height() > max_h:
@@ -499,7 +738,11 @@ class DetectTab(QWidget):
             count = result.get('count', 0)
             # 更新統計顯示
             if hasattr(self, 'detection_stats_label'):
-                self.detection_stats_label.setText(f"檢測到 {count} 個缺陷")
+                if 'unique_count' in result:
+                    self.detection_stats_label.setText(
+                        f"本幀 {count} 個，累計 {result['unique_count']} 個不重複缺陷")
+                else:
+                    self.detection_stats_label.setText(f"檢測到 {count} 個缺陷")
             # 顯示標註（即使worker已畫框，UI端也需重繪以支援互動/縮放）
             if hasattr(self, 'image_viewer') and hasattr(self.image_viewer, 'set_detections'):
                 self.image_viewer.set_detections(detections)
@@ -559,13 +802,28 @@ class DetectTab(QWidget):
         """瀏覽權重檔案"""
         path, _ = QFileDialog.getOpenFileName(
             self, "選擇權重檔案", "",
-            "PyTorch權重 (*.pt *.pth);;所有檔案 (*)"
+            "模型權重 (*.pt *.pth *.onnx *.torchscript);;PyTorch權重 (*.pt *.pth);;ONNX模型 (*.onnx);;INT8量化模型 (*.torchscript);;所有檔案 (*)"
         )
         
         if path:
             self.weights_input.setText(path)
             self.current_weights = path
             
+    def on_indexed_weights(self, path):
+        """從權重索引選擇權重檔"""
+        self.weights_input.setText(path)
+        self.current_weights = path
+        
+    def browse_golden(self):
+        """瀏覽黃金樣板影像"""
+        path, _ = QFileDialog.getOpenFileName(
+            self, "選擇良品樣板影像", "",
+            "圖片檔案 (*.jpg *.jpeg *.png *.bmp *.tiff);;所有檔案 (*)"
+        )
+        
+        if path:
+            self.golden_input.setText(path)
+            
     def browse_output(self):
         """瀏覽輸出目錄"""
         path = QFileDialog.getExistingDirectory(
@@ -594,11 +852,45 @@ class DetectTab(QWidget):
             'iou_thres': self.iou_spinbox.value(),
             'max_det': self.max_det_spinbox.value(),
             'device': self.device_combo.currentText(),
+            'precision': self.precision_combo.currentText(),
+            'cpu_mode': self.cpu_mode_combo.currentText(),
             'save_txt': self.save_txt_checkbox.isChecked(),
             'save_conf': self.save_conf_checkbox.isChecked(),
             'save_crop': self.save_crop_checkbox.isChecked(),
+            'save_format': self.save_format_combo.currentText(),
+            'save_quality': self.save_quality_spinbox.value(),
+            'png_level': self.png_level_spinbox.value(),
+            'save_defective_only': self.save_defective_checkbox.isChecked(),
+            'combined_labels': self.combined_labels_checkbox.isChecked(),
+            'record_video': self.record_checkbox.isChecked(),
+            'record_annotated': self.record_annotated_checkbox.isChecked(),
+            'record_segment_minutes': self.record_minutes_spinbox.value(),
+            'record_segment_mb': self.record_mb_spinbox.value(),
             'hide_labels': not self.show_labels_checkbox.isChecked(),            'hide_conf': not self.show_conf_checkbox.isChecked(),
             'line_thickness': self.line_thickness_spinbox.value(),
+            'batch_size': self.batch_size_spinbox.value(),
+            'prefetch_workers': self.prefetch_spinbox.value(),
+            'render_workers': self.render_workers_spinbox.value(),
+            'realtime_preview': self.realtime_preview_checkbox.isChecked(),
+            'tile_inference': self.tile_checkbox.isChecked(),
+            'tile_size': self.tile_size_spinbox.value(),
+            'tile_overlap': self.tile_overlap_spinbox.value(),
+            'tile_merge': self.tile_merge_combo.currentText(),
+            'nms_method': self.nms_method_combo.currentText(),
+            'change_gate': self.change_gate_checkbox.isChecked(),
+            'change_method': self.change_method_combo.currentText(),
+            'change_sensitivity': self.change_sensitivity_spinbox.value(),
+            'change_refresh': self.change_refresh_spinbox.value(),
+            'board_roi': self.board_roi_checkbox.isChecked(),
+            'roi_method': self.roi_method_combo.currentText(),
+            'fixture': self.fixture_input.text().strip() or 'default',
+            'roi_revalidate': self.roi_revalidate_spinbox.value(),
+            'golden_mode': self.golden_checkbox.isChecked(),
+            'golden_image': self.golden_input.text().strip(),
+            'track': self.track_checkbox.isChecked(),
+            'keyframe_interval': self.keyframe_spinbox.value(),
+            'intra_op_threads': self.intra_threads_spinbox.value(),
+            'inter_op_threads': self.inter_threads_spinbox.value(),
         }
         
         # 處理類別過濾
@@ -782,15 +1074,46 @@ class DetectTab(QWidget):
             self.input_type_combo.setCurrentIndex(0)
             self.model_size_combo.setCurrentText("640")
             self.device_combo.setCurrentIndex(0)
+            self.precision_combo.setCurrentIndex(0)
+            self.cpu_mode_combo.setCurrentIndex(0)
             self.conf_spinbox.setValue(0.25)
             self.iou_spinbox.setValue(0.45)
             self.max_det_spinbox.setValue(1000)
             self.line_thickness_spinbox.setValue(3)
+            self.batch_size_spinbox.setValue(8)
+            self.prefetch_spinbox.setValue(4)
+            self.render_workers_spinbox.setValue(2)
             
             # 重置核取方塊
             self.save_txt_checkbox.setChecked(False)
             self.save_conf_checkbox.setChecked(False)
             self.save_crop_checkbox.setChecked(False)
+            self.save_format_combo.setCurrentIndex(0)
+            self.save_quality_spinbox.setValue(95)
+            self.png_level_spinbox.setValue(3)
+            self.save_defective_checkbox.setChecked(False)
+            self.combined_labels_checkbox.setChecked(False)
+            self.record_checkbox.setChecked(False)
+            self.record_annotated_checkbox.setChecked(True)
+            self.record_minutes_spinbox.setValue(10)
+            self.record_mb_spinbox.setValue(1024)
+            self.realtime_preview_checkbox.setChecked(False)
+            self.tile_checkbox.setChecked(False)
+            self.tile_size_spinbox.setValue(640)
+            self.tile_overlap_spinbox.setValue(0.2)
+            self.nms_method_combo.setCurrentIndex(0)
+            self.change_gate_checkbox.setChecked(False)
+            self.change_method_combo.setCurrentIndex(0)
+            self.change_sensitivity_spinbox.setValue(0.8)
+            self.change_refresh_spinbox.setValue(5.0)
+            self.board_roi_checkbox.setChecked(False)
+            self.roi_method_combo.setCurrentIndex(0)
+            self.fixture_input.clear()
+            self.roi_revalidate_spinbox.setValue(2.0)
+            self.golden_checkbox.setChecked(False)
+            self.golden_input.clear()
+            self.track_checkbox.setChecked(False)
+            self.keyframe_spinbox.setValue(5)
             self.show_labels_checkbox.setChecked(True)
             self.show_conf_checkbox.setChecked(True)
               # 清除日誌
@@ -1100,8 +1423,14 @@ class DetectTab(QWidget):
         self.camera_worker = CameraWorker(camera_id=cam_id, fps=1)
         self.camera_worker.frame_captured.connect(self.on_camera_frame)
         self.camera_worker.error_occurred.connect(self.on_camera_error)
-        # 初始化分析 worker，這裡假設有一個 yolo_infer(frame) 可用
+        # 初始化分析 worker，推論模型由模型註冊表共用，只在此載入一次
         from core.detector import DetectionWorker
+        self.infer_worker = DetectionWorker()
+        self.infer_worker.set_parameters(self.get_detection_params())
+        if not self.infer_worker.load_model(self.weights_input.text().strip(), self.device_combo.currentText()):
+            self.add_log("攝像頭分析啟動失敗: 模型載入失敗")
+            self.infer_worker = None
+            return
         self.analyze_worker = AnalyzeWorker(self.yolo_infer)
         self.analyze_worker.analysis_done.connect(self.on_analysis_done)
         self.analyze_worker.error_occurred.connect(self.on_analyze_error)
@@ -1118,6 +1447,7 @@ class DetectTab(QWidget):
         if self.analyze_worker:
             self.analyze_worker.stop()
             self.analyze_worker = None
+        self.infer_worker = None
         self.is_camera_running = False
         self.btn_start_camera.setEnabled(True)
         self.btn_stop_camera.setEnabled(False)
@@ -1148,14 +1478,11 @@ class DetectTab(QWidget):
         self.add_log(f"[ANALYZE] {msg}")
 
     def yolo_infer(self, frame):
-        # 這裡可根據實際模型推論流程調整
-        # 範例：直接呼叫 DetectionWorker 的推論方法
-        # 實際專案可改為單例或全域模型物件
+        # 使用 start_camera_analysis 建立的推論 worker，模型已預先載入
         try:
-            from core.detector import DetectionWorker
-            worker = DetectionWorker()
-            worker.load_model(self.weights_input.text(), device=self.device_combo.currentText())
-            return worker._inference(frame)
+            if self.infer_worker is None:
+                return []
+            return self.infer_worker._inference(frame)
         except Exception as e:
             self.add_log(f"推論失敗: {str(e)}")
             return []
@@ -12,6 +12,8 @@ from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QGridLayout,
 from PyQt5.QtCore import Qt, pyqtSignal, QThread, pyqtSlot
 from PyQt5.QtGui import QFont
 
+from gui.widgets.weights_picker import WeightsPicker
+
 
 class TestTab(QWidget):
     """測試功能頁籤"""
@@ -81,6 +83,39 @@ class TestTab(QWidget):
         model_layout.addWidget(self.device_label, 1, 0)
         model_layout.addWidget(self.device_combo, 1, 1)
         
+        # 推理精度
+        self.precision_label = QLabel("推理精度:")
+        self.precision_combo = QComboBox()
+        self.precision_combo.addItems(["fp32", "bf16", "fp16"])
+        self.precision_combo.setToolTip("bf16: CPU autocast（AVX512-BF16/AMX）；fp16: CUDA 半精度或 CPU autocast")
+        self.parity_checkbox = QCheckBox("與FP32比較一致性")
+        self.parity_checkbox.setChecked(True)
+        self.parity_checkbox.setToolTip("在驗證集抽樣影像上比較檢測結果與FP32是否一致，結果保存為 parity.json")
+        
+        model_layout.addWidget(self.precision_label, 2, 0)
+        model_layout.addWidget(self.precision_combo, 2, 1)
+        model_layout.addWidget(self.parity_checkbox, 2, 2)
+        
+        # 執行模式
+        self.cpu_mode_label = QLabel("執行模式:")
+        self.cpu_mode_combo = QComboBox()
+        self.cpu_mode_combo.addItems(["eager", "channels_last", "onednn", "compile"])
+        self.cpu_mode_combo.setToolTip("channels_last: NHWC 記憶體格式；onednn: 依輸入尺寸凍結並融合的 oneDNN 圖（僅CPU，"
+                                       "其他設備改用 channels_last）；"
+                                       "compile: torch.compile 編譯。編譯產物快取於 runs/compile_cache，編譯失敗時自動退回 eager")
+        
+        model_layout.addWidget(self.cpu_mode_label, 3, 0)
+        model_layout.addWidget(self.cpu_mode_combo, 3, 1)
+        
+        # 已索引權重
+        self.indexed_weights_label = QLabel("已索引權重:")
+        self.weights_picker = WeightsPicker(('.pt', '.pth'))
+        self.rescan_weights_btn = QPushButton("重新掃描")
+        
+        model_layout.addWidget(self.indexed_weights_label, 4, 0)
+        model_layout.addWidget(self.weights_picker, 4, 1)
+        model_layout.addWidget(self.rescan_weights_btn, 4, 2)
+        
         layout.addWidget(model_group)
         
         # 資料配置群組
@@ -384,6 +419,8 @@ class TestTab(QWidget):
         """連接信號和槽"""
         # 瀏覽按鈕
         self.browse_weights_btn.clicked.connect(self.browse_weights)
+        self.weights_picker.weights_selected.connect(self.on_indexed_weights)
+        self.rescan_weights_btn.clicked.connect(self.weights_picker.refresh)
         self.browse_data_config_btn.clicked.connect(self.browse_data_config)
         
         # 控制按鈕
@@ -406,6 +443,11 @@ class TestTab(QWidget):
             self.weights_input.setText(path)
             self.current_weights = path
             
+    def on_indexed_weights(self, path):
+        """從權重索引選擇權重檔"""
+        self.weights_input.setText(path)
+        self.current_weights = path
+            
     def browse_data_config(self):
         """瀏覽資料配置檔案"""
         path, _ = QFileDialog.getOpenFileName(
@@ -435,6 +477,9 @@ class TestTab(QWidget):
             'iou_thres': self.iou_thres_spinbox.value(),
             'max_det': self.max_det_spinbox.value(),
             'device': self.device_combo.currentText(),
+            'precision': self.precision_combo.currentText(),
+            'parity_check': self.parity_checkbox.isChecked(),
+            'cpu_mode': self.cpu_mode_combo.currentText(),
             'workers': self.workers_spinbox.value(),
             'task': self.task_combo.currentText(),
             'save_txt': self.save_txt_checkbox.isChecked(),
@@ -522,6 +567,9 @@ class TestTab(QWidget):
             
             # 重置下拉選單
             self.device_combo.setCurrentIndex(0)
+            self.precision_combo.setCurrentIndex(0)
+            self.parity_checkbox.setChecked(True)
+            self.cpu_mode_combo.setCurrentIndex(0)
             self.task_combo.setCurrentText("val")
             
             # 重置核取方塊
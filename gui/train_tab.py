@@ -13,6 +13,8 @@ from PyQt5.QtCore import Qt, pyqtSignal, QThread, pyqtSlot
 from PyQt5.QtGui import QFont, QPixmap
 import yaml
 
+from gui.widgets.weights_picker import WeightsPicker
+
 
 class TrainTab(QWidget):
     """訓練功能頁籤"""
@@ -200,6 +202,15 @@ class TrainTab(QWidget):
         model_layout.addWidget(self.custom_model_input, 3, 1)
         model_layout.addWidget(self.browse_custom_model_btn, 3, 2)
         
+        # 已索引權重
+        self.indexed_weights_label = QLabel("已索引權重:")
+        self.weights_picker = WeightsPicker(('.pt', '.pth'))
+        self.rescan_weights_btn = QPushButton("重新掃描")
+        
+        model_layout.addWidget(self.indexed_weights_label, 4, 0)
+        model_layout.addWidget(self.weights_picker, 4, 1)
+        model_layout.addWidget(self.rescan_weights_btn, 4, 2)
+        
         layout.addWidget(model_group)
         
         # 模型參數群組
@@ -500,6 +511,8 @@ class TrainTab(QWidget):
         self.browse_train_path_btn.clicked.connect(self.browse_train_path)
         self.browse_val_path_btn.clicked.connect(self.browse_val_path)
         self.browse_custom_weights_btn.clicked.connect(self.browse_custom_weights)
+        self.weights_picker.weights_selected.connect(self.on_indexed_weights)
+        self.rescan_weights_btn.clicked.connect(self.weights_picker.refresh)
         self.browse_custom_model_btn.clicked.connect(self.browse_custom_model)
         
         # 下拉選單變化
@@ -557,6 +570,11 @@ class TrainTab(QWidget):
         if path:
             self.custom_weights_input.setText(path)
             
+    def on_indexed_weights(self, path):
+        """從權重索引選擇預訓練權重（以自定義權重方式使用）"""
+        self.pretrained_combo.setCurrentText("自定義...")
+        self.custom_weights_input.setText(path)
+            
     def browse_custom_model(self):
         """瀏覽自定義模型配置"""
         path, _ = QFileDialog.getOpenFileName(
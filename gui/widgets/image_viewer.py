@@ -263,21 +263,22 @@ class AnnotatedImageViewer(ImageViewer):
             'spurious_copper': (255, 255, 0)  # 青色
         }
         
-        for detection in detections:
-            if 'bbox' in detection:
-                bbox = detection['bbox']
-                class_name = detection.get('class', 'unknown')
-                confidence = detection.get('confidence', 0.0)
-                
-                # 獲取顏色
-                color = colors.get(class_name, (128, 128, 128))
-                
-                # 創建標籤
-                label = f"{class_name} {confidence:.2f}"
-                
-                # 添加標註
-                self.add_annotation(
-                    int(bbox[0]), int(bbox[1]), 
-                    int(bbox[2] - bbox[0]), int(bbox[3] - bbox[1]),
-                    label, color
-                )
+        if hasattr(detections, 'xyxy'):  # 欄位式 DetectionResult，不逐框建立字典
+            rows = zip(detections.xyxy.tolist(), detections.labels, detections.conf.tolist())
+        else:
+            rows = ((d['bbox'], d.get('class', 'unknown'), d.get('confidence', 0.0))
+                    for d in detections if 'bbox' in d)
+        
+        for bbox, class_name, confidence in rows:
+            # 獲取顏色
+            color = colors.get(class_name, (128, 128, 128))
+            
+            # 創建標籤
+            label = f"{class_name} {confidence:.2f}"
+            
+            # 添加標註
+            self.add_annotation(
+                int(bbox[0]), int(bbox[1]), 
+                int(bbox[2] - bbox[0]), int(bbox[3] - bbox[1]),
+                label, color
+            )
@@ -0,0 +1,51 @@
+"""
+權重選單小部件
+列出權重索引中的權重檔與其中繼資料，不需反序列化權重檔
+"""
+
+from PyQt5.QtWidgets import QComboBox
+from PyQt5.QtCore import Qt, pyqtSignal
+
+from core.weights_index import WEIGHT_EXTS, WeightsScanWorker, describe
+
+
+class WeightsPicker(QComboBox):
+    """已索引權重的下拉選單"""
+
+    # 信號定義
+    weights_selected = pyqtSignal(str)  # 選擇的權重檔路徑
+
+    def __init__(self, exts=WEIGHT_EXTS, parent=None):
+        super().__init__(parent)
+        self.exts = tuple(exts)
+        self.worker = None
+        self.setToolTip("weights/ 與 runs/ 下已索引的權重檔，中繼資料只在檔案新增或修改時讀取一次")
+        self.activated.connect(self._on_activated)
+        self.refresh()
+
+    def refresh(self):
+        """背景重新掃描索引，完成後更新選單"""
+        if self.worker is not None and self.worker.isRunning():
+            return
+        self.clear()
+        self.addItem("掃描權重中...")
+        self.worker = WeightsScanWorker()
+        self.worker.progress.connect(lambda i, n: self.setItemText(0, f"掃描權重中... {i}/{n}"))
+        self.worker.scan_finished.connect(self.populate)
+        self.worker.start()
+
+    def populate(self, entries):
+        self.clear()
+        entries = [e for e in entries if e['path'].endswith(self.exts)]
+        self.addItem(f"已索引權重 ({len(entries)})", None)
+        for e in entries:
+            text = e['path']
+            if 'nc' in e:
+                text += f"  |  {e['nc']} 類" + (f"，epoch {e['epoch']}" if e.get('epoch', -1) >= 0 else '')
+            self.addItem(text, e['path'])
+            self.setItemData(self.count() - 1, describe(e), Qt.ToolTipRole)
+
+    def _on_activated(self, index):
+        path = self.itemData(index)
+        if path:
+            self.weights_selected.emit(path)
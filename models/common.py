@@ -230,16 +230,50 @@ class Detections:
     # detections class for YOLOv5 inference results
     def __init__(self, imgs, pred, names=None):
         super(Detections, self).__init__()
-        d = pred[0].device  # device
-        gn = [torch.tensor([*[im.shape[i] for i in [1, 0, 1, 0]], 1., 1.], device=d) for im in imgs]  # normalizations
         self.imgs = imgs  # list of images as numpy arrays
         self.pred = pred  # list of tensors pred[0] = (xyxy, conf, cls)
         self.names = names  # class names
         self.xyxy = pred  # xyxy pixels
-        self.xywh = [xyxy2xywh(x) for x in pred]  # xywh pixels
-        self.xyxyn = [x / g for x, g in zip(self.xyxy, gn)]  # xyxy normalized
-        self.xywhn = [x / g for x, g in zip(self.xywh, gn)]  # xywh normalized
         self.n = len(self.pred)
+        self._derived = {}  # xywh, xyxyn, xywhn computed on first access
+
+    def _gn(self):
+        d = self.pred[0].device  # device
+        return [torch.tensor([*[im.shape[i] for i in [1, 0, 1, 0]], 1., 1.], device=d) for im in self.imgs]
+
+    def _lazy(self, k, fn):
+        if k not in self._derived:
+            self._derived[k] = fn()
+        return self._derived[k]
+
+    @property
+    def xywh(self):  # xywh pixels
+        return self._lazy('xywh', lambda: [xyxy2xywh(x) for x in self.pred])
+
+    @xywh.setter
+    def xywh(self, v):
+        self._derived['xywh'] = v
+
+    @property
+    def xyxyn(self):  # xyxy normalized
+        return self._lazy('xyxyn', lambda: [x / g for x, g in zip(self.xyxy, self._gn())])
+
+    @xyxyn.setter
+    def xyxyn(self, v):
+        self._derived['xyxyn'] = v
+
+    @property
+    def xywhn(self):  # xywh normalized
+        return self._lazy('xywhn', lambda: [x / g for x, g in zip(self.xywh, self._gn())])
+
+    @xywhn.setter
+    def xywhn(self, v):
+        self._derived['xywhn'] = v
+
+    def results(self):
+        # Columnar utils.results.DetectionResult per image (NumPy, lazily derived views)
+        from utils.results import DetectionResult
+        return [DetectionResult.from_tensor(p, self.names or (), im.shape) for im, p in zip(self.imgs, self.pred)]
 
     def display(self, pprint=False, show=False, save=False, render=False):
         colors = color_list()
@@ -285,8 +319,9 @@ class Detections:
         # return a list of Detections objects, i.e. 'for result in results.tolist():'
         x = [Detections([self.imgs[i]], [self.pred[i]], self.names) for i in range(self.n)]
         for d in x:
-            for k in ['imgs', 'pred', 'xyxy', 'xyxyn', 'xywh', 'xywhn']:
-                setattr(d, k, getattr(d, k)[0])  # pop out of list
+            values = {k: getattr(d, k)[0] for k in ['imgs', 'pred', 'xyxy', 'xyxyn', 'xywh', 'xywhn']}
+            for k, v in values.items():
+                setattr(d, k, v)  # pop out of list
         return x
 
 
@@ -2,9 +2,11 @@
 
 Usage:
     $ export PYTHONPATH="$PWD" && python models/export.py --weights ./weights/yolov5s.pt --img 640 --batch 1
+    $ export PYTHONPATH="$PWD" && python models/export.py --weights ./weights/yolov5s.pt --dynamic  # any batch/size
 """
 
 import argparse
+import json
 import sys
 import time
 
@@ -23,6 +25,7 @@ if __name__ == '__main__':
     parser.add_argument('--weights', type=str, default='./yolov5s.pt', help='weights path')  # from yolov5/models/
     parser.add_argument('--img-size', nargs='+', type=int, default=[640, 640], help='image size')  # height, width
     parser.add_argument('--batch-size', type=int, default=1, help='batch size')
+    parser.add_argument('--dynamic', action='store_true', help='ONNX: dynamic batch and image size')
     opt = parser.parse_args()
     opt.img_size *= 2 if len(opt.img_size) == 1 else 1  # expand
     print(opt)
@@ -53,12 +56,19 @@ if __name__ == '__main__':
     model.model[-1].export = True  # set Detect() layer export=True
     y = model(img)  # dry run
 
+    # Metadata required to decode raw outputs (core/backends.py OnnxBackend/TorchScriptBackend)
+    d = model.model[-1]  # Detect()
+    meta = {'names': labels, 'stride': d.stride.tolist(),
+            'anchor_grid': d.anchor_grid.view(d.nl, -1, 2).tolist()}
+
     # TorchScript export
     try:
         print('\nStarting TorchScript export with torch %s...' % torch.__version__)
         f = opt.weights.replace('.pt', '.torchscript.pt')  # filename
         ts = torch.jit.trace(model, img)
-        ts.save(f)
+        ts_meta = dict(meta, batch=opt.batch_size, input_hw=list(opt.img_size),  # traced input size (h, w)
+                       imgsz=opt.img_size[0] if opt.img_size[0] == opt.img_size[1] else None)
+        ts.save(f, _extra_files={'meta.json': json.dumps(ts_meta)})
         print('TorchScript export success, saved as %s' % f)
     except Exception as e:
         print('TorchScript export failure: %s' % e)
@@ -69,12 +79,22 @@ if __name__ == '__main__':
 
         print('\nStarting ONNX export with onnx %s...' % onnx.__version__)
         f = opt.weights.replace('.pt', '.onnx')  # filename
+        output_names = ['output%g' % i for i in range(len(y))]  # raw Detect() outputs, one per level
+        dynamic_axes = None
+        if opt.dynamic:
+            dynamic_axes = {'images': {0: 'batch', 2: 'height', 3: 'width'}}
+            dynamic_axes.update({k: {0: 'batch', 2: 'ny', 3: 'nx'} for k in output_names})
         torch.onnx.export(model, img, f, verbose=False, opset_version=12, input_names=['images'],
-                          output_names=['classes', 'boxes'] if y is None else ['output'])
+                          output_names=output_names, dynamic_axes=dynamic_axes)
 
         # Checks
         onnx_model = onnx.load(f)  # load onnx model
         onnx.checker.check_model(onnx_model)  # check onnx model
+
+        for k, v in meta.items():
+            prop = onnx_model.metadata_props.add()
+            prop.key, prop.value = k, json.dumps(v)
+        onnx.save(onnx_model, f)
         # print(onnx.helper.printable_graph(onnx_model.graph))  # print a human readable model
         print('ONNX export success, saved as %s' % f)
     except Exception as e:
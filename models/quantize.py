@@ -0,0 +1,204 @@
+"""Post-training INT8 quantization of a YOLOv5 *.pt model for CPU inference
+
+Calibrates a fused FP32 model on a sample of dataset images, converts it to INT8 (FX graph mode, Detect() head kept
+in FP32), saves it as TorchScript loadable by the Detect tab (*.torchscript) and reports the mAP and latency delta
+against the FP32 model on the validation set.
+
+Usage:
+    $ export PYTHONPATH="$PWD" && python models/quantize.py --weights ./weights/best.pt --data ./data/PCB.yaml --img 640
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.append('./')  # to run '$ python *.py' files in subdirectories
+
+import numpy as np
+import torch
+import torch.nn as nn
+import yaml
+
+from models.experimental import attempt_load
+from models.yolo import Detect
+from utils.datasets import LoadImagesAndLabels
+from utils.general import check_dataset, check_img_size, box_iou, non_max_suppression, set_logging, xywh2xyxy
+from utils.metrics import ap_per_class
+
+
+class QuantizableYOLO(nn.Module):
+    # Wraps Model.forward_once() so FX sees a static graph (no augment/profile branches) and returns decoded output
+    def __init__(self, model):
+        super(QuantizableYOLO, self).__init__()
+        self.model = model
+
+    def forward(self, x):
+        return self.model.forward_once(x)[0]
+
+
+def make_loader(path, imgsz, batch_size, stride, n=0, seed=0):
+    # Letterboxed square images (no augmentation); n > 0 samples a random subset of n images
+    dataset = LoadImagesAndLabels(path, imgsz, batch_size, augment=False, rect=False, stride=int(stride))
+    if 0 < n < len(dataset):
+        g = torch.Generator().manual_seed(seed)
+        dataset = torch.utils.data.Subset(dataset, torch.randperm(len(dataset), generator=g)[:n].tolist())
+    return torch.utils.data.DataLoader(dataset, batch_size=batch_size, shuffle=False, num_workers=0,
+                                       collate_fn=LoadImagesAndLabels.collate_fn)
+
+
+def quantize(model, calib_loader, imgsz):
+    # FX graph mode static quantization; Detect() is not symbolically traceable (shape-dependent grids) so stays FP32
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    engine = 'fbgemm' if 'fbgemm' in torch.backends.quantized.supported_engines else 'qnnpack'
+    torch.backends.quantized.engine = engine
+    example = torch.zeros(1, 3, imgsz, imgsz)
+    try:  # torch >= 1.13
+        from torch.ao.quantization import get_default_qconfig_mapping
+        from torch.ao.quantization.fx.custom_config import PrepareCustomConfig
+        custom = PrepareCustomConfig().set_non_traceable_module_classes([Detect])
+        prepared = prepare_fx(QuantizableYOLO(model).eval(), get_default_qconfig_mapping(engine), (example,),
+                              prepare_custom_config=custom)
+    except ImportError:  # torch 1.12 dict-style API
+        from torch.ao.quantization import get_default_qconfig
+        prepared = prepare_fx(QuantizableYOLO(model).eval(), {'': get_default_qconfig(engine)}, (example,),
+                              prepare_custom_config_dict={'non_traceable_module_class': [Detect]})
+    with torch.no_grad():
+        for img, _, _, _ in calib_loader:  # collect activation ranges
+            prepared(img.float() / 255.0)
+    return convert_fx(prepared).eval(), engine
+
+
+def evaluate(predict, loader, conf_thres=0.001, iou_thres=0.6):
+    # mAP@0.5 and mAP@0.5:0.95 in letterboxed image space, same matching rules as YOLOv5 test.py
+    iouv = torch.linspace(0.5, 0.95, 10)  # iou vector for mAP@0.5:0.95
+    niou = iouv.numel()
+    stats = []
+    for img, targets, _, _ in loader:
+        img = img.float() / 255.0
+        nb, _, height, width = img.shape
+        targets[:, 2:] *= torch.Tensor([width, height, width, height])  # to pixels
+        with torch.no_grad():
+            out = non_max_suppression(predict(img), conf_thres=conf_thres, iou_thres=iou_thres)
+
+        for si, pred in enumerate(out):
+            labels = targets[targets[:, 0] == si, 1:]
+            nl = len(labels)
+            tcls = labels[:, 0].tolist() if nl else []
+            if pred is None or not len(pred):
+                if nl:
+                    stats.append((torch.zeros(0, niou, dtype=torch.bool), torch.Tensor(), torch.Tensor(), tcls))
+                continue
+
+            correct = torch.zeros(pred.shape[0], niou, dtype=torch.bool)
+            if nl:
+                detected = set()
+                tcls_tensor = labels[:, 0]
+                tbox = xywh2xyxy(labels[:, 1:5])
+                for cls in torch.unique(tcls_tensor):
+                    ti = (cls == tcls_tensor).nonzero(as_tuple=False).view(-1)  # target indices
+                    pi = (cls == pred[:, 5]).nonzero(as_tuple=False).view(-1)  # prediction indices
+                    if pi.shape[0]:
+                        ious, i = box_iou(pred[pi, :4], tbox[ti]).max(1)  # best ious, indices
+                        for j in (ious > iouv[0]).nonzero(as_tuple=False):
+                            d = ti[i[j]].item()  # detected target
+                            if d not in detected:
+                                detected.add(d)
+                                correct[pi[j]] = ious[j] > iouv
+                                if len(detected) == nl:  # all targets already located in image
+                                    break
+            stats.append((correct, pred[:, 4], pred[:, 5], tcls))
+
+    stats = [np.concatenate(x, 0) for x in zip(*stats)]
+    if len(stats) and stats[0].any():
+        _, _, ap, _, _ = ap_per_class(*stats)
+        return float(ap[:, 0].mean()), float(ap.mean(1).mean())  # mAP@0.5, mAP@0.5:0.95
+    return 0.0, 0.0
+
+
+def latency(predict, img, runs=50, warmup=5):
+    # Median single-image latency (ms)
+    times = []
+    with torch.no_grad():
+        for i in range(warmup + runs):
+            t = time.perf_counter()
+            predict(img)
+            if i >= warmup:
+                times.append(time.perf_counter() - t)
+    return float(np.median(times) * 1000)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--weights', type=str, default='./weights/best.pt', help='FP32 weights path')
+    parser.add_argument('--data', type=str, default='./data/PCB.yaml', help='data.yaml path')
+    parser.add_argument('--img-size', type=int, default=640, help='inference size (pixels), fixed in the INT8 model')
+    parser.add_argument('--calib-images', type=int, default=128, help='number of train images used for calibration')
+    parser.add_argument('--batch-size', type=int, default=8, help='calibration/evaluation batch size')
+    parser.add_argument('--threads', type=int, default=0, help='torch CPU threads (0 = default)')
+    parser.add_argument('--latency-runs', type=int, default=50, help='timed runs for the latency comparison')
+    parser.add_argument('--no-eval', action='store_true', help='skip the mAP comparison')
+    opt = parser.parse_args()
+    print(opt)
+    set_logging()
+    if opt.threads:
+        torch.set_num_threads(opt.threads)
+
+    with open(opt.data) as f:
+        data = yaml.load(f, Loader=yaml.FullLoader)  # data dict
+    check_dataset(data)
+
+    # Load fused FP32 models (one is consumed by quantization)
+    model = attempt_load(opt.weights, map_location=torch.device('cpu'))
+    fp32 = attempt_load(opt.weights, map_location=torch.device('cpu'))
+    stride = int(max(model.stride))
+    imgsz = check_img_size(opt.img_size, stride)
+    names = model.names
+
+    # Calibrate and convert
+    t = time.time()
+    calib_loader = make_loader(data['train'], imgsz, opt.batch_size, stride, n=opt.calib_images)
+    qmodel, engine = quantize(model, calib_loader, imgsz)
+    print('Calibrated on %g images, quantized with %s (%.1fs)' % (len(calib_loader.dataset), engine, time.time() - t))
+
+    # Save as TorchScript with metadata for core/backends.py TorchScriptBackend
+    f = str(Path(opt.weights).with_suffix('')) + '_int8.torchscript'
+    meta = {'names': names, 'stride': model.stride.tolist(), 'nc': len(names), 'imgsz': imgsz, 'batch': 1,
+            'qengine': engine, 'source': str(opt.weights)}
+    example = torch.zeros(1, 3, imgsz, imgsz)
+    with torch.no_grad():
+        ts = torch.jit.freeze(torch.jit.trace(qmodel, example))
+    torch.jit.save(ts, f, _extra_files={'meta.json': json.dumps(meta)})
+    print('INT8 model saved as %s' % f)
+
+    # Compare against FP32 through the same backend the Detect tab uses
+    from core.backends import TorchScriptBackend
+    int8 = TorchScriptBackend(f)
+    report = {'weights': str(opt.weights), 'int8_weights': f, 'imgsz': imgsz, 'qengine': engine,
+              'calib_images': len(calib_loader.dataset), 'threads': torch.get_num_threads()}
+
+    sample = next(iter(make_loader(data['val'], imgsz, 1, stride, n=1)))[0].float() / 255.0
+    report['latency_fp32_ms'] = latency(lambda x: fp32(x)[0], sample, opt.latency_runs)
+    report['latency_int8_ms'] = latency(lambda x: int8(x)[0], sample, opt.latency_runs)
+    report['speedup'] = report['latency_fp32_ms'] / max(report['latency_int8_ms'], 1e-9)
+
+    if not opt.no_eval:
+        val_loader = make_loader(data['val'], imgsz, opt.batch_size, stride)
+        report['map50_fp32'], report['map_fp32'] = evaluate(lambda x: fp32(x)[0], val_loader)
+        report['map50_int8'], report['map_int8'] = evaluate(lambda x: int8(x)[0], val_loader)
+        report['map50_delta'] = report['map50_int8'] - report['map50_fp32']
+        report['map_delta'] = report['map_int8'] - report['map_fp32']
+
+    print('\n%-12s%12s%12s%12s' % ('', 'FP32', 'INT8', 'delta'))
+    print('%-12s%12.2f%12.2f%12.2f' % ('latency ms', report['latency_fp32_ms'], report['latency_int8_ms'],
+                                      report['latency_int8_ms'] - report['latency_fp32_ms']))
+    if not opt.no_eval:
+        print('%-12s%12.4f%12.4f%12.4f' % ('mAP@.5', report['map50_fp32'], report['map50_int8'], report['map50_delta']))
+        print('%-12s%12.4f%12.4f%12.4f' % ('mAP@.5:.95', report['map_fp32'], report['map_int8'], report['map_delta']))
+    print('speedup %.2fx' % report['speedup'])
+
+    with open(str(Path(f).with_suffix('.json')), 'w') as fr:
+        json.dump(report, fr, indent=2)
+    print('Report saved as %s' % Path(f).with_suffix('.json'))
@@ -1,5 +1,6 @@
 import argparse
 import logging
+import math
 import sys
 from copy import deepcopy
 from pathlib import Path
@@ -46,16 +47,69 @@ class Detect(nn.Module):
             x[i] = x[i].view(bs, self.na, self.no, ny, nx).permute(0, 1, 3, 4, 2).contiguous()
 
             if not self.training:  # inference
-                if self.grid[i].shape[2:4] != x[i].shape[2:4]:
-                    self.grid[i] = self._make_grid(nx, ny).to(x[i].device)
-
-                y = x[i].sigmoid()
-                y[..., 0:2] = (y[..., 0:2] * 2. - 0.5 + self.grid[i].to(x[i].device)) * self.stride[i]  # xy
+                y = (x[i].float() if x[i].dtype == torch.bfloat16 else x[i]).sigmoid()  # bf16 too coarse for xy
+                y[..., 0:2] = (y[..., 0:2] * 2. - 0.5 + self._cached_grid(nx, ny, x[i].device)) * self.stride[i]  # xy
                 y[..., 2:4] = (y[..., 2:4] * 2) ** 2 * self.anchor_grid[i]  # wh
                 z.append(y.view(bs, -1, self.no))
 
         return x if self.training else (torch.cat(z, 1), x)
 
+    def forward_candidates(self, x, conf_thres=0.25, multi_label=True):
+        # Inference-only decode: threshold objectness on raw logits first, decode boxes/classes of survivors only
+        # Returns compact candidates (n, 7) [image, x1, y1, x2, y2, conf, cls] for non_max_suppression_candidates()
+        return self.decode_candidates([self.m[i](x[i]) for i in range(self.nl)], conf_thres, multi_label)
+
+    def decode(self, ps):
+        # Dense inference decode of raw head outputs [(bs, na*no, ny, nx), ...], same output as forward()[0]
+        z = []
+        for i, p in enumerate(ps):
+            bs, _, ny, nx = p.shape
+            p = p.view(bs, self.na, self.no, ny, nx).permute(0, 1, 3, 4, 2).contiguous()
+            y = (p.float() if p.dtype == torch.bfloat16 else p).sigmoid()
+            y[..., 0:2] = (y[..., 0:2] * 2. - 0.5 + self._cached_grid(nx, ny, p.device)) * self.stride[i]  # xy
+            y[..., 2:4] = (y[..., 2:4] * 2) ** 2 * self.anchor_grid[i]  # wh
+            z.append(y.view(bs, -1, self.no))
+        return torch.cat(z, 1)
+
+    def decode_candidates(self, ps, conf_thres=0.25, multi_label=True):
+        # forward_candidates() on raw head outputs [(bs, na*no, ny, nx), ...], e.g. from a traced/frozen graph
+        conf_thres = min(max(conf_thres, 1e-6), 1 - 1e-6)
+        obj_logit = math.log(conf_thres / (1 - conf_thres))  # sigmoid(obj) > conf  <=>  obj > logit(conf)
+        out = []
+        for i, p in enumerate(ps):
+            if p.dtype == torch.bfloat16:
+                p = p.float()  # decode in fp32 under CPU autocast, bf16 has ~3 significant digits
+            bs, _, ny, nx = p.shape
+            p = p.view(bs, self.na, self.no, ny, nx)
+            b, a, gy, gx = (p[:, :, 4] > obj_logit).nonzero(as_tuple=True)  # surviving anchors
+            if not b.numel():
+                continue
+
+            y = p[b, a, :, gy, gx].sigmoid()  # (n, no)
+            grid = self._cached_grid(nx, ny, p.device)[0, 0, gy, gx]  # (n, 2)
+            xy = (y[:, 0:2] * 2. - 0.5 + grid) * self.stride[i]
+            wh = (y[:, 2:4] * 2) ** 2 * self.anchor_grid[i].view(self.na, 2)[a]
+            box = torch.cat((xy - wh / 2, xy + wh / 2), 1)  # xyxy
+            scores = y[:, 5:] * y[:, 4:5]  # conf = obj_conf * cls_conf
+
+            if multi_label and self.nc > 1:
+                k, j = (scores > conf_thres).nonzero(as_tuple=True)
+                conf = scores[k, j]
+            else:  # best class only
+                conf, j = scores.max(1)
+                k = (conf > conf_thres).nonzero(as_tuple=True)[0]
+                conf, j = conf[k], j[k]
+            out.append(torch.cat((b[k, None].to(box.dtype), box[k], conf[:, None], j[:, None].to(box.dtype)), 1))
+        return torch.cat(out, 0) if out else torch.zeros((0, 7), device=ps[0].device)
+
+    def _cached_grid(self, nx, ny, device):
+        # Grids keyed by (nx, ny, device); rectangular inputs of different shapes no longer rebuild each other's grid
+        grids = self.__dict__.setdefault('_grids', {})  # not in __init__ so pickled models from older runs work too
+        key = (nx, ny, str(device))
+        if key not in grids:
+            grids[key] = self._make_grid(nx, ny).to(device)
+        return grids[key]
+
     @staticmethod
     def _make_grid(nx=20, ny=20):
         yv, xv = torch.meshgrid([torch.arange(ny), torch.arange(nx)])
@@ -139,6 +193,21 @@ class Model(nn.Module):
             print('%.1fms total' % sum(dt))
         return x
 
+    def forward_candidates(self, x, conf_thres=0.25, multi_label=True):
+        # Inference-only: backbone/neck as forward_once(), then Detect.forward_candidates() (objectness pre-filtered)
+        return self.model[-1].decode_candidates(self.forward_raw(x), conf_thres, multi_label)
+
+    def forward_raw(self, x):
+        # Backbone/neck + Detect output convs only, no decode: tuple of (bs, na*no, ny, nx), traceable/freezable
+        y = []  # outputs
+        for m in self.model[:-1]:
+            if m.f != -1:  # if not from previous layer
+                x = y[m.f] if isinstance(m.f, int) else [x if j == -1 else y[j] for j in m.f]  # from earlier layers
+            x = m(x)  # run
+            y.append(x if m.i in self.save else None)  # save output
+        m = self.model[-1]  # Detect()
+        return tuple(m.m[i](x if j == -1 else y[j]) for i, j in enumerate(m.f))
+
     def _initialize_biases(self, cf=None):  # initialize biases into Detect(), cf is class frequency
         # https://arxiv.org/abs/1708.02002 section 3.3
         # cf = torch.bincount(torch.tensor(np.concatenate(dataset.labels, 0)[:, 0]).long(), minlength=nc) + 1.
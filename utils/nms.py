@@ -0,0 +1,241 @@
+# Non-Maximum Suppression engines
+#
+# All engines work on compact candidates (n, 7) [image, x1, y1, x2, y2, conf, cls] that are already confidence-filtered
+# (see candidates_from_prediction() and models.yolo.Detect.forward_candidates()) and return one (n, 6) tensor
+# (x1, y1, x2, y2, conf, cls) per image.
+#
+# Usage (latency vs candidate count):
+#     $ export PYTHONPATH="$PWD" && python utils/nms.py --counts 100 1000 5000 20000 --device cpu
+
+import argparse
+import sys
+import time
+
+import torch
+import torchvision
+
+sys.path.append('./')  # to run '$ python *.py' files in subdirectories
+
+from utils.general import box_iou, xywh2xyxy
+
+max_nms = 30000  # maximum number of boxes into torchvision.ops.nms() per image
+max_matrix = 5000  # maximum number of boxes for the (n, n) IoU matrix of Fast-NMS / Matrix-NMS
+
+
+def candidates_from_prediction(prediction, conf_thres=0.25, multi_label=True, labels=()):
+    # Dense model output (bs, n, 5 + nc) [xywh, obj, cls...] -> candidates (n, 7)
+    nc = prediction.shape[2] - 5  # number of classes
+    multi_label &= nc > 1  # multiple labels per box (adds 0.5ms/img)
+    out = []
+    for xi, x in enumerate(prediction):  # image index, image inference
+        x = x[x[:, 4] > conf_thres]  # confidence
+
+        # Cat apriori labels if autolabelling
+        if labels and len(labels[xi]):
+            l = labels[xi]
+            v = torch.zeros((len(l), nc + 5), device=x.device)
+            v[:, :4] = l[:, 1:5]  # box
+            v[:, 4] = 1.0  # conf
+            v[range(len(l)), l[:, 0].long() + 5] = 1.0  # cls
+            x = torch.cat((x, v), 0)
+        if not x.shape[0]:
+            continue
+
+        scores = x[:, 5:] * x[:, 4:5]  # conf = obj_conf * cls_conf
+        box = xywh2xyxy(x[:, :4])
+        if multi_label:
+            i, j = (scores > conf_thres).nonzero(as_tuple=False).T
+            conf = scores[i, j]
+        else:  # best class only
+            conf, j = scores.max(1)
+            i = (conf > conf_thres).nonzero(as_tuple=False).view(-1)
+            conf, j = conf[i], j[i]
+        img = torch.full_like(conf, xi)
+        out.append(torch.cat((img[:, None], box[i], conf[:, None], j[:, None].to(box.dtype)), 1))
+    return torch.cat(out, 0) if out else torch.zeros((0, 7), device=prediction.device)
+
+
+def _groups(x, agnostic=False):
+    # Suppression groups: boxes only compete within the same image (and class unless agnostic)
+    img = x[:, 0].long()
+    return img if agnostic else img * (int(x[:, 6].max()) + 1) + x[:, 6].long()
+
+
+def _split(x, batch_size, max_det=300):
+    # Candidates sorted by descending score -> list of (n, 6) per image
+    output = [torch.zeros((0, 6), device=x.device)] * batch_size
+    img = x[:, 0].long()
+    for xi in img.unique().tolist():
+        output[xi] = x[img == xi][:max_det, 1:]
+    return output
+
+
+def _sorted(x, limit):
+    # Sort by descending score, keep at most limit boxes
+    return x[x[:, 5].argsort(descending=True)[:limit]]
+
+
+def _sorted_per_image(x, limit):
+    # Sort by descending score, keep at most limit boxes of each image (a dense image cannot crowd out the others)
+    x = _sorted(x, x.shape[0])
+    img = x[:, 0].long()
+    if not x.shape[0] or int(torch.bincount(img).max()) <= limit:
+        return x
+    rank = torch.nn.functional.one_hot(img).cumsum(0)[torch.arange(x.shape[0], device=x.device), img] - 1
+    return x[rank < limit]
+
+
+def _per_image(x):
+    # Candidates of each image in the batch
+    img = x[:, 0]
+    return [x[img == xi] for xi in img.unique()]
+
+
+def nms_torchvision(x, iou_thres=0.45, agnostic=False, time_limit=10.0, **kwargs):
+    # One torchvision.ops.nms() call per image (original non_max_suppression behaviour)
+    t = time.time()
+    keep = []
+    for xi in x[:, 0].unique():
+        xc = x[x[:, 0] == xi]
+        xc = _sorted(xc, max_nms) if xc.shape[0] > max_nms else xc
+        c = xc[:, 6:7] * (0 if agnostic else 4096)  # classes offset, max_wh = 4096
+        i = torchvision.ops.nms(xc[:, 1:5] + c, xc[:, 5], iou_thres)
+        keep.append(xc[i])
+        if time_limit and (time.time() - t) > time_limit:
+            print(f'WARNING: NMS time limit {time_limit}s exceeded')
+            break  # time limit exceeded
+    return torch.cat(keep, 0) if keep else x[:0]
+
+
+def nms_batched(x, iou_thres=0.45, agnostic=False, **kwargs):
+    # Single torchvision batched_nms() over all images in the batch, grouped by image index (and class)
+    i = torchvision.ops.batched_nms(x[:, 1:5].float(), x[:, 5].float(), _groups(x, agnostic), iou_thres)
+    return x[i]
+
+
+def nms_fast(x, iou_thres=0.45, agnostic=False, **kwargs):
+    # Fast-NMS (YOLACT): a box is removed if any higher-scoring box of its group overlaps it, even a removed one
+    out = []
+    for xc in _per_image(x):  # one (n, n) IoU matrix of at most max_matrix boxes per image
+        xc = _sorted(xc, max_matrix)
+        g = _groups(xc, agnostic)
+        iou = box_iou(xc[:, 1:5], xc[:, 1:5]) * (g[:, None] == g[None]).float()
+        out.append(xc[iou.triu_(diagonal=1).max(0)[0] <= iou_thres])
+    return torch.cat(out, 0) if out else x[:0]
+
+
+def nms_matrix(x, iou_thres=0.45, agnostic=False, score_thres=0.0, kernel='gaussian', sigma=2.0, **kwargs):
+    # Matrix-NMS (SOLOv2): decay scores by overlap with higher-scoring boxes instead of hard removal
+    out = []
+    for xc in _per_image(x):  # one (n, n) IoU matrix of at most max_matrix boxes per image
+        xc = _sorted(xc, max_matrix)
+        g = _groups(xc, agnostic)
+        iou = (box_iou(xc[:, 1:5], xc[:, 1:5]) * (g[:, None] == g[None]).float()).triu_(diagonal=1)
+        compensate = iou.max(0)[0][:, None]  # max IoU of each box with any higher-scoring box
+        if kernel == 'gaussian':
+            decay = torch.exp(-sigma * (iou ** 2 - compensate ** 2)).min(0)[0]
+        else:  # linear
+            decay = ((1 - iou) / (1 - compensate).clamp(min=1e-6)).min(0)[0]
+        xc = xc.clone()
+        xc[:, 5] *= decay
+        out.append(xc[xc[:, 5] > max(score_thres, 1e-3)])
+    return torch.cat(out, 0) if out else x[:0]
+
+
+def nms_merge(x, iou_thres=0.45, agnostic=False, redundant=False, **kwargs):
+    # Merge-NMS: batched NMS, then each kept box becomes the score-weighted mean of the boxes it suppressed
+    g = _groups(x, agnostic)
+    i = torchvision.ops.batched_nms(x[:, 1:5].float(), x[:, 5].float(), g, iou_thres)
+    if 1 < x.shape[0] < 3E3:
+        iou = (box_iou(x[i, 1:5], x[:, 1:5]) > iou_thres) & (g[i, None] == g[None])  # iou matrix
+        weights = iou * x[None, :, 5]  # box weights
+        x = x.clone()
+        x[i, 1:5] = (torch.mm(weights.float(), x[:, 1:5].float()) / weights.sum(1, keepdim=True)).to(x.dtype)
+        if redundant:
+            i = i[iou.sum(1) > 1]  # require redundancy
+    return x[i]
+
+
+ENGINES = {
+    'torchvision': nms_torchvision,
+    'batched': nms_batched,
+    'fast': nms_fast,
+    'matrix': nms_matrix,
+    'merge': nms_merge,
+}
+
+
+def run_nms(candidates, batch_size, iou_thres=0.45, method='batched', classes=None, agnostic=False, max_det=300,
+            **kwargs):
+    """Suppress compact candidates with the selected engine
+
+    Args:
+        candidates: (n, 7) [image, x1, y1, x2, y2, conf, cls]
+        batch_size: number of images in the batch
+        method: one of ENGINES ('torchvision', 'batched', 'fast', 'matrix', 'merge')
+        kwargs: engine options (time_limit, score_thres, kernel, sigma, redundant)
+
+    Returns:
+         list of detections per image with shape: nx6 (x1, y1, x2, y2, conf, cls)
+    """
+    x = candidates
+    if classes is not None:
+        x = x[(x[:, 6:7] == torch.tensor(classes, device=x.device)).any(1)]
+    if not x.shape[0]:
+        return [torch.zeros((0, 6), device=candidates.device)] * batch_size
+    if x.shape[0] > max_nms:  # excess boxes, capped per image like the original non_max_suppression
+        x = _sorted_per_image(x, max_nms)
+    if method not in ENGINES:
+        raise ValueError(f'Unknown NMS method {method}, expected one of {list(ENGINES)}')
+    x = ENGINES[method](x, iou_thres=iou_thres, agnostic=agnostic, **kwargs)
+    return _split(_sorted(x, x.shape[0]), batch_size, max_det)
+
+
+def random_candidates(n, batch_size=1, nc=6, size=640, clusters=50, device='cpu'):
+    # Synthetic dense-defect candidates: boxes jittered around a few cluster centres, like a board full of defects
+    centres = torch.rand(clusters, 2, device=device) * size
+    wh = torch.rand(clusters, 2, device=device) * 40 + 8
+    k = torch.randint(clusters, (n,), device=device)
+    xy = centres[k] + torch.randn(n, 2, device=device) * 4
+    whk = wh[k] * (1 + torch.randn(n, 2, device=device) * 0.1).abs()
+    box = torch.cat((xy - whk / 2, xy + whk / 2), 1)
+    img = torch.randint(batch_size, (n, 1), device=device).float()
+    cls = (k % nc)[:, None].float()
+    return torch.cat((img, box, torch.rand(n, 1, device=device) * 0.75 + 0.25, cls), 1)
+
+
+def benchmark(counts=(100, 1000, 5000, 10000, 30000), methods=None, batch_size=1, runs=10, device='cpu'):
+    # Median latency (ms) of each engine per candidate count -> {method: {count: ms}}
+    methods = methods or list(ENGINES)
+    device = torch.device(device)
+    results = {m: {} for m in methods}
+    for n in counts:
+        x = random_candidates(n, batch_size, device=device)
+        for m in methods:
+            times = []
+            for _ in range(runs + 1):  # first run is warmup
+                if device.type == 'cuda':
+                    torch.cuda.synchronize()
+                t = time.perf_counter()
+                run_nms(x, batch_size, method=m, time_limit=None)
+                if device.type == 'cuda':
+                    torch.cuda.synchronize()
+                times.append(time.perf_counter() - t)
+            results[m][n] = sorted(times[1:])[len(times[1:]) // 2] * 1000
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--counts', nargs='+', type=int, default=[100, 1000, 5000, 10000, 30000], help='candidates')
+    parser.add_argument('--methods', nargs='+', default=list(ENGINES), help='NMS engines')
+    parser.add_argument('--batch-size', type=int, default=1, help='images the candidates are spread over')
+    parser.add_argument('--runs', type=int, default=10, help='timed runs per point')
+    parser.add_argument('--device', default='cpu', help='cuda device, i.e. 0 or cpu')
+    opt = parser.parse_args()
+    device = opt.device if opt.device == 'cpu' else f'cuda:{opt.device}' if opt.device.isdigit() else opt.device
+
+    results = benchmark(opt.counts, opt.methods, opt.batch_size, opt.runs, device)
+    print(('%12s' + '%12s' * len(opt.counts)) % ('ms', *opt.counts))
+    for m, row in results.items():
+        print(('%12s' + '%12.2f' * len(opt.counts)) % (m, *[row[n] for n in opt.counts]))
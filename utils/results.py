@@ -0,0 +1,124 @@
+# Columnar detection results
+#
+# One (n, 6) float32 NumPy array [x1, y1, x2, y2, conf, cls] per image. Derived views (class names, xywh, normalized
+# boxes, per-class counts) are computed on first access only, so passing results between threads, Qt signals and
+# writers costs one array instead of n Python dicts.
+
+import numpy as np
+
+from utils.general import xyxy2xywh
+
+
+class DetectionResult:
+    # Detections of one image, also usable as the lazy single-image form of models.common.Detections
+    def __init__(self, data=None, names=(), shape=None, ids=None):
+        self.data = np.zeros((0, 6), dtype=np.float32) if data is None else np.asarray(data, dtype=np.float32)
+        self.names = names  # class names, indexed by cls
+        self.shape = tuple(shape[:2]) if shape is not None else None  # (height, width) of the source image
+        self.ids = None if ids is None else np.asarray(ids, dtype=np.int64)  # optional track ids, one per box
+        self._cache = {}
+
+    @classmethod
+    def from_tensor(cls, det, names=(), shape=None):
+        # (n, 6) torch tensor from NMS -> DetectionResult
+        if det is None or not len(det):
+            return cls(None, names, shape)
+        return cls(det.detach().float().cpu().numpy(), names, shape)
+
+    @classmethod
+    def from_dicts(cls, detections, names=(), shape=None):
+        # Legacy [{'class', 'confidence', 'bbox'}] list -> DetectionResult
+        names = list(names)
+        rows = []
+        for d in detections:
+            name = d.get('class', 'unknown')
+            if name not in names:
+                names.append(name)
+            rows.append([*d['bbox'], d.get('confidence', 0.0), names.index(name)])
+        return cls(np.array(rows, dtype=np.float32) if rows else None, names, shape)
+
+    def _lazy(self, key, fn):
+        if key not in self._cache:
+            self._cache[key] = fn()
+        return self._cache[key]
+
+    def __len__(self):
+        return self.data.shape[0]
+
+    def __iter__(self):
+        # Per-box dicts, only for legacy consumers; prefer the columnar views
+        ids = self.ids.tolist() if self.ids is not None else [None] * len(self)
+        for (x1, y1, x2, y2), conf, label, i in zip(self.xyxy.tolist(), self.conf.tolist(), self.labels, ids):
+            d = {'class': label, 'confidence': conf, 'bbox': [x1, y1, x2, y2]}
+            if i is not None:
+                d['track_id'] = i
+            yield d
+
+    def __repr__(self):
+        return f'DetectionResult(n={len(self)}, counts={self.counts})'
+
+    def tolist(self):
+        return list(self)
+
+    @property
+    def n(self):
+        return len(self)
+
+    @property
+    def xyxy(self):
+        return self.data[:, :4]  # view, no copy
+
+    @property
+    def conf(self):
+        return self.data[:, 4]
+
+    @property
+    def cls(self):
+        return self._lazy('cls', lambda: self.data[:, 5].astype(np.int64))
+
+    @property
+    def labels(self):
+        # Class name of each box
+        def names():
+            n = len(self.names)
+            return [self.names[c] if c < n else str(c) for c in self.cls.tolist()]
+        return self._lazy('labels', names)
+
+    @property
+    def xywh(self):
+        return self._lazy('xywh', lambda: xyxy2xywh(self.xyxy))
+
+    @property
+    def gn(self):
+        # Normalization gain whwh
+        if self.shape is None:
+            raise ValueError('DetectionResult.shape is required for normalized boxes')
+        h, w = self.shape
+        return np.array([w, h, w, h], dtype=np.float32)
+
+    @property
+    def xyxyn(self):
+        return self._lazy('xyxyn', lambda: self.xyxy / self.gn)
+
+    @property
+    def xywhn(self):
+        return self._lazy('xywhn', lambda: self.xywh / self.gn)
+
+    @property
+    def counts(self):
+        # {class name: number of boxes}
+        def counts():
+            ids, n = np.unique(self.cls, return_counts=True)
+            return {(self.names[i] if i < len(self.names) else str(i)): int(k) for i, k in zip(ids.tolist(), n.tolist())}
+        return self._lazy('counts', counts)
+
+    def filter(self, mask):
+        # Subset by boolean mask or indices, keeps names/shape
+        return DetectionResult(self.data[mask], self.names, self.shape, None if self.ids is None else self.ids[mask])
+
+    def scaled(self, gain):
+        # Boxes multiplied by gain, e.g. for drawing on a downscaled display image
+        data = self.data.copy()
+        data[:, :4] *= gain
+        return DetectionResult(data, self.names, None if self.shape is None else
+                               (int(round(self.shape[0] * gain)), int(round(self.shape[1] * gain))), self.ids)
@@ -77,6 +77,14 @@ def select_device(device='', batch_size=None):
     return torch.device('cuda:0' if cuda else 'cpu')
 
 
+def torch_load(f, map_location=None):
+    # Unpickle a full checkpoint (model objects, not just tensors); torch>=2.6 defaults to weights_only=True
+    try:
+        return torch.load(f, map_location=map_location, weights_only=False)
+    except TypeError:  # torch<1.13 has no weights_only argument
+        return torch.load(f, map_location=map_location)
+
+
 def time_synchronized():
     # pytorch-accurate time
     if torch.cuda.is_available():
@@ -0,0 +1,243 @@
+"""
+推理用模型產物快取
+將訓練檢查點一次轉換為推理用產物（FP32、Conv+BN 已融合、去除優化器/EMA 等訓練狀態），
+存放於權重檔旁 (<權重檔>.safetensors)，附帶模型結構 (yaml) 與類別名稱、步長、類別數、輸入尺寸等中繼資料；
+權重檔修改後自動重建
+
+產物採 safetensors 格式（8 位元組標頭長度 + JSON 標頭 + 連續的張量資料），不經 pickle 反序列化；
+載入時以唯讀 mmap 映射，同一主機上的多個推理行程共用相同的實體記憶體頁
+"""
+
+import json
+import os
+import struct
+import warnings
+from contextlib import nullcontext
+from copy import deepcopy
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+
+ARTIFACT_SUFFIX = '.safetensors'
+ARTIFACT_VERSION = 2
+_DTYPES = {'F32': np.float32, 'F16': np.float16, 'I64': np.int64, 'I32': np.int32, 'U8': np.uint8, 'BOOL': np.bool_}
+_DTYPE_NAMES = {np.dtype(v): k for k, v in _DTYPES.items()}
+
+
+def artifact_path(weights_path):
+    return weights_path + ARTIFACT_SUFFIX
+
+
+def _source_stamp(weights_path):
+    st = os.stat(weights_path)
+    return {'source': os.path.basename(weights_path), 'source_size': st.st_size, 'source_mtime_ns': st.st_mtime_ns}
+
+
+# ---- safetensors 讀寫 ----------------------------------------------------------------------------------------
+def save_tensors(path, tensors, metadata):
+    """
+    以 safetensors 格式寫入張量
+
+    Args:
+        tensors: {名稱: CPU 張量}
+        metadata: {str: str}，寫入標頭的 __metadata__
+    """
+    arrays = {k: t.detach().cpu().contiguous().numpy() for k, t in tensors.items()}
+    header, offset = {'__metadata__': metadata}, 0
+    for k in sorted(arrays, key=lambda k: (-arrays[k].itemsize, k)):  # 依元素大小排列，每個張量自然對齊
+        a = arrays[k]
+        header[k] = {'dtype': _DTYPE_NAMES[a.dtype], 'shape': list(a.shape), 'data_offsets': [offset, offset + a.nbytes]}
+        offset += a.nbytes
+    data = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    data += b' ' * (-(8 + len(data)) % 8)  # 資料區起點對齊 8 位元組
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<Q', len(data)))
+        f.write(data)
+        for k in (k for k in header if k != '__metadata__'):
+            f.write(arrays[k].tobytes())
+
+
+def read_header(path):
+    """只讀取 JSON 標頭，回傳 (標頭, 資料區起點)"""
+    with open(path, 'rb') as f:
+        n = struct.unpack('<Q', f.read(8))[0]
+        return json.loads(f.read(n).decode('utf-8')), 8 + n
+
+
+def load_tensors(path):
+    """
+    以唯讀 mmap 載入張量（不複製資料，多個行程共用分頁快取）
+
+    Returns:
+        tuple: ({名稱: 張量}, 標頭 __metadata__)
+    """
+    header, start = read_header(path)
+    buf = np.memmap(path, dtype=np.uint8, mode='r')
+    tensors = {}
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)  # 唯讀陣列轉張量的警告；推理不會原地修改權重
+        for k, v in header.items():
+            if k == '__metadata__':
+                continue
+            b, e = v['data_offsets']
+            a = buf[start + b:start + e].view(_DTYPES[v['dtype']]).reshape(v['shape'])
+            tensors[k] = torch.from_numpy(a)
+    return tensors, header.get('__metadata__', {})
+
+
+# ---- 推理產物 ---------------------------------------------------------------------------------------------
+def _is_fresh(metadata, weights_path):
+    if metadata.get('format') != str(ARTIFACT_VERSION):
+        return False
+    meta = json.loads(metadata.get('meta', '{}'))
+    return all(meta.get(k) == v for k, v in _source_stamp(weights_path).items())
+
+
+def checkpoint_meta(ckpt, weights_path):
+    """由已反序列化的訓練檢查點取出中繼資料 (names, stride, nc, imgsz, epoch)"""
+    model = ckpt['model']
+    opt = ckpt.get('opt') or {}
+    opt = opt if isinstance(opt, dict) else vars(opt)
+    imgsz = opt.get('img_size', [640])
+    detect = model.model[-1]
+    return dict(_source_stamp(weights_path),
+                names=[str(n) for n in model.names] if hasattr(model, 'names') else [],
+                stride=[int(s) for s in model.stride.tolist()],
+                nc=int(getattr(detect, 'nc', getattr(model, 'nc', 0))),
+                imgsz=int(imgsz[0] if isinstance(imgsz, (list, tuple)) else imgsz),
+                epoch=int(ckpt['epoch'] if ckpt.get('epoch') is not None else -1),
+                torch=torch.__version__)
+
+
+def artifact_meta(weights_path):
+    """只讀取產物標頭取得中繼資料，產物不存在或已過期時回傳 None"""
+    path = artifact_path(weights_path)
+    if not os.path.isfile(path):
+        return None
+    try:
+        metadata = read_header(path)[0].get('__metadata__', {})
+        return json.loads(metadata['meta']) if _is_fresh(metadata, weights_path) else None
+    except (OSError, ValueError, KeyError, struct.error):
+        return None
+
+
+def _finalize(model):
+    """融合後的前向函式與版本相容設定（與 attempt_load 相同）"""
+    from models.common import Conv
+
+    for m in model.modules():
+        if type(m) in [nn.Hardswish, nn.LeakyReLU, nn.ReLU, nn.ReLU6]:
+            m.inplace = True  # pytorch 1.7.0 compatibility
+        elif type(m) is Conv:
+            m._non_persistent_buffers_set = set()  # pytorch 1.6.0 compatibility
+            if not hasattr(m, 'bn'):
+                m.forward = m.fuseforward
+    for p in model.parameters():
+        p.requires_grad_(False)
+    return model.eval()
+
+
+def _no_storage():
+    """建立模組時不配置參數記憶體（torch>=2.0 於 meta 裝置上建立；舊版會暫時配置一份隨後即被取代的權重）"""
+    return torch.device('meta') if hasattr(torch.device, '__enter__') else nullcontext()
+
+
+def _build_model(cfg, tensors, meta):
+    """
+    依 yaml 結構建立模型，將 Conv+BN 改為融合後的結構，再以 mmap 張量取代參數
+
+    不執行 Model.__init__（步長推算的前向傳遞、權重初始化、模型摘要與 FLOPs 計算），
+    只以 parse_model 建立模組樹；步長與類別名稱取自產物中繼資料，錨框為產物中的緩衝區。
+    模組建立於 meta 裝置上，不另外配置隨機初始化的權重，所有參數與緩衝區直接使用共用的唯讀 mmap
+    """
+    from models.common import Conv
+    from models.yolo import Detect, Model, parse_model
+
+    with _no_storage():
+        model = Model.__new__(Model)
+        nn.Module.__init__(model)
+        model.yaml = cfg
+        model.model, model.save = parse_model(deepcopy(cfg), ch=[cfg.get('ch', 3)])
+        for name, m in model.named_modules():
+            if type(m) is Conv and f'{name}.bn.weight' not in tensors:
+                c = m.conv
+                m.conv = nn.Conv2d(c.in_channels, c.out_channels, c.kernel_size, c.stride, c.padding,
+                                   groups=c.groups, bias=True)
+                del m.bn
+    detect = model.model[-1]
+    if isinstance(detect, Detect):
+        detect.stride = model.stride = torch.tensor(meta['stride'], dtype=torch.float32)
+        detect.grid = [torch.zeros(1)] * detect.nl  # 網格於首次前向時依輸入尺寸建立
+
+    expected = set(model.state_dict())
+    if expected != set(tensors):
+        raise KeyError(f"產物張量與模型結構不符: {sorted(expected ^ set(tensors))[:5]}")
+    modules = dict(model.named_modules())
+    for k, t in tensors.items():
+        m_name, _, leaf = k.rpartition('.')
+        m = modules[m_name]
+        if leaf in m._parameters:
+            m._parameters[leaf] = nn.Parameter(t, requires_grad=False)
+        else:
+            m._buffers[leaf] = t
+    if any(t.is_meta for t in list(model.parameters()) + list(model.buffers())):
+        raise RuntimeError("產物缺少部分參數或緩衝區")
+    model.names = meta['names']
+    return model
+
+
+def load_artifact(weights_path, device):
+    """
+    載入新鮮的推理產物（CPU 上直接使用 mmap 的權重）
+
+    Returns:
+        tuple: (model, meta)；產物不存在或已過期時回傳 (None, None)
+    """
+    path = artifact_path(weights_path)
+    if not os.path.isfile(path):
+        return None, None
+    try:
+        header, _ = read_header(path)
+        metadata = header.get('__metadata__', {})
+        if not _is_fresh(metadata, weights_path):
+            return None, None
+        tensors, _ = load_tensors(path)
+        meta = json.loads(metadata['meta'])
+        model = _build_model(json.loads(metadata['yaml']), tensors, meta)
+    except (OSError, ValueError, KeyError, RuntimeError, struct.error):  # 產物損毀或模型定義已變更，重建
+        return None, None
+    return _finalize(model.to(device)), meta
+
+
+def build_artifact(weights_path, device, save=True):
+    """
+    由訓練檢查點建立推理模型，並（可寫入時）保存產物；保存成功時改由產物以 mmap 載入
+
+    Returns:
+        tuple: (model, meta)
+    """
+    from utils.torch_utils import torch_load
+
+    ckpt = torch_load(weights_path, map_location='cpu')  # 訓練檢查點只能以 pickle 讀取，只在建立產物時執行一次
+    meta = checkpoint_meta(ckpt, weights_path)
+    model = ckpt['model'].float().fuse().eval()
+    del ckpt  # 釋放優化器狀態
+
+    if save and isinstance(getattr(model, 'yaml', None), dict):
+        path = artifact_path(weights_path)
+        tmp = path + '.tmp'
+        try:
+            save_tensors(tmp, model.state_dict(), {'format': str(ARTIFACT_VERSION),
+                                                   'meta': json.dumps(meta, ensure_ascii=False),
+                                                   'yaml': json.dumps(model.yaml, ensure_ascii=False)})
+            os.replace(tmp, path)  # 寫入完成才替換，避免其他行程讀到一半的檔案
+        except (OSError, TypeError):  # 權重目錄唯讀或 yaml 含無法序列化的值，只在記憶體中使用
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        else:
+            mapped, mapped_meta = load_artifact(weights_path, device)
+            if mapped is not None:
+                return mapped, mapped_meta
+    return _finalize(model.to(device)), meta